@@ -1,11 +1,12 @@
-import segment, pillar, dam
+import segment, pillar, dam, loadcase
 
 from shapely.geometry import Polygon
 
 """
 This script is used to define the dam construction.
 The script expects a list of pillars to be passed to a Dam instance and a list
-of water levels (HRV, DFV, MFV). See pillar.py for definition of pillars.
+of water levels (HRV, DFV, MFV) or load cases. See pillar.py for definition of
+pillars and loadcase.py for definition of load cases.
 """
 
 #help functions and variables
@@ -99,4 +100,10 @@ for i in range(0, 20):
 dam_construction = dam.Dam(pillars)
 
 #define water levels
-levels = [275, 275.81, 276.33]
\ No newline at end of file
+levels = [275, 275.81, 276.33]
+
+#define load cases (name, water level, ice load, uplift factor, threshold
+#class); any number of load cases can be defined
+cases = [loadcase.LoadCase('HRV + is', levels[0], ice = 100),
+         loadcase.LoadCase('DFV', levels[1]),
+         loadcase.LoadCase('MFV', levels[2], threshold_class = 'ulykke')]
\ No newline at end of file
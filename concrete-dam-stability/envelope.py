@@ -0,0 +1,232 @@
+import evaluation, loadcase, response
+
+import itertools
+import numpy as np
+import pandas as pd
+
+def combinations(levels, ices = (0, ), uplifts = (1, ),
+                 threshold_class = 'normal'):
+    """
+    Load cases of all combinations of water levels, ice loads and uplift
+    factors
+    
+    Returns
+    -------
+    list
+        List of instances of LoadCase
+    """
+    return [loadcase.LoadCase(f'{level} / is {ice} / opptrykk {uplift}',
+                              level, ice, uplift, threshold_class)
+            for level, ice, uplift in itertools.product(levels, ices, uplifts)]
+
+def worse(values, sign):
+    #rank of the values in the worse direction: sign 1 if larger values are
+    #worse, -1 if smaller values are worse, 0 if unknown
+    return np.asarray(values, dtype = float) * sign
+
+def dominated(keys):
+    """
+    Parameters
+    ----------
+    keys : numpy.ndarray
+        Array of shape (n, 2), larger values are worse in both columns
+    
+    Returns
+    -------
+    numpy.ndarray
+        Boolean array, True for rows that are dominated, i.e. another row is
+        at least as bad in both columns and worse in one of them
+    """
+    out = np.zeros(len(keys), dtype = bool)
+    for i, k in enumerate(keys):
+        ge = np.all(keys >= k, axis = 1) & np.any(keys > k, axis = 1)
+        out[i] = ge.any()
+    return out
+
+class Envelope:
+    """
+    Governing load combination per pillar and failure mode among many load
+    combinations (water levels x ice loads x uplift factors).
+    The loads are calculated with the load classes once per pillar and
+    water level, with unit ice load and uplift factor (see
+    response.sample); for a given level, the ice load and the uplift are
+    proportional to their factors, so the combinations of a level only
+    require scaling of these loads instead of a calculation of their own.
+    The load calculation per level is the expensive step and is done for
+    every level: the loads are not monotonic in the water level (e.g. if
+    the upstream contact is lower than the downstream contact, the moment
+    of the water pressure about the downstream contact first rises, then
+    falls and changes its sign), so there is no cheap bound that rules out
+    a level.
+    Among the combinations of a level, the ones that cannot govern are not
+    evaluated: at a given level and threshold, the sliding coefficient and
+    the moment ratio are monotonic in the ice load and the uplift factor
+    (the direction follows from the signs of the unit loads and moments),
+    a combination is skipped if another combination is at least as
+    unfavourable in both. This only saves the scaling of the loads. The
+    position of the resultant (gravity dams) is checked against a band and
+    is not monotonic, all combinations are evaluated.
+    """
+    
+    def __init__(self, dam, cases, thresholds = None):
+        """
+        Parameters
+        ----------
+        dam : instance of Dam
+        cases : list
+            Load combinations as instances of LoadCase, e.g. from
+            combinations(); ice loads and uplift factors must not be
+            negative
+        thresholds : dict, optional
+            Threshold values, see evaluation.THRESHOLDS
+        
+        Returns
+        -------
+        None.
+        
+        """
+        self.dam = dam
+        self.cases = cases
+        self.evaluation = evaluation.Evaluation(dam, cases, thresholds)
+        self.counts = {'combinations': 0, 'evaluated': 0, 'levels': 0}
+    
+    def groups(self):
+        #load combinations grouped by water level and threshold class
+        groups = {}
+        for case in self.cases:
+            key = (case.level, case.threshold_class)
+            groups.setdefault(key, []).append(case)
+        return groups
+    
+    def candidates(self, mode, cases, unit, p):
+        """
+        Parameters
+        ----------
+        mode : string
+            'Glidning' or 'Velting'
+        cases : list
+            Load combinations of one level and threshold class
+        unit : numpy.ndarray
+            Loads of pillar p at this level, unit ice load and uplift factor
+            (shape (6, 3), see response.LOADS)
+        p : instance of Pillar
+        
+        Returns
+        -------
+        list
+            Combinations that may govern
+        """
+        ice = np.array([c.ice for c in cases], dtype = float)
+        uplift = np.array([c.uplift for c in cases], dtype = float)
+        if (ice < 0).any() or (uplift < 0).any():
+            return cases
+        if mode == 'Velting' and p.dam_type.startswith('Gr'):
+            return cases
+        
+        f = unit[:, 0]
+        if mode == 'Glidning':
+            #|fv| / |fh|: fh = H + ice * I, fv = V + uplift * U
+            h = f[1]
+            v = f[2] + f[3] + f[5]
+            fh = h + np.array([ice.min(), ice.max()]) * f[0]
+            fv = v + np.array([uplift.min(), uplift.max()]) * f[4]
+            if np.sign(fh[0]) != np.sign(fh[1]) or \
+                    np.sign(fv[0]) != np.sign(fv[1]):
+                return cases
+            #unfavourable: larger |fh|, smaller |fv|
+            s_ice = np.sign(fh[0]) * np.sign(f[0])
+            s_up = - np.sign(fv[0]) * np.sign(f[4])
+        else:
+            #moment ratio: positive moments (stabilizing) of the ice load
+            #and the uplift are favourable, negative ones unfavourable
+            px, py = (p.right_contact().x, p.right_contact().y)
+            m_ice = unit[0, 2] - f[0] * py
+            m_up = f[4] * px - unit[4, 1]
+            s_ice, s_up = - np.sign(m_ice), - np.sign(m_up)
+        
+        keys = np.column_stack([worse(ice, s_ice), worse(uplift, s_up)])
+        return [c for c, d in zip(cases, dominated(keys)) if not d]
+    
+    def evaluate(self, cases, unit, p):
+        """
+        Returns
+        -------
+        tuple
+            Arrays of the sliding coefficient, the moment ratio and the
+            position of the resultant of the combinations
+        """
+        scale = np.ones((len(cases), 6))
+        scale[:, 0] = [c.ice for c in cases]
+        scale[:, 4] = [c.uplift for c in cases]
+        loads = unit[None, :, :] * scale[:, :, None]
+        right = p.right_contact()
+        self.counts['evaluated'] += len(cases)
+        return response.coefficients(
+            loads, (right.x, right.y), p.bottom_angle(), p.phi
+            )
+    
+    def pillar_envelope(self, p):
+        """
+        Returns
+        -------
+        list
+            Governing combination of pillar p per failure mode as tuples
+            (mode, load case, coefficient, margin)
+        """
+        ev = self.evaluation
+        weight = response.self_weight(p)
+        governing = {}
+        units = {}
+        
+        for (level, _), cases in self.groups().items():
+            if level not in units:
+                units[level] = np.empty((6, 3))
+                units[level][:5] = response.sample(p, level)
+                units[level][5] = weight
+                self.counts['levels'] += 1
+            unit = units[level]
+            self.counts['combinations'] += 2 * len(cases)
+            
+            for mode in ('Glidning', 'Velting'):
+                cands = self.candidates(mode, cases, unit, p)
+                gl, vm, vr = self.evaluate(cands, unit, p)
+                for idx, case in enumerate(cands):
+                    if mode == 'Glidning':
+                        coeff = gl[idx]
+                        margin = ev.glidning_margin(case, p, gl[idx])
+                    else:
+                        if p.dam_type.startswith('Gr'):
+                            coeff = vr[idx]
+                        else:
+                            coeff = vm[idx]
+                        margin = ev.velting_margin(case, p, vm[idx], vr[idx])
+                    if mode not in governing or margin < governing[mode][3]:
+                        governing[mode] = (mode, case, coeff, margin)
+        
+        return [governing[mode] for mode in ('Glidning', 'Velting')]
+    
+    def table(self):
+        """
+        Returns
+        -------
+        pandas.DataFrame
+            Envelope: governing load combination and stability coefficient
+            per pillar and failure mode
+        """
+        self.counts = {'combinations': 0, 'evaluated': 0, 'levels': 0}
+        rows = []
+        for p in self.dam.pillars:
+            for mode, case, coeff, margin in self.pillar_envelope(p):
+                threshold = self.evaluation.threshold(mode, case, p)
+                if margin >= 0:
+                    result = 'ok'
+                else:
+                    result = 'ikke ok'
+                rows.append([p.name, mode, case.name, case.level, case.ice,
+                             case.uplift, round(float(coeff), 2), threshold,
+                             round(float(margin), 3), result])
+        return pd.DataFrame(rows, columns = [
+            'Damseksjon', 'Sikkerhet mot', 'Lasttilfelle', 'Vannstand',
+            'Islast', 'Opptrykk', 'Sikkerhetsfaktor', 'Sikkerhetskrav',
+            'Margin', 'Stabilitet'
+            ])
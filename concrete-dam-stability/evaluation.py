@@ -1,6 +1,39 @@
-import stability
+import stability, loadcase, dam, runcontext
+import asyncio
+import numpy as np
 import pandas as pd
 
+#threshold values from NVE's guidelines per failure mode, dam type
+#(gravitasjonsdam, platedam) and load case class
+THRESHOLDS = {
+    'Glidning': {'Gr': {'normal': 1.5, 'ulykke': 1.1},
+                 'Pl': {'normal': 1.4, 'ulykke': 1.1}},
+    'Velting': {'Gr': {'normal': 1 / 12, 'ulykke': 1 / 6},
+                'Pl': {'normal': 1.4, 'ulykke': 1.3}}
+    }
+
+#column names of the evaluation overview
+HEADER = ['Sikkerhet mot', 'Lasttilfelle', 'Damseksjon',
+          'Sikkherhetsfaktor', 'Sikkerhetskrav', 'Stabilitet']
+
+def merge_records(records):
+    """
+    Merge result records of pillars (see Evaluation.evaluate_pillar, in
+    pillar order) to one overview, in the same order as
+    Evaluation.glidning() + Evaluation.velting() (load case, then pillar)
+    
+    Returns
+    -------
+    list
+        Rows with the columns of HEADER
+    """
+    records = [r for r in records if r is not None]
+    rows = []
+    for mode in ('glidning', 'velting'):
+        for idx in range(len(records[0][mode]) if records else 0):
+            rows += [r[mode][idx] for r in records]
+    return rows
+
 class Evaluation:
     """
     Evaluate stability (sliding, overturning) in accordance with NVE's guidelines/
@@ -8,13 +41,16 @@ class Evaluation:
 
     """
     
-    def __init__(self, dam, levels):
+    def __init__(self, dam, levels, thresholds = None):
         """
         Parameters
         ----------
         dam : instance of Dam
         levels: list
-            List of water levels (HRV, DFV, MFV)
+            List of load cases (instances of LoadCase) or list of water
+            levels (HRV, DFV, MFV), see loadcase.from_levels
+        thresholds : dict, optional
+            Threshold values, see THRESHOLDS; the default is THRESHOLDS
 
         Returns
         -------
@@ -22,29 +58,137 @@ class Evaluation:
 
         """
         self.dam = dam
-        self.levels = levels
+        self.cases = loadcase.as_cases(levels)
+        self.levels = [c.level for c in self.cases]
+        if thresholds is None:
+            thresholds = THRESHOLDS
+        self.thresholds = thresholds
     
-    def stability(self):
+    def stability(self, dam = None):
         """
-        Calculate dam stability for the given water levels
+        Calculate dam stability for the given load cases; load cases at the
+        same water level share the calculation of the loads
+        
+        Parameters
+        ----------
+        dam : instance of Dam, optional
+            Dam (or part of a dam) to calculate; the default is the
+            evaluated dam
 
         Returns
         -------
         list
             List of stability coefficients
         """
+        if dam is None:
+            dam = self.dam
+        bases = {}
         stab_list = []
-        for level in self.levels:
-            if level == min(self.levels):
-                stab_list.append(
-                    stability.Stability(self.dam, level)
-                    )
-            else:
-                stab_list.append(
-                    stability.Stability(self.dam, level, ice = 0)
+        for case in self.cases:
+            if case.level not in bases:
+                bases[case.level] = stability.Stability(
+                    dam, case.level, ice = 1, uplift = 1
                     )
+            stab_list.append(bases[case.level].scaled(case.ice, case.uplift))
         return stab_list
     
+    def threshold(self, mode, case, p):
+        """
+        Parameters
+        ----------
+        mode : string
+            Failure mode ('Glidning' or 'Velting')
+        case : instance of LoadCase
+        p : instance of Pillar
+        
+        Returns
+        -------
+        float
+            Threshold value; for overturning of gravity dams, the threshold
+            is the share of the sole at each side that the resultant must
+            not fall within
+        """
+        return self.thresholds[mode][p.dam_type[:2]][case.threshold_class]
+    
+    def glidning_row(self, case, p, gl_i):
+        """
+        Evaluate a single sliding coefficient, see glidning()
+        
+        Returns
+        -------
+        list
+        """
+        threshold = self.threshold('Glidning', case, p)
+        
+        if gl_i >= threshold:
+            result = 'ok'
+        else:
+            result = 'ikke ok'
+        
+        return ['Glidning', case.name, p.name, round(gl_i, 2),
+                threshold, result]
+    
+    def velting_row(self, case, p, vm_i, vr_i):
+        """
+        Evaluate a single overturning coefficient, see velting(); the
+        resultant is evaluated for gravity dams, the moment ratio otherwise
+        
+        Returns
+        -------
+        list
+        """
+        threshold = self.threshold('Velting', case, p)
+        level_name = case.name
+        
+        if p.dam_type.startswith('Gr'):
+            dist = p.right_contact().x - p.left_contact().x
+            min_dist = dist * threshold
+            max_dist = dist - (dist * threshold)
+            
+            if vr_i >= min_dist and vr_i <= max_dist:
+                result = 'ok'
+            else:
+                result = 'ikke ok'
+            return ['Velting', level_name, p.name, round(vr_i, 2),
+                    f'{round(min_dist, 2)} - {round(max_dist, 2)}',
+                    result]
+        
+        elif p.dam_type.startswith('Pl'):
+            if vm_i >= threshold:
+                result = 'ok'
+            else:
+                result = 'ikke ok'
+            
+            return ['Velting', level_name, p.name, round(vm_i, 2),
+                    threshold, result]
+    
+    def glidning_margin(self, case, p, gl_i):
+        """
+        Returns
+        -------
+        float
+            Relative margin of a sliding coefficient to its threshold,
+            negative if the threshold is not met
+        """
+        return gl_i / self.threshold('Glidning', case, p) - 1
+    
+    def velting_margin(self, case, p, vm_i, vr_i):
+        """
+        Returns
+        -------
+        float
+            Relative margin of an overturning coefficient to its threshold
+            (coefficient / threshold - 1 as for sliding), negative if the
+            threshold is not met; for gravity dams, the coefficient is the
+            distance of the resultant to the nearer end of the sole as share
+            of the sole, and the threshold the smallest share
+        """
+        threshold = self.threshold('Velting', case, p)
+        if p.dam_type.startswith('Gr'):
+            dist = p.right_contact().x - p.left_contact().x
+            return np.minimum(vr_i, dist - vr_i) / dist / threshold - 1
+        return vm_i / threshold - 1
+    
     def glidning(self):
         """
         Evaluate stability coefficients by comparing them to
@@ -55,7 +199,7 @@ class Evaluation:
         list
             List of tuples:
             - failure mode (sliding)
-            - water level name (HRV, DFV, MFV)
+            - load case name (e.g. HRV + is, DFV, MFV)
             - pillar name
             - stability coefficient
             - threshold
@@ -63,45 +207,11 @@ class Evaluation:
         """
         gl_list = [i.glidning() for i in self.stability()]
         
-        gr_normal = 1.5
-        gr_ulykke = 1.1
-        pl_normal = 1.4
-        pl_ulykke = 1.1
-        
         result_list = []
         
-        for (level, gl) in zip(self.levels, gl_list):
-            
-            if level == max(self.levels):
-                level_name = 'MFV'
-            elif level == min(self.levels):
-                level_name = 'HRV + is'
-            else:
-                level_name = 'DFV'
-            
+        for (case, gl) in zip(self.cases, gl_list):
             for (gl_i, p) in zip(gl, self.dam.pillars):
-                
-                if p.dam_type.startswith('Gr'):
-                    normal = gr_normal
-                    ulykke = gr_ulykke
-                elif p.dam_type.startswith('Pl'):
-                    normal = pl_normal
-                    ulykke = pl_ulykke
-                    
-                if level == max(self.levels):
-                    threshold = ulykke
-                else:
-                    threshold = normal
-                    
-                if gl_i >= threshold:
-                    result = 'ok'
-                else:
-                    result = 'ikke ok'
-                
-                result_list.append(
-                    ['Glidning', level_name, p.name, round(gl_i, 2),
-                     threshold, result]
-                    )
+                result_list.append(self.glidning_row(case, p, gl_i))
         
         return result_list
     
@@ -115,82 +225,114 @@ class Evaluation:
         list
             List of tuples:
             - failure mode (overturning)
-            - water level name (HRV, DFV, MFV)
+            - load case name (e.g. HRV + is, DFV, MFV)
             - pillar name
             - stability coefficient
             - threshold
             - stability (yes/ no)
         """
-        vm_list = [i.velting_moment() for i in self.stability()]
-        vr_list = [i.velting_resultant() for i in self.stability()]
-        
-        vm_normal = 1.4
-        vm_ulykke = 1.3
-        
-        vr_normal = 1 / 12
-        vr_ulykke = 1 / 6
+        stab_list = self.stability()
+        vm_list = [i.velting_moment() for i in stab_list]
+        vr_list = [i.velting_resultant() for i in stab_list]
         
         result_list = []
         
-        for (level, vm, vr) in zip(self.levels, vm_list, vr_list):
-            
-            if level == max(self.levels):
-                level_name = 'MFV'
-            elif level == min(self.levels):
-                level_name = 'HRV + is'
-            else:
-                level_name = 'DFV'
-            
+        for (case, vm, vr) in zip(self.cases, vm_list, vr_list):
             for (vm_i, vr_i, p) in zip(vm, vr, self.dam.pillars):
-                
-                if p.dam_type.startswith('Gr'):
-                    normal = vr_normal
-                    ulykke = vr_ulykke
-                    
-                    if level == max(self.levels):
-                        threshold = ulykke
-                    else:
-                        threshold = normal
-                        
-                    dist = p.right_contact().x - p.left_contact().x
-                    min_dist = dist * threshold
-                    max_dist = dist - (dist * threshold)
-                    
-                    if vr_i >= min_dist and vr_i <= max_dist:
-                        result = 'ok'
-                    else:
-                        result = 'ikke ok'
-                    result_list.append(
-                        ['Velting', level_name, p.name, round(vr_i, 2),
-                        f'{round(min_dist, 2)} - {round(max_dist, 2)}',
-                        result]
-                        )
-                    
-                    
-                elif p.dam_type.startswith('Pl'):
-                    normal = vm_normal
-                    ulykke = vm_ulykke
-                    
-                    if level == max(self.levels):
-                        threshold = ulykke
-                    else:
-                        threshold = normal
-                        
-                    if vm_i >= threshold:
-                        result = 'ok'
-                    else:
-                        result = 'ikke ok'
-                    
-                    result_list.append(
-                        ['Velting', level_name, p.name, round(vm_i, 2),
-                         threshold, result]
-                        )
+                result_list.append(self.velting_row(case, p, vm_i, vr_i))
+        
         return result_list
     
-    def write_file(self, file_name):
+    def evaluate_pillar(self, p):
+        """
+        Calculate and evaluate the stability of a single pillar in all
+        load cases
+        
+        Parameters
+        ----------
+        p : instance of Pillar
+        
+        Returns
+        -------
+        dict
+            Result record:
+            - 'pillar': pillar name
+            - 'dam_type': dam type
+            - 'levels': water levels of the load cases
+            - 'level_names': load case names (e.g. HRV + is, DFV, MFV)
+            - 'loads': loads per load case (order as in Stability.loads())
+            - 'moments': moments per load case (order as loads)
+            - 'glidning': result rows per load case, see glidning()
+            - 'velting': result rows per load case, see velting()
+        """
+        stab_list = self.stability(dam.Dam([p]))
+        
+        record = {'pillar': p.name, 'dam_type': p.dam_type,
+                  'levels': list(self.levels),
+                  'level_names': [c.name for c in self.cases],
+                  'loads': [], 'moments': [], 'glidning': [], 'velting': []}
+        
+        for case, stab in zip(self.cases, stab_list):
+            record['loads'].append([l[0] for l in stab.loads()])
+            record['moments'].append(stab.moment()[0])
+            record['glidning'].append(
+                self.glidning_row(case, p, stab.glidning()[0])
+                )
+            record['velting'].append(
+                self.velting_row(
+                    case, p, stab.velting_moment()[0],
+                    stab.velting_resultant()[0]
+                    )
+                )
+        return record
+    
+    def iter_pillars(self):
+        """
+        Evaluate the dam pillar by pillar; each result record is yielded as
+        soon as the pillar is calculated
+        
+        Yields
+        ------
+        dict
+            Result record, see evaluate_pillar()
+        """
+        for p in self.dam.pillars:
+            yield self.evaluate_pillar(p)
+    
+    async def aiter_pillars(self, executor = None, max_pending = 4):
+        """
+        Asynchronous version of iter_pillars(); pillars are calculated in an
+        executor while the consumer handles previous records
+        
+        Parameters
+        ----------
+        executor : concurrent.futures.Executor, optional
+            The default is the default executor of the running event loop
+        max_pending : positive int, optional
+            Maximum number of pillars calculated ahead of the consumer,
+            the default is 4
+        
+        Yields
+        ------
+        dict
+            Result record (in pillar order), see evaluate_pillar()
+        """
+        loop = asyncio.get_running_loop()
+        pending = []
+        for p in self.dam.pillars:
+            pending.append(
+                loop.run_in_executor(executor, self.evaluate_pillar, p)
+                )
+            if len(pending) >= max_pending:
+                yield await pending.pop(0)
+        while pending:
+            yield await pending.pop(0)
+    
+    def write_file(self, file_name, context = None):
         """
         Create simple overview of results ofstability calculations
-        as Excel file
+        as Excel file; progress is logged by the run context (see
+        runcontext.py)
 
         Returns
         -------
@@ -200,8 +342,8 @@ class Evaluation:
         gl = self.glidning()
         ve = self.velting()
         
-        header = ['Sikkerhet mot', 'Lasttilfelle', 'Damseksjon',
-                  'Sikkherhetsfaktor', 'Sikkerhetskrav', 'Stabilitet']
-        df = pd.DataFrame(gl + ve, columns = header)
+        df = pd.DataFrame(gl + ve, columns = HEADER)
         df.to_excel(file_name, index = False)
-        print(f'Evaluation written to Excel file ({file_name})')    
\ No newline at end of file
+        if context is None:
+            context = runcontext.RunContext()
+        context.info(f'Evaluation written to Excel file ({file_name})')    
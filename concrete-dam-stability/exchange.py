@@ -0,0 +1,205 @@
+import stability
+
+import json
+
+#version of the exchange format
+VERSION = 1
+
+#coordinates are rounded to this number of decimals (0.1 mm)
+DECIMALS = 4
+
+class Profiles:
+    """
+    Table of unique profiles (polygon rings). A polygon is stored relative
+    to the lower left corner of its bounding box, so that a profile which
+    only differs by a translation (e.g. the same pillar at another position
+    or the same water pressure at another pillar) is stored once and
+    referenced by its index and an offset.
+    """
+    
+    def __init__(self):
+        self.rings = []
+        self._index = {}
+    
+    def add(self, poly):
+        """
+        Parameters
+        ----------
+        poly : shapely.geometry.polygon.Polygon
+        
+        Returns
+        -------
+        tuple
+            Index of the profile, offset [dx, dy] of the polygon
+        """
+        coords = list(poly.exterior.coords)[:-1]
+        x0 = min(x for x, _ in coords)
+        y0 = min(y for _, y in coords)
+        ring = tuple((round(x - x0, DECIMALS), round(y - y0, DECIMALS))
+                     for x, y in coords)
+        if ring not in self._index:
+            self._index[ring] = len(self.rings)
+            self.rings.append([list(i) for i in ring])
+        return self._index[ring], [round(x0, DECIMALS), round(y0, DECIMALS)]
+
+def polygons(geom):
+    #polygons of a (multi)polygon, empty geometries are skipped
+    if geom.is_empty:
+        return []
+    if hasattr(geom, 'geoms'):
+        return [i for i in geom.geoms if not i.is_empty]
+    return [geom]
+
+def instance(profiles, seg, poly):
+    #reference to the profile of poly and the transformation and material of
+    #segment seg
+    idx, offset = profiles.add(poly)
+    return {'name': seg.name,
+            'profile': idx,
+            'offset': offset,
+            'axis': seg.axis,
+            'width': seg.width,
+            'weight': seg.spec_weight}
+
+def instanced(dam, cases):
+    """
+    Instanced geometry of a dam and its loads in several load cases:
+    - 'profiles': unique profiles (see Profiles)
+    - 'pillars': per pillar, the segments above the shear surface as
+      instances of profiles and the strips of the uplift along the shear
+      surface [x1, x2, axis] (level-independent)
+    - 'cases': per load case, the level-dependent loads (ice, water
+      pressure, water weight, overtopping) as instances of profiles, the
+      apex and specific weight of the uplift strips
+    
+    Parameters
+    ----------
+    dam : instance of Dam
+    cases : list
+        List of instances of LoadCase
+    
+    Returns
+    -------
+    dict
+    """
+    profiles = Profiles()
+    increment = 0.05 #see Opptrykk.draw()
+    
+    pillars = []
+    for p in dam.pillars:
+        segs = [instance(profiles, s, poly) for s in p.segments_above()
+                for poly in polygons(s.poly)]
+        y = min(p.left_contact().y, p.right_contact().y)
+        strips = [[round(x1, DECIMALS), round(x2, DECIMALS), axis]
+                  for x1, x2, axis in p.cutting_strips(increment)]
+        pillars.append({'name': p.name,
+                        'dam_type': p.dam_type,
+                        'segments': segs,
+                        'uplift': {'y': round(y, DECIMALS),
+                                   'width': increment,
+                                   'strips': strips}})
+    
+    cases_out = []
+    for case in cases:
+        stab = stability.Stability(dam, case.level, case.ice, case.uplift)
+        ice, vt, vv, ov, op = stab.basic()[:5]
+        loads = []
+        for idx, segs in enumerate(
+                zip(ice.draw(), vt.draw(), vv.draw(), ov.draw())
+                ):
+            for s in segs:
+                if s.load() > 0:
+                    for poly in polygons(s.poly):
+                        load = instance(profiles, s, poly)
+                        load['pillar'] = idx
+                        loads.append(load)
+        
+        apexes = []
+        for p, f in zip(dam.pillars, op.calc_load()):
+            if f != 0:
+                left_contact = p.left_contact()
+                y = min(left_contact.y, p.right_contact().y)
+                apexes.append([round(left_contact.x, DECIMALS),
+                               round(y - (case.level - left_contact.y),
+                                     DECIMALS)])
+            else:
+                apexes.append(None)
+        
+        cases_out.append({'name': case.name,
+                          'level': case.level,
+                          'ice': case.ice,
+                          'uplift': case.uplift,
+                          'loads': loads,
+                          'uplift_apex': apexes,
+                          'uplift_weight': op.g_water * op.uplift})
+    
+    return {'version': VERSION,
+            'profiles': profiles.rings,
+            'pillars': pillars,
+            'cases': cases_out}
+
+def write(data, file_name):
+    """
+    Write instanced geometry (see instanced) to a compact json file
+    """
+    with open(file_name, 'w', encoding = 'utf-8') as f:
+        json.dump(data, f, separators = (',', ':'))
+
+def read(file_name):
+    with open(file_name, encoding = 'utf-8') as f:
+        return json.load(f)
+
+def segment_load(seg):
+    #load of an expanded segment (see Segment.load): shoelace area of the
+    #ring times width and specific weight
+    x, y = seg['x'], seg['y']
+    area = abs(sum(x[i - 1] * y[i] - x[i] * y[i - 1]
+                   for i in range(len(x)))) / 2
+    return area * seg['width'] * seg['weight']
+
+def expand(data, case_name):
+    """
+    Expand instanced geometry to a flat list of segments of one load case,
+    the same segments as exported per load case by Export.export: segments
+    without load (e.g. the uplift strips at uplift factor 0) are skipped
+    
+    Parameters
+    ----------
+    data : dict
+        Instanced geometry, see instanced
+    case_name : string
+        Name of the load case
+    
+    Returns
+    -------
+    list
+        Segments as dicts with 'name', 'axis', 'width', 'weight', 'x', 'y'
+    """
+    def place(inst):
+        ring = data['profiles'][inst['profile']]
+        dx, dy = inst['offset']
+        return {'name': inst['name'],
+                'axis': inst['axis'],
+                'width': inst['width'],
+                'weight': inst['weight'],
+                'x': [x + dx for x, _ in ring],
+                'y': [y + dy for _, y in ring]}
+    
+    case = next(c for c in data['cases'] if c['name'] == case_name)
+    segs = [place(i) for i in case['loads']]
+    
+    for p, apex in zip(data['pillars'], case['uplift_apex']):
+        if apex is None:
+            continue
+        up = p['uplift']
+        for x1, x2, axis in up['strips']:
+            segs.append({'name': 'Opptrykk',
+                         'axis': axis,
+                         'width': up['width'],
+                         'weight': case['uplift_weight'],
+                         'x': [apex[0], x1, x2],
+                         'y': [apex[1], up['y'], up['y']]})
+    
+    for p in data['pillars']:
+        segs += [place(i) for i in p['segments']]
+    return [i for i in segs if segment_load(i) > 0]
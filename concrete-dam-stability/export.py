@@ -1,7 +1,48 @@
-import stability, evaluation
+import evaluation, loadcase, manifest, exchange, dam, runcontext
 import os
+import json
+import hashlib
+import tempfile
+import openpyxl
 import pandas as pd
 
+#property set definitions of the 3D model (Stabilitet, Egenskaper)
+DYNAMO = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dynamo'
+    )
+
+def property_names(name):
+    #names of the properties of a property set definition, in the order of
+    #dynamo/<name>.json
+    with open(os.path.join(DYNAMO, f'{name}.json'), encoding = 'utf-8') as f:
+        definition = json.load(f)
+    return [i['Data']['Name'] for i in definition['Data']['Definitions']]
+
+def property_set(names, values):
+    #values of all properties of a definition as text (as the data type of
+    #the definitions); values: dict by property name
+    missing = [i for i in names if i not in values]
+    if missing:
+        raise ValueError(f'No values of the properties {missing}')
+    return {i: str(values[i]) for i in names}
+
+def rows_digest(rows):
+    #content hash of segment rows (see Export.segment_rows), calculated row
+    #by row so that the rows can be streamed
+    h = hashlib.sha256(json.dumps(manifest.VERSION).encode('utf-8'))
+    for row in rows:
+        h.update(json.dumps(row, default = float).encode('utf-8') + b'\n')
+    return h.hexdigest()
+
+def write_sheet(file_dir, rows):
+    #write rows to an Excel file without header, row by row (write-only
+    #workbook, the sheet is not kept in memory)
+    wb = openpyxl.Workbook(write_only = True)
+    ws = wb.create_sheet('Sheet1')
+    for row in rows:
+        ws.append(row)
+    wb.save(file_dir)
+
 class Export:
     """
     Export evaluations and dam geometries as Excel files;
@@ -14,61 +55,315 @@ class Export:
     - x: X coordinates of segment vertices
     - y: Y coordinates of segment vertices
     """    
-    def __init__(self, dam, levels):
+    def __init__(self, dam, levels, context = None):
         self.dam = dam
         self.levels = levels
+        self.cases = loadcase.as_cases(levels)
+        if context is None:
+            context = runcontext.RunContext()
+        self.context = context
         
-    def export(self):
+    def write(self, df, file_dir, outputs, **kwargs):
+        #write df to an Excel file, only if its data has changed since the
+        #last export (see manifest.py); returns True if the file was written
+        value = manifest.frame_digest(df)
+        if outputs.is_current(file_dir, value, file_dir):
+            return False
+        df.to_excel(file_dir, **kwargs)
+        outputs.update(file_dir, value)
+        return True
+    
+    def evaluation_inputs(self):
+        #manifest key, input digest and file path of the evaluation
+        dam_print = [manifest.pillar_fingerprint(p) for p in self.dam.pillars]
+        ev = evaluation.Evaluation(self.dam, self.cases)
+        value = manifest.digest(
+            dam_print, [manifest.case_fingerprint(c) for c in self.cases],
+            ev.thresholds
+            )
+        return ('inputs: evaluation', value,
+                f"{self.context.dir('export')}/evaluation.xlsx")
+    
+    def write_evaluation(self, rows, outputs):
+        #write the evaluation overview (rows as Evaluation.glidning() +
+        #Evaluation.velting()), returns the number of files written
+        key, value, eval_dir = self.evaluation_inputs()
+        df = pd.DataFrame(rows, columns = evaluation.HEADER)
+        written = 0
+        if self.write(df, eval_dir, outputs, index = False):
+            written += 1
+            self.context.info(
+                f'Evaluation written to Excel file ({eval_dir})'
+                )
+        outputs.update(key, value)
+        return written
+    
+    def case_inputs(self, case):
+        #manifest key, input digest and file paths of the segments of a
+        #load case
+        dam_print = [manifest.pillar_fingerprint(p) for p in self.dam.pillars]
+        new_dir = self.context.dir('export')
+        file_dirs = [f'{new_dir}/{case.name}_{i}.xlsx'
+                     for i in ('data', 'x', 'y')]
+        value = manifest.digest(dam_print, manifest.case_fingerprint(case))
+        return f'inputs: {case.name}', value, file_dirs
+    
+    def segment_rows(self, segs):
+        #exported values of segments with load: name, axis, specific
+        #weight, width, x and y coordinates of the vertices
+        return [(i.name, i.axis, i.spec_weight, i.width,
+                 list(i.poly.exterior.coords.xy[0]),
+                 list(i.poly.exterior.coords.xy[1]))
+                for i in segs if i.load() > 0]
+    
+    def pillar_rows(self, case, p):
+        #segment rows of a pillar in a load case, grouped by load in the
+        #order of Stability.draw()
+        ice, vt, vv, ov, op, ev = [
+            i.draw() for i in case.stability(dam.Dam([p])).basic()
+            ]
+        return [self.segment_rows(i) for i in [ice, vt, vv, ov] + op + ev]
+    
+    def write_case(self, case, segs, outputs):
+        #write the segments of a load case (see Stability.draw()), returns
+        #the number of files written
+        return self.write_rows(case, self.segment_rows(segs), outputs)
+    
+    def write_rows(self, case, rows, outputs, data = None):
+        #write the segment rows of a load case (see segment_rows()) to the
+        #files data (name, axis, specific weight, width), x and y; rows is
+        #a list, or a function that returns an iterator of the rows (it is
+        #called once per file, e.g. to read rows spilled to disk) together
+        #with data, the content hash of the rows (see rows_digest());
+        #returns the number of files written
+        key, value, file_dirs = self.case_inputs(case)
+        if data is None:
+            data = rows_digest(rows)
+        read = rows if callable(rows) else lambda: iter(rows)
         
-        new_dir = '../export'
+        written = 0
+        for columns, file_dir in zip([slice(0, 4), 4, 5], file_dirs):
+            if outputs.is_current(file_dir, data, file_dir):
+                continue
+            write_sheet(file_dir, (row[columns] for row in read()))
+            outputs.update(file_dir, data)
+            written += 1
+        outputs.update(key, value)
+        return written
+    
+    def export(self, force = False, bounded = False):
+        """
+        Export the evaluation and the segments of every load case. Files are
+        only written again if their data has changed since the last export;
+        load cases whose inputs (geometry, load case) have not changed are
+        skipped entirely, unless force is True.
+        In bounded-memory mode (bounded = True), the dam is evaluated and
+        drawn pillar by pillar: only the result records and the exported
+        values of the segments are kept, the segments (and the cached
+        geometry of a pillar, see Pillar.clear_cache) are released as soon
+        as the pillar is done, and the exported values are spilled to
+        temporary files per load case and load, from which the files are
+        written row by row; only the result records are kept in memory. The
+        files are the same
         
-        if not os.path.exists(new_dir):
-            os.makedirs(new_dir)
+        """
+        if bounded:
+            return self.export_bounded(force)
+        
+        new_dir = self.context.dir('export')
  
-        segs_list = []
-        for level in self.levels:
-            if level == min(self.levels):
-                segs_list.append(
-                    stability.Stability(self.dam, level).draw()
-                    )
-            else:
-                segs_list.append(
-                    stability.Stability(self.dam, level, ice = 0).draw()
-                    )
+        outputs = manifest.Manifest(f'{new_dir}/manifest.json')
+        if force:
+            outputs.hashes = {}
+        written = 0
+        
+        key, value, eval_dir = self.evaluation_inputs()
+        if not outputs.is_current(key, value, eval_dir):
+            ev = evaluation.Evaluation(self.dam, self.cases)
+            written += self.write_evaluation(
+                ev.glidning() + ev.velting(), outputs
+                )
         
-        eval_dir = f'{new_dir}/evaluation.xlsx'       
-        evaluation.Evaluation(self.dam, self.levels).write_file(eval_dir)
+        for case in self.cases:
+            key, value, file_dirs = self.case_inputs(case)
+            if outputs.is_current(key, value, *file_dirs):
+                continue
+            segs = case.stability(self.dam).draw()
+            written += self.write_case(case, segs, outputs)
+        
+        outputs.save()
+        
+        return f'Export finished ({new_dir}), {written} files updated'
+    
+    def export_bounded(self, force = False):
+        #export() pillar by pillar, see export()
+        
+        new_dir = self.context.dir('export')
+        
+        outputs = manifest.Manifest(f'{new_dir}/manifest.json')
+        if force:
+            outputs.hashes = {}
+        written = 0
+        
+        key, value, eval_dir = self.evaluation_inputs()
+        write_eval = not outputs.is_current(key, value, eval_dir)
+        cases = []
+        for case in self.cases:
+            key, value, file_dirs = self.case_inputs(case)
+            if not outputs.is_current(key, value, *file_dirs):
+                cases.append(case)
+        
+        ev = evaluation.Evaluation(self.dam, self.cases)
+        records = []
+        with tempfile.TemporaryDirectory() as spill:
+            #one file of rows (json lines) per load case and load, the
+            #rows of a load case are written in the order of
+            #Stability.draw(): load by load, pillar by pillar
+            files = {}
+            for p in self.dam.pillars:
+                if write_eval:
+                    records.append(ev.evaluate_pillar(p))
+                for idx, case in enumerate(cases):
+                    groups = self.pillar_rows(case, p)
+                    if idx not in files:
+                        files[idx] = [
+                            open(f'{spill}/{idx}_{i}.jsonl', 'w+',
+                                 encoding = 'utf-8')
+                            for i in range(len(groups))
+                            ]
+                    for f, group in zip(files[idx], groups):
+                        for row in group:
+                            f.write(json.dumps(row, default = float) + '\n')
+                p.clear_cache()
+            
+            if write_eval:
+                written += self.write_evaluation(
+                    evaluation.merge_records(records), outputs
+                    )
+            for idx, case in enumerate(cases):
+                groups = files.get(idx, [])
+                
+                def read(groups = groups):
+                    for f in groups:
+                        f.seek(0)
+                        for line in f:
+                            yield json.loads(line)
                 
-        filtered = [[i for i in segs if i.load() > 0] for segs in segs_list]
-        
-        names = [[i.name for i in segs] for segs in filtered]
-        axes = [[i.axis for i in segs] for segs in filtered]
-        weights = [[i.spec_weight for i in segs] for segs in filtered]
-        widths = [[i.width for i in segs] for segs in filtered]
-        x = [[list(i.poly.exterior.coords.xy[0]) for i in segs] for segs in filtered]
-        y = [[list(i.poly.exterior.coords.xy[1]) for i in segs] for segs in filtered]
+                written += self.write_rows(case, read, outputs,
+                                           rows_digest(read()))
+                for f in groups:
+                    f.close()
+        
+        outputs.save()
+        
+        return f'Export finished ({new_dir}), {written} files updated'
 
+    def export_instanced(self, force = False):
+        """
+        Export the segments and loads of all load cases as one instanced
+        geometry file (see exchange.py): every unique profile is stored
+        once and referenced by the segments and loads with their offset,
+        axis, width and specific weight; the uplift strips are stored once
+        per pillar. The file is only written again if its data has changed
         
-        for idx, i in enumerate(self.levels):
-            
-            if i == min(self.levels):
-                name = 'HRV + is'
-            elif i == max(self.levels):
-                name = 'MFV'
-            else:
-                name = 'DFV'
-            
-            data_df = pd.DataFrame(list(zip(names[idx], axes[idx], weights[idx], widths[idx])),
-                                   columns =['Names', 'Axes', 'Weights', 'Widths'])
-            file_dir = f'{new_dir}/{name}_data.xlsx'
-            data_df.to_excel(file_dir, index = False, header = False)
-            
-            x_df = pd.DataFrame(x[idx])
-            file_dir = f'{new_dir}/{name}_x.xlsx'
-            x_df.to_excel(file_dir, index = False, header = False)
+        """
+        
+        new_dir = self.context.dir('export')
+        
+        outputs = manifest.Manifest(f'{new_dir}/manifest.json')
+        
+        file_dir = f'{new_dir}/geometry.json'
+        data = exchange.instanced(self.dam, self.cases)
+        value = manifest.digest(data)
+        if force or not outputs.is_current(file_dir, value, file_dir):
+            exchange.write(data, file_dir)
+            outputs.update(file_dir, value)
+            outputs.save()
+        
+        return f'Instanced export finished ({file_dir})'
+
+    def properties(self):
+        """
+        Values of the property sets Stabilitet (per pillar) and Egenskaper
+        (per segment) for all load cases, with every property of the
+        definitions in dynamo/Stabilitet.json and dynamo/Egenskaper.json;
+        all values are text, as in the definitions. Segments are keyed by
+        pillar and segment name, repeated names (e.g. the strips of the
+        uplift) are numbered in the order of Stability.draw_per_pillar(),
+        so a key refers to the same segment in every load case; segments
+        without load are skipped
+        
+        Returns
+        -------
+        dict
+            'Stabilitet': {pillar name: list of dicts (keys: properties of
+            Stabilitet)}
+            'Egenskaper': {segment key: list of dicts (keys: properties of
+            Egenskaper)}
+        """
+        stab_names = property_names('Stabilitet')
+        seg_names = property_names('Egenskaper')
+        ev = evaluation.Evaluation(self.dam, self.cases)
+        stabilitet, egenskaper = {}, {}
+        
+        for p in self.dam.pillars:
+            record = ev.evaluate_pillar(p)
+            stabilitet[p.name] = [
+                property_set(stab_names, {
+                    'Name': p.name, 'Sikkerhet_mot': mode,
+                    'Vannstand': level, 'Sikkerhetsfaktor': factor,
+                    'Sikkerhetskrav': threshold, 'Stabilitet': result
+                    })
+                for mode, level, _, factor, threshold, result
+                in record['glidning'] + record['velting']
+                ]
             
-            y_df = pd.DataFrame(y[idx])
-            file_dir = f'{new_dir}/{name}_y.xlsx'
-            y_df.to_excel(file_dir, index = False, header = False)
+            for case in self.cases:
+                segs = case.stability(dam.Dam([p])).draw_per_pillar()[0]
+                names = [i.name for i in segs]
+                counts = {}
+                for seg in segs:
+                    key = f'{p.name}: {seg.name}'
+                    if names.count(seg.name) > 1:
+                        counts[seg.name] = counts.get(seg.name, 0) + 1
+                        key = f'{key} {counts[seg.name]}'
+                    if not seg.load() > 0:
+                        continue
+                    egenskaper.setdefault(key, []).append(
+                        property_set(seg_names, {
+                            'Name': seg.name,
+                            'Axis': round(seg.axis, 3),
+                            'Width': round(seg.width, 3),
+                            'Specific_weight': round(seg.spec_weight, 3),
+                            'Volume': round(seg.area() * seg.width, 3),
+                            'Load': round(seg.load(), 2),
+                            'Vannstand': case.name
+                            })
+                        )
+        
+        return {'Stabilitet': stabilitet, 'Egenskaper': egenskaper}
+    
+    def export_properties(self, force = False):
+        """
+        Export the values of the property sets of the 3D model for all
+        pillars, segments and load cases to one json file (see
+        properties()), written in one go; the file is only written again if
+        its data has changed
+        
+        """
+        
+        new_dir = self.context.dir('export')
+        
+        outputs = manifest.Manifest(f'{new_dir}/manifest.json')
+        
+        file_dir = f'{new_dir}/properties.json'
+        data = self.properties()
+        value = manifest.digest(data)
+        if force or not outputs.is_current(file_dir, value, file_dir):
+            with open(file_dir, 'w', encoding = 'utf-8') as f:
+                json.dump(data, f, ensure_ascii = False,
+                          separators = (',', ':'))
+            outputs.update(file_dir, value)
+            outputs.save()
         
-        return f'Export finished ({new_dir})'
\ No newline at end of file
+        return f'Property export finished ({file_dir})'
@@ -0,0 +1,278 @@
+import stability, response, dam, dam_setup
+from pillar import Pillar
+from segment import Segment
+
+import time
+import numpy as np
+import pandas as pd
+from shapely import affinity
+
+#compared quantities: loads (see response.LOADS) and stability coefficients
+QUANTITIES = response.LOADS + ('glidning', 'velting_moment',
+                               'velting_resultant')
+
+#default tolerance per quantity: relative and absolute (kN or m)
+TOLERANCES = {q: (1e-6, 1e-6) for q in QUANTITIES}
+
+def reference(p, levels, ice = 0, uplift = 1, increment = None):
+    """
+    Reference implementation: the load classes (see Stability), one
+    calculation per water level; increment is the strip width of the
+    uplift (default Opptrykk.increment)
+    
+    Returns
+    -------
+    dict
+        Arrays of the quantities (keys: QUANTITIES) per water level
+    """
+    d = dam.Dam([p])
+    out = {q: [] for q in QUANTITIES}
+    for level in levels:
+        stab = stability.Stability(d, level, ice, uplift,
+                                   increment = increment)
+        for q, l in zip(response.LOADS, stab.loads()):
+            out[q].append(l[0])
+        out['glidning'].append(stab.glidning()[0])
+        out['velting_moment'].append(stab.velting_moment()[0])
+        out['velting_resultant'].append(stab.velting_resultant()[0])
+    return {q: np.array(v, dtype = float) for q, v in out.items()}
+
+def level_response(p, levels, ice = 0, uplift = 1):
+    """
+    Accelerated path: precomputed level response (see response.py), built
+    over the range of the levels
+    
+    Returns
+    -------
+    dict
+        See reference()
+    """
+    resp = response.LevelResponse(p, min(levels), max(levels))
+    loads = resp.loads(levels, ice, uplift)
+    out = dict(zip(response.LOADS, np.moveaxis(loads[..., 0], -1, 0)))
+    coeffs = response.coefficients(loads, resp.pivot, resp.alpha, resp.phi)
+    out.update(zip(QUANTITIES[6:], coeffs))
+    return out
+
+def refined_uplift(increment = 0.01):
+    """
+    Returns
+    -------
+    function
+        Reference implementation with another strip width of the uplift
+        (see Opptrykk.increment), e.g. to measure the discretization error
+        of the uplift
+    """
+    def engine(p, levels, ice = 0, uplift = 1):
+        return reference(p, levels, ice, uplift, increment = increment)
+    return engine
+
+#accelerated paths compared by default (candidate fast paths that must
+#reproduce the reference within TOLERANCES)
+ENGINES = {'LevelResponse': level_response}
+
+#tolerances of the discretization study: the strip width of the uplift
+#changes the uplift load by about 2 % (0.05 m against 0.01 m strips), which
+#carries over to the coefficients; the other loads do not depend on it
+DISCRETIZATION_TOLERANCES = dict(TOLERANCES, Opptrykk = (0.05, 1e-6),
+                                 glidning = (0.05, 1e-6),
+                                 velting_moment = (0.05, 1e-6),
+                                 velting_resultant = (0.05, 1e-6))
+
+def synthetic_pillars(n, seed = 0):
+    """
+    Randomized synthetic profiles: pillars of dam_setup with profiles
+    stretched horizontally (factor 0.85 - 1.15) about the crest, random
+    contact elevations, friction angles and crest widths
+    
+    Returns
+    -------
+    list
+        List of instances of Pillar
+    """
+    rng = np.random.default_rng(seed)
+    templates = dam_setup.dam_construction.pillars
+    pillars = []
+    for i in range(n):
+        t = templates[rng.integers(len(templates))]
+        factor = rng.uniform(0.85, 1.15)
+        segs = [Segment(affinity.scale(s.poly, factor, 1,
+                                       origin = (0, 275)),
+                        s.width, s.spec_weight, s.axis, s.name)
+                for s in t.segments]
+        contact_l = rng.uniform(254.5, 272.5)
+        contact_r = rng.uniform(260.8, 273)
+        pillars.append(Pillar(segs, contact_l, contact_r,
+                              rng.uniform(1, 2), rng.uniform(40, 55),
+                              t.dam_type, f'Syntetisk {i + 1}'))
+    return pillars
+
+def default_levels(p, n = 12):
+    #water levels from 0.5 m above the upstream contact to 1.5 m above
+    #the crest (overtopping)
+    lower = p.left_contact().y + 0.5
+    upper = p.highest_point().y + 1.5
+    return list(np.linspace(lower, upper, n))
+
+def errors(ref, value):
+    """
+    Returns
+    -------
+    tuple
+        Arrays of the absolute and relative errors; equal infinite values
+        (e.g. moment ratios without overturning moment) have no error
+    """
+    ref = np.asarray(ref, dtype = float)
+    value = np.asarray(value, dtype = float)
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        abs_err = np.where(ref == value, 0, np.abs(value - ref))
+        rel_err = np.where(abs_err == 0, 0, abs_err / np.abs(ref))
+    return abs_err, rel_err
+
+def discretization(pillars, increments = (0.02, 0.01), **kwargs):
+    """
+    Discretization study of the uplift: the reference (strips of
+    Opptrykk.increment) compared with narrower strips (see
+    refined_uplift()), accepted with DISCRETIZATION_TOLERANCES
+    
+    Parameters
+    ----------
+    pillars : list
+        List of instances of Pillar
+    increments : tuple, optional
+        Strip widths; the default is (0.02, 0.01),
+        unit: m
+    **kwargs
+        Keyword arguments of Harness (levels, ice, uplift)
+    
+    Returns
+    -------
+    instance of Harness
+    """
+    engines = {f'Opptrykk {i} m': refined_uplift(i) for i in increments}
+    return Harness(pillars, engines = engines,
+                   tolerances = DISCRETIZATION_TOLERANCES, **kwargs)
+
+class Harness:
+    """
+    Differential harness: the reference implementation and accelerated
+    paths (engines) are run on the same pillars and water levels (e.g. the
+    dam of dam_setup and randomized synthetic profiles, see
+    synthetic_pillars()); the errors of every quantity are reported as
+    distributions together with the run times, and accepted by tolerance
+    (|error| <= rtol * |reference| + atol)
+    """
+    
+    def __init__(self, pillars, levels = None, ice = 100, uplift = 1,
+                 engines = None, tolerances = None, reference = reference):
+        """
+        Parameters
+        ----------
+        pillars : list
+            List of instances of Pillar
+        levels : list, optional
+            Water levels; the default is a range per pillar, see
+            default_levels()
+        ice : float, optional
+            Ice load; the default is 100,
+            unit: kN/m
+        uplift : float, optional
+            Uplift factor; the default is 1
+        engines : dict, optional
+            Accelerated paths by name, functions (pillar, levels, ice,
+            uplift) that return a dict of quantities (keys: QUANTITIES,
+            missing quantities are not compared); the default is ENGINES
+        tolerances : dict, optional
+            Tolerances (rtol, atol) per quantity, or per engine and
+            quantity; the default is TOLERANCES
+        reference : function, optional
+            Reference implementation; the default is reference()
+        
+        Returns
+        -------
+        None.
+        
+        """
+        self.pillars = pillars
+        self.levels = levels
+        self.ice = ice
+        self.uplift = uplift
+        self.engines = ENGINES if engines is None else engines
+        self.tolerances = TOLERANCES if tolerances is None else tolerances
+        self.reference = reference
+        self.results = None
+    
+    def tolerance(self, engine, quantity):
+        tol = self.tolerances.get(engine, self.tolerances)
+        return tol.get(quantity, TOLERANCES[quantity])
+    
+    def run(self):
+        """
+        Run the reference and all engines on all pillars
+        
+        Returns
+        -------
+        pandas.DataFrame
+            Per engine and quantity: number of values, median, 95 %
+            quantile and largest relative error, largest absolute error
+            (with pillar and water level), share of values within
+            tolerance, acceptance, run time and speed-up relative to the
+            reference
+        """
+        names = ['Referanse'] + list(self.engines)
+        funcs = [self.reference] + list(self.engines.values())
+        times = dict.fromkeys(names, 0.)
+        values = {name: [] for name in names}
+        where = []
+        
+        for p in self.pillars:
+            levels = (default_levels(p) if self.levels is None
+                      else self.levels)
+            for name, func in zip(names, funcs):
+                start = time.perf_counter()
+                values[name].append(func(p, levels, self.ice, self.uplift))
+                times[name] += time.perf_counter() - start
+            where += [(p.name, level) for level in levels]
+        
+        rows = []
+        for name in self.engines:
+            for q in QUANTITIES:
+                if q not in values[name][0]:
+                    continue
+                ref = np.concatenate([v[q] for v in values['Referanse']])
+                val = np.concatenate([v[q] for v in values[name]])
+                abs_err, rel_err = errors(ref, val)
+                rtol, atol = self.tolerance(name, q)
+                with np.errstate(invalid = 'ignore'):
+                    within = abs_err <= rtol * np.abs(ref) + atol
+                worst = int(np.nanargmax(abs_err)) if len(abs_err) else 0
+                rows.append([
+                    name, q, len(ref), np.nanmedian(rel_err),
+                    np.nanquantile(rel_err, 0.95), np.nanmax(rel_err),
+                    abs_err[worst], where[worst][0],
+                    round(where[worst][1], 3), within.mean(),
+                    bool(within.all()), times[name],
+                    times['Referanse'] / times[name]
+                    ])
+        self.results = pd.DataFrame(rows, columns = [
+            'Motor', 'Storrelse', 'Antall', 'Median rel. feil',
+            'P95 rel. feil', 'Maks rel. feil', 'Maks abs. feil',
+            'Damseksjon', 'Vannstand', 'Andel ok', 'Ok', 'Tid (s)',
+            'Hastighet'
+            ])
+        return self.results
+    
+    def accepted(self, engine = None):
+        """
+        Returns
+        -------
+        bool
+            True if all quantities of an engine (default: all engines) are
+            within tolerance, see run()
+        """
+        if self.results is None:
+            self.run()
+        res = self.results
+        if engine is not None:
+            res = res[res['Motor'] == engine]
+        return bool(res['Ok'].all())
@@ -0,0 +1,392 @@
+import evaluation, loadcase, stability, dam, manifest, snapshot
+
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import importlib
+import threading
+import multiprocessing
+
+class JobStore:
+    """
+    Durable store of work units (SQLite file). A job, e.g. the evaluation of
+    a portfolio of dams or a long level sweep, is split into units; workers
+    (processes, possibly on several machines with a shared file system)
+    claim units with a lease, store the result of every unit as soon as it
+    is finished and claim units whose lease has expired (crashed workers).
+    After an interruption, only units without result are calculated again.
+    Results are returned in unit order, independent of the order in which
+    they were calculated.
+    """
+    
+    def __init__(self, file_name, lease = 600, timeout = 60):
+        """
+        Parameters
+        ----------
+        file_name : string
+            Path of the SQLite file, created if it does not exist
+        lease : positive float, optional
+            Time a claimed unit is reserved for a worker; the default is
+            600,
+            unit: s
+        timeout : positive float, optional
+            Time to wait for a lock held by another worker; the default is
+            60,
+            unit: s
+        
+        Returns
+        -------
+        None.
+        
+        """
+        self.file_name = file_name
+        self.lease = lease
+        self.con = sqlite3.connect(
+            file_name, timeout = timeout, isolation_level = None
+            )
+        self.con.execute(
+            'CREATE TABLE IF NOT EXISTS units ('
+            'job TEXT, idx INTEGER, task TEXT, payload TEXT, '
+            "status TEXT DEFAULT 'pending', worker TEXT, lease_until REAL, "
+            'attempts INTEGER DEFAULT 0, result TEXT, '
+            'PRIMARY KEY (job, idx))'
+            )
+    
+    def add(self, job, task, payloads):
+        """
+        Add the units of a job; units that already exist (same job and
+        index) are kept with their results, so adding a job again after an
+        interruption does not redo finished work
+        
+        Parameters
+        ----------
+        job : string
+            Name of the job
+        task : string
+            Name of the task that calculates a unit, see TASKS
+        payloads : list
+            Input of every unit (json serializable)
+        
+        Returns
+        -------
+        int
+            Number of units added
+        
+        Raises
+        ------
+        ValueError
+            If the job exists with other units (task, payload or number of
+            units), whose results would be returned for the new units
+        """
+        rows = [(job, idx, task, json.dumps(payload, sort_keys = True))
+                for idx, payload in enumerate(payloads)]
+        self.con.execute('BEGIN IMMEDIATE')
+        try:
+            stored = {idx: (t, payload) for idx, t, payload in
+                      self.con.execute(
+                          'SELECT idx, task, payload FROM units '
+                          'WHERE job = ?', (job, )
+                          )}
+            changed = [idx for _, idx, t, payload in rows
+                       if stored.get(idx, (t, payload)) != (t, payload)]
+            if changed or len(stored) > len(rows):
+                raise ValueError(f'Job {job} exists with other units, use '
+                                 f'another job name')
+            before = self.con.total_changes
+            self.con.executemany(
+                'INSERT OR IGNORE INTO units (job, idx, task, payload) '
+                'VALUES (?, ?, ?, ?)', rows
+                )
+            added = self.con.total_changes - before
+        except Exception:
+            self.con.execute('ROLLBACK')
+            raise
+        self.con.execute('COMMIT')
+        return added
+    
+    def claim(self, job, worker, n = 1):
+        """
+        Claim up to n pending units or units with expired lease
+        
+        Returns
+        -------
+        list
+            Claimed units as tuples (index, task, payload)
+        """
+        now = time.time()
+        self.con.execute('BEGIN IMMEDIATE')
+        rows = self.con.execute(
+            'SELECT idx, task, payload FROM units WHERE job = ? AND '
+            "(status = 'pending' OR (status = 'claimed' AND lease_until < ?)) "
+            'ORDER BY idx LIMIT ?', (job, now, n)
+            ).fetchall()
+        self.con.executemany(
+            "UPDATE units SET status = 'claimed', worker = ?, "
+            'lease_until = ?, attempts = attempts + 1 '
+            'WHERE job = ? AND idx = ?',
+            [(worker, now + self.lease, job, idx) for idx, _, _ in rows]
+            )
+        self.con.execute('COMMIT')
+        return [(idx, task, json.loads(payload))
+                for idx, task, payload in rows]
+    
+    def renew(self, job, worker, idx = None):
+        """
+        Extend the lease of a claimed unit (default: of all units claimed
+        by the worker), e.g. during a long calculation
+        
+        Returns
+        -------
+        int
+            Number of units whose lease was extended (0 if the unit has been
+            claimed by another worker in the meantime)
+        """
+        sql = ('UPDATE units SET lease_until = ? '
+               "WHERE job = ? AND worker = ? AND status = 'claimed'")
+        args = (time.time() + self.lease, job, worker)
+        if idx is not None:
+            sql += ' AND idx = ?'
+            args += (idx, )
+        return self.con.execute(sql, args).rowcount
+    
+    def complete(self, job, worker, idx, result):
+        """
+        Store the result of a unit (checkpoint); only the worker that holds
+        the unit stores its result, the result of a unit that has been
+        claimed or finished by another worker in the meantime is not stored
+        
+        Returns
+        -------
+        bool
+            True if the result was stored
+        """
+        cur = self.con.execute(
+            "UPDATE units SET status = 'done', result = ?, lease_until = NULL "
+            "WHERE job = ? AND idx = ? AND worker = ? AND status = 'claimed'",
+            (json.dumps(result, default = float), job, idx, worker)
+            )
+        return cur.rowcount == 1
+    
+    def progress(self, job):
+        """
+        Returns
+        -------
+        dict
+            Number of units per status (pending, claimed, done)
+        """
+        rows = self.con.execute(
+            'SELECT status, COUNT(*) FROM units WHERE job = ? '
+            'GROUP BY status', (job, )
+            ).fetchall()
+        counts = {'pending': 0, 'claimed': 0, 'done': 0}
+        counts.update(dict(rows))
+        return counts
+    
+    def results(self, job):
+        """
+        Returns
+        -------
+        list
+            Results of all units in unit order (None for units that are not
+            finished)
+        """
+        rows = self.con.execute(
+            'SELECT result FROM units WHERE job = ? ORDER BY idx', (job, )
+            ).fetchall()
+        return [None if r is None else json.loads(r) for r, in rows]
+    
+    def close(self):
+        self.con.close()
+
+def heartbeat(file_name, job, worker, stop, lease):
+    #renew the leases of all units claimed by a worker three times per lease
+    #until stop is set (own connection, see run_worker)
+    store = JobStore(file_name, lease)
+    try:
+        while not stop.wait(lease / 3):
+            store.renew(job, worker)
+    finally:
+        store.close()
+
+#dams of the setup modules, loaded once per worker process
+_dams = {}
+
+def setup_dam(setup):
+    #returns the dam of a setup module (e.g. dam_setup) or of a snapshot
+    #file (see snapshot.py, the geometry is not prepared again in every
+    #worker) by pillar name
+    if setup not in _dams:
+        if setup.endswith(snapshot.SUFFIX):
+            pillars = snapshot.read(setup).dam.pillars
+        else:
+            pillars = importlib.import_module(setup).dam_construction.pillars
+        _dams[setup] = {p.name: p for p in pillars}
+    return _dams[setup]
+
+def evaluate_unit(payload):
+    """
+    Task 'evaluate': result record of a pillar in several load cases (see
+    Evaluation.evaluate_pillar); payload: 'setup' (module with
+    dam_construction or snapshot file), 'pillar' (name), 'cases' (see
+    case_payload)
+    """
+    p = setup_dam(payload['setup'])[payload['pillar']]
+    cases = [loadcase.LoadCase(*c) for c in payload['cases']]
+    ev = evaluation.Evaluation(dam.Dam([p]), cases)
+    record = ev.evaluate_pillar(p)
+    record['setup'] = payload['setup']
+    return record
+
+def sweep_unit(payload):
+    """
+    Task 'sweep': stability coefficients of a pillar for a list of water
+    levels; payload: 'setup', 'pillar', 'levels', 'ice', 'uplift'
+    """
+    p = setup_dam(payload['setup'])[payload['pillar']]
+    d = dam.Dam([p])
+    gl, vm, vr = [], [], []
+    for level in payload['levels']:
+        stab = stability.Stability(
+            d, level, payload['ice'], payload['uplift']
+            )
+        gl.append(stab.glidning()[0])
+        vm.append(stab.velting_moment()[0])
+        vr.append(stab.velting_resultant()[0])
+    return {'pillar': p.name, 'levels': payload['levels'],
+            'glidning': gl, 'velting_moment': vm, 'velting_resultant': vr}
+
+#tasks by name; a task calculates the result (json serializable) of one
+#unit from its payload, further tasks (e.g. Monte Carlo samples) can be
+#added with the same signature
+TASKS = {'evaluate': evaluate_unit, 'sweep': sweep_unit}
+
+def case_payload(case):
+    return manifest.case_fingerprint(case)
+
+def evaluation_job(store, job, setups, levels):
+    """
+    Add a portfolio evaluation: one unit per pillar of every dam
+    
+    Parameters
+    ----------
+    store : instance of JobStore
+    job : string
+        Name of the job
+    setups : list
+        Names of setup modules, each with a dam (dam_construction), or
+        paths of snapshots (see snapshot.py)
+    levels : list
+        Load cases or water levels, see Evaluation
+    
+    Returns
+    -------
+    int
+        Number of units added
+    """
+    cases = [case_payload(c) for c in loadcase.as_cases(levels)]
+    payloads = [{'setup': s, 'pillar': name, 'cases': cases}
+                for s in setups for name in setup_dam(s)]
+    return store.add(job, 'evaluate', payloads)
+
+def sweep_job(store, job, setup, levels, ice = 0, uplift = 1, size = 50):
+    """
+    Add a level sweep: units of at most size water levels per pillar
+    
+    Returns
+    -------
+    int
+        Number of units added
+    """
+    levels = list(levels)
+    payloads = [{'setup': setup, 'pillar': name,
+                 'levels': levels[i:i + size], 'ice': ice, 'uplift': uplift}
+                for name in setup_dam(setup)
+                for i in range(0, len(levels), size)]
+    return store.add(job, 'sweep', payloads)
+
+def run_worker(file_name, job, worker = None, batch = 1):
+    """
+    Claim and calculate units of a job until no unit is left; every result
+    is stored as soon as its unit is finished. While the worker calculates,
+    the leases of all its claimed units are renewed (see heartbeat), units
+    that have been claimed by another worker in the meantime are skipped
+    
+    Parameters
+    ----------
+    file_name : string
+        Path of the job store
+    job : string
+        Name of the job
+    worker : string, optional
+        Name of the worker; the default is host name and process id
+    batch : positive int, optional
+        Number of units claimed at once; the default is 1
+    
+    Returns
+    -------
+    int
+        Number of units calculated by this worker
+    """
+    if worker is None:
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+    store = JobStore(file_name)
+    stop = threading.Event()
+    beat = threading.Thread(target = heartbeat, daemon = True, args = (
+        file_name, job, worker, stop, store.lease
+        ))
+    beat.start()
+    done = 0
+    try:
+        while True:
+            units = store.claim(job, worker, batch)
+            if not units:
+                break
+            for idx, task, payload in units:
+                if not store.renew(job, worker, idx):
+                    continue
+                result = TASKS[task](payload)
+                if store.complete(job, worker, idx, result):
+                    done += 1
+    finally:
+        stop.set()
+        beat.join()
+        store.close()
+    return done
+
+def run_workers(file_name, job, processes = None, batch = 1):
+    """
+    Calculate a job with several worker processes on this machine; further
+    workers may be started on other machines (python jobs.py file job)
+    
+    Returns
+    -------
+    int
+        Number of units calculated
+    """
+    if processes is None:
+        processes = os.cpu_count()
+    with multiprocessing.Pool(processes) as pool:
+        counts = pool.starmap(
+            run_worker, [(file_name, job, None, batch)] * processes
+            )
+    return sum(counts)
+
+def merge_evaluation(results):
+    """
+    Merge the results of an evaluation job to one overview, in the same
+    order as Evaluation.glidning() + Evaluation.velting() (load case, then
+    pillar in unit order)
+    
+    Returns
+    -------
+    list
+        Rows with the columns of evaluation.HEADER
+    """
+    return evaluation.merge_records(results)
+
+if __name__ == '__main__':
+    #worker: python jobs.py <job store> <job>
+    print(f'{run_worker(sys.argv[1], sys.argv[2])} units calculated')
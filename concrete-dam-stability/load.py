@@ -2,9 +2,7 @@
 #- inheritance: parent class Load
 #-------------
 
-from shapely.geometry import (
-    Polygon, Point, MultiPoint, LineString, MultiLineString
-    )
+from shapely.geometry import Polygon, Point
 from shapely.ops import unary_union
 
 from segment import Segment
@@ -143,66 +141,74 @@ class Vanntrykk:
 class Opptrykk:
     """
     This class creates a list of instances of the class Segment by incremently
-    advancing along the dam sole and measuring the width of the increment
+    advancing along the dam sole and measuring the width of the increment;
+    the uplift factor scales the uplift pressure (e.g. drained foundations).
+    Load and centroid are calculated directly from the strips of the sole
+    (triangles with a common apex), without creating the segments
     
     """
     
-    def __init__(self, dam, level, g_water = 9.81):
+    increment = 0.05
+    
+    def __init__(self, dam, level, g_water = 9.81, uplift = 1,
+                 increment = None):
         self.dam = dam
         self.level = level
         self.g_water = g_water
+        self.uplift = uplift
+        if increment is not None:
+            #strip width of this instance, the class default is kept
+            self.increment = increment
         
+    def strips(self):
+        #area and x-coordinate of the centroid of the uplift triangle of
+        #every strip, per pillar (see draw())
+        strip_list = []
+        for p in self.dam.pillars:
+            left_contact = p.left_contact()
+            height = abs(self.level - left_contact.y)
+            strip_list.append(
+                [(abs(p2_x - p1_x) * height / 2,
+                  (left_contact.x + p1_x + p2_x) / 3)
+                 for p1_x, p2_x, axis in p.cutting_strips(self.increment)]
+                )
+        return strip_list
+    
     def draw(self):
-        increment = 0.05
+        increment = self.increment
         op_list = []
         for p in self.dam.pillars:
             left_contact, right_contact = p.left_contact(), p.right_contact()
             y = min(left_contact.y, right_contact.y)
             p0 = (left_contact.x, y - (self.level - left_contact.y))
             segments = []
-            surface = p.cutting_surface()
-            minx, miny, maxx, maxy = surface.bounds
-            line = LineString([(minx, miny), (maxx, miny)])
-            count = 0
-            new_axis = p.axis() - (maxy - miny) / 2 + increment / 2
-            while line.intersects(surface):
-                count += 1
-                intersec = line.intersection(surface)
-                if type(intersec) == LineString:
-                    intersec = MultiLineString([intersec])
-                if type(intersec) not in (Point, MultiPoint):
-                    intersec = intersec[0]
-                    p1, p2 = intersec.coords
-                    p1_x, p2_x = p1[0], p2[0]
-                    p1, p2 = (p1_x, y), (p2_x, y)
-                    poly = Polygon([p0, p1, p2])
-                    segments.append(
-                        Segment(
-                            poly, increment, self.g_water, new_axis, 'Opptrykk'
-                            )
+            for p1_x, p2_x, axis in p.cutting_strips(increment):
+                p1, p2 = (p1_x, y), (p2_x, y)
+                poly = Polygon([p0, p1, p2])
+                segments.append(
+                    Segment(
+                        poly, increment, self.g_water * self.uplift,
+                        axis, 'Opptrykk'
                         )
-                new_y = miny + count * increment
-                line = LineString([(minx, new_y), (maxx, new_y)])
-                new_axis += increment
+                    )
             op_list.append(segments)
         return op_list
     
     def calc_centroid(self):
-        op_list = self.draw()
         centr_list = []
-        for op, pillar in zip(op_list, self.dam.pillars):
+        for strips, pillar in zip(self.strips(), self.dam.pillars):
             left_y = pillar.left_contact().y
-            area_i = [i.area() for i in op]
-            x_i = [i.centroid().x for i in op]
+            area_i = [a for a, x in strips]
+            x_i = [x for a, x in strips]
             xs = sum([a * b for a, b in zip(area_i, x_i)]) / sum(area_i)
             centr_list.append(Point(xs, left_y))
         return centr_list
     
     def calc_load(self):
-        op_list = self.draw()
         load_list = []
-        for op in op_list:
-            load_list.append(- sum([i.load() for i in op]))
+        for strips in self.strips():
+            load_list.append(- sum([a * self.increment * self.g_water
+                                    * self.uplift for a, x in strips]))
         return load_list
     
 class Overtopping:
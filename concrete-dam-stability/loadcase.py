@@ -0,0 +1,107 @@
+import stability
+
+class LoadCase:
+    """
+    A load case combines a water level with an ice load and an uplift
+    factor; the threshold class selects the threshold values of the
+    evaluation (see evaluation.THRESHOLDS)
+    """
+    
+    def __init__(self, name, level, ice = 0, uplift = 1,
+                 threshold_class = 'normal'):
+        """
+        Parameters
+        ----------
+        name : string
+            Name of the load case, e.g. 'HRV + is'
+        level : float
+            Water level,
+            unit: masl
+        ice : float, optional
+            Ice load; the default is 0,
+            unit: kN/m
+        uplift : float, optional
+            Uplift factor (share of the full uplift); the default is 1
+        threshold_class : string, optional
+            'normal' or 'ulykke' (accidental load case); the default is
+            'normal'
+        
+        Returns
+        -------
+        None.
+        
+        """
+        self.name = name
+        self.level = level
+        self.ice = ice
+        self.uplift = uplift
+        self.threshold_class = threshold_class
+    
+    def stability(self, dam):
+        """
+        Returns
+        -------
+        instance of Stability
+            Stability of dam in this load case
+        
+        """
+        return stability.Stability(dam, self.level, self.ice, self.uplift)
+    
+    def __repr__(self):
+        return (f'LoadCase({self.name!r}, {self.level}, ice = {self.ice}, '
+                f'uplift = {self.uplift}, '
+                f'threshold_class = {self.threshold_class!r})')
+
+def from_levels(levels, ice = 100):
+    """
+    Create the default load cases from a list of water levels: the lowest
+    level with ice load (HRV + is), the highest level as accidental load case
+    (MFV), any other level as design flood level (DFV); names that occur
+    more than once are numbered (DFV 1, DFV 2, ...)
+    
+    Returns
+    -------
+    list
+        List of instances of LoadCase (same order as levels)
+    """
+    cases = []
+    for level in levels:
+        if level == max(levels):
+            cases.append(LoadCase('MFV', level, threshold_class = 'ulykke'))
+        elif level == min(levels):
+            cases.append(LoadCase('HRV + is', level, ice = ice))
+        else:
+            cases.append(LoadCase('DFV', level))
+    
+    names = [c.name for c in cases]
+    counts = {}
+    for c in cases:
+        if names.count(c.name) > 1:
+            counts[c.name] = counts.get(c.name, 0) + 1
+            c.name = f'{c.name} {counts[c.name]}'
+    return cases
+
+def as_cases(levels):
+    """
+    Returns
+    -------
+    list
+        levels if it is a list of load cases, otherwise the default load
+        cases of the water levels (see from_levels)
+    
+    Raises
+    ------
+    ValueError
+        If several load cases have the same name (outputs and results are
+        identified by the name of the load case)
+    """
+    if all(isinstance(i, LoadCase) for i in levels):
+        cases = list(levels)
+    else:
+        cases = from_levels(levels)
+    names = [c.name for c in cases]
+    repeated = sorted({n for n in names if names.count(n) > 1})
+    if repeated:
+        raise ValueError(f"Load case names must be unique: "
+                         f"{', '.join(repeated)}")
+    return cases
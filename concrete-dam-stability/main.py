@@ -1,4 +1,4 @@
-import dam_setup, report, export
+import dam_setup, pipeline, runcontext
 import time
 
 def main():
@@ -10,13 +10,18 @@ def main():
     start_time = time.time()
     print(f'Started at {time.ctime()}')
     
-    #load dam and levels from setup.py
+    #load dam and load cases from setup.py
     dam = dam_setup.dam_construction
-    levels = dam_setup.levels
+    cases = dam_setup.cases
 
-    #stability analysis & reports
-    print(report.Report(dam, levels).create_report()) #create reports
-    print(export.Export(dam, levels).export()) #export data to dynamo
+    #outputs are written to ../result and ../export
+    context = runcontext.RunContext('..')
+    
+    #stability analysis & reports; report and export (data to dynamo) are
+    #calculated as one task graph, shared tasks only once
+    for message in pipeline.Pipeline(dam, cases, context).run('report',
+                                                              'export'):
+        print(message)
     
     #end timer, print run time
     time_diff = round(time.time() - start_time, 2)
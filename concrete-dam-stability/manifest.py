@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import threading
+
+#version of the output format; increase to regenerate all outputs, e.g.
+#after a change of the calculation or the page layout
+VERSION = 1
+
+def pillar_fingerprint(p):
+    """
+    Returns
+    -------
+    list
+        All inputs of pillar p that affect its results: attributes of the
+        pillar and geometry and material of its segments
+    """
+    segs = [[s.name, s.width, s.spec_weight, s.axis,
+             list(s.poly.exterior.coords)] for s in p.segments]
+    return [p.name, p.dam_type, p.phi, p.crest_width, p.contact_l,
+            p.contact_r, segs]
+
+def case_fingerprint(case):
+    """
+    Returns
+    -------
+    list
+        Parameters of a load case (see LoadCase)
+    """
+    return [case.name, case.level, case.ice, case.uplift,
+            case.threshold_class]
+
+def digest(*parts):
+    """
+    Returns
+    -------
+    string
+        Content hash (sha256) of parts; parts are lists, dicts, strings or
+        numbers
+    """
+    data = json.dumps([VERSION, parts], sort_keys = True, default = repr)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+def frame_digest(df):
+    """
+    Returns
+    -------
+    string
+        Content hash (sha256) of the data of a pandas.DataFrame
+    """
+    return digest(df.columns.tolist(), df.to_numpy().tolist())
+
+class Manifest:
+    """
+    Content hashes of generated outputs (report pages, images, export
+    files), stored as json file next to the outputs. An output is only
+    regenerated if the hash of its inputs or data differs from the hash
+    recorded at the last run, or if the output file is missing.
+    """
+    
+    def __init__(self, file_name):
+        """
+        Parameters
+        ----------
+        file_name : string
+            Path of the manifest (json file)
+        
+        Returns
+        -------
+        None.
+        
+        """
+        self.file_name = file_name
+        #nodes of a task graph update a manifest from several threads
+        self.lock = threading.Lock()
+        if os.path.exists(file_name):
+            with open(file_name, encoding = 'utf-8') as f:
+                self.hashes = json.load(f)
+        else:
+            self.hashes = {}
+    
+    def is_current(self, key, value, *paths):
+        """
+        Parameters
+        ----------
+        key : string
+            Name of the output
+        value : string
+            Content hash of the inputs or data of the output
+        *paths : string
+            Files of the output, all of them have to exist
+        
+        Returns
+        -------
+        bool
+            True if the output is up to date
+        """
+        with self.lock:
+            current = self.hashes.get(key) == value
+        return current and all(os.path.exists(i) for i in paths)
+    
+    def update(self, key, value):
+        with self.lock:
+            self.hashes[key] = value
+    
+    def save(self):
+        directory = os.path.dirname(self.file_name)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with self.lock, open(self.file_name, 'w', encoding = 'utf-8') as f:
+            json.dump(self.hashes, f, indent = 1, sort_keys = True)
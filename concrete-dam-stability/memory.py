@@ -0,0 +1,119 @@
+import evaluation, export, report, runcontext
+
+import time
+import shutil
+import tempfile
+import contextlib
+import tracemalloc
+import pandas as pd
+
+class Tracker:
+    """
+    Memory accounting of the stages of an analysis (Python allocations,
+    traced with tracemalloc): per stage the peak (largest memory in use
+    during the stage, above the memory in use at its start) and the
+    retained memory (memory still in use at its end, e.g. results and
+    cached geometry). Stages may be nested.
+    """
+    
+    def __init__(self):
+        self.rows = []
+        self.stack = []
+    
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Context manager of a stage, e.g.
+        with tracker.stage('Evaluering'):
+            ...
+        """
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        current, peak = tracemalloc.get_traced_memory()
+        #the peak of the enclosing stage is kept before it is reset
+        if self.stack:
+            self.stack[-1][1] = max(self.stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        entry = [current, current]
+        self.stack.append(entry)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            end, peak = tracemalloc.get_traced_memory()
+            peak = max(entry[1], peak)
+            self.stack.pop()
+            if self.stack:
+                self.stack[-1][1] = max(self.stack[-1][1], peak)
+            self.rows.append([name, len(self.stack), (peak - entry[0]) / 1e6,
+                              (end - entry[0]) / 1e6, seconds])
+            if started:
+                tracemalloc.stop()
+    
+    def table(self):
+        """
+        Returns
+        -------
+        pandas.DataFrame
+            Stages in the order they were finished: name, nesting depth,
+            peak and retained memory (MB), time (s)
+        """
+        return pd.DataFrame(self.rows, columns = [
+            'Trinn', 'Nivaa', 'Topp (MB)', 'Beholdt (MB)', 'Tid (s)'
+            ])
+
+def profile(dam, levels, context = None, bounded = False, tracker = None):
+    """
+    Memory accounting of the stages of an analysis: evaluation, export
+    (Export.export) and summary tables of the report
+    (Report.create_level_tables)
+    
+    Parameters
+    ----------
+    dam : instance of Dam
+    levels : list
+        Load cases or water levels, see Evaluation
+    context : instance of RunContext, optional
+        Output root of the export; the default is a temporary directory
+        (removed afterwards), the export is written with force = True
+    bounded : bool, optional
+        Bounded-memory mode: pillars are processed and released one by one
+        (see Export.export); the default is False
+    tracker : instance of Tracker, optional
+        The default is a new tracker
+    
+    Returns
+    -------
+    pandas.DataFrame
+        See Tracker.table
+    """
+    if tracker is None:
+        tracker = Tracker()
+    root = None
+    if context is None:
+        root = tempfile.mkdtemp()
+        context = runcontext.RunContext(root)
+    ev = evaluation.Evaluation(dam, levels)
+    
+    try:
+        with tracker.stage('Evaluering'):
+            if bounded:
+                rows = evaluation.merge_records(ev.iter_pillars())
+            else:
+                rows = ev.glidning() + ev.velting()
+        del rows
+        
+        with tracker.stage('Eksport'):
+            export.Export(dam, levels, context).export(force = True,
+                                                       bounded = bounded)
+        
+        with tracker.stage('Tabeller'):
+            tables = report.Report(dam, levels,
+                                   context).create_level_tables()
+        del tables
+    finally:
+        if root is not None:
+            shutil.rmtree(root, ignore_errors = True)
+    return tracker.table()
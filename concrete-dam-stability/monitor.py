@@ -0,0 +1,345 @@
+import evaluation, loadcase, response, runcontext
+
+import json
+import time
+import asyncio
+import collections
+import numpy as np
+
+def uplift_factor(pillar, level, piezometer):
+    """
+    Uplift factor of a pillar from a piezometer reading. The uplift of the
+    model (Opptrykk, uplift factor 1) corresponds to a mean pressure head
+    of half the water depth above the upstream contact along the sole;
+    the uplift factor is the measured pressure head above the sole relative
+    to this head
+    
+    Parameters
+    ----------
+    pillar : instance of Pillar
+    level : float
+        Water level,
+        unit: masl
+    piezometer : float
+        Piezometric level below the pillar,
+        unit: masl
+    
+    Returns
+    -------
+    float
+        Uplift factor (not negative)
+    """
+    left, right = pillar.left_contact(), pillar.right_contact()
+    head = (level - left.y) / 2
+    if head <= 0:
+        return 0.
+    return max(piezometer - min(left.y, right.y), 0) / head
+
+def parse(line):
+    """
+    Returns
+    -------
+    dict
+        Reading of a line: a json object with 'level' and optionally
+        'time', 'uplift' (factor, number or per pillar) and 'piezometer'
+        (piezometric levels per pillar), or comma separated values
+        time, level[, uplift]; None for empty lines
+    
+    Raises
+    ------
+    ValueError
+        If the line is no reading
+    """
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith('{'):
+        reading = json.loads(line)
+        if not isinstance(reading, dict) or 'level' not in reading:
+            raise ValueError('No level in reading')
+        return reading
+    values = line.split(',')
+    if len(values) < 2:
+        raise ValueError('No level in reading')
+    reading = {'time': values[0], 'level': float(values[1])}
+    if len(values) > 2:
+        reading['uplift'] = float(values[2])
+    return reading
+
+class Monitor:
+    """
+    Online monitoring of a dam: every reading (water level, uplift factors
+    or piezometer readings) updates the stability coefficients of all
+    pillars, an alert is emitted when a coefficient crosses its threshold
+    (see Evaluation.threshold), in both directions.
+    Updates are incremental: the level-dependent loads are evaluated with
+    the precomputed level response of every pillar (see response.py, no
+    geometry is drawn) and kept per pillar; if only the uplift changes,
+    the uplift load of the kept loads is scaled. The current coefficients
+    are kept in factors (per pillar and mode).
+    """
+    
+    def __init__(self, dam, ice = 0, threshold_class = 'normal',
+                 thresholds = None, responses = None, context = None):
+        """
+        Parameters
+        ----------
+        dam : instance of Dam
+        ice : float, optional
+            Ice load; the default is 0,
+            unit: kN/m
+        threshold_class : string, optional
+            'normal' or 'ulykke'; the default is 'normal'
+        thresholds : dict, optional
+            Threshold values, see evaluation.THRESHOLDS
+        responses : list, optional
+            Level responses of the pillars (see response.build); the
+            default is to build them
+        context : instance of RunContext, optional
+            Logger of the alerts
+        
+        Returns
+        -------
+        None.
+        
+        """
+        self.dam = dam
+        self.case = loadcase.LoadCase('Overvaaking', None, ice, 1,
+                                      threshold_class)
+        self.evaluation = evaluation.Evaluation(dam, [self.case],
+                                                thresholds)
+        if responses is None:
+            responses = response.build(dam)
+        self.responses = responses
+        if context is None:
+            context = runcontext.RunContext()
+        self.context = context
+        self.loads = {}
+        self.uplift = {p.name: 1. for p in dam.pillars}
+        self.state = {}
+        self.factors = {}
+        self.latency = collections.deque(maxlen = 1000)
+        self.updates = 0
+        self.skipped = 0
+    
+    def uplifts(self, reading):
+        #uplift factor per pillar of a reading; pillars without reading
+        #keep their last factor
+        level = reading['level']
+        uplift = reading.get('uplift')
+        piezometer = reading.get('piezometer', {})
+        factors = {}
+        for p in self.dam.pillars:
+            if p.name in piezometer:
+                factors[p.name] = uplift_factor(p, level,
+                                                piezometer[p.name])
+            elif isinstance(uplift, dict):
+                factors[p.name] = uplift.get(p.name, self.uplift[p.name])
+            elif uplift is not None:
+                factors[p.name] = uplift
+            else:
+                factors[p.name] = self.uplift[p.name]
+        return factors
+    
+    def update(self, reading):
+        """
+        Update the stability coefficients with a reading
+        
+        Parameters
+        ----------
+        reading : dict
+            See parse()
+        
+        Returns
+        -------
+        list
+            Alerts: dicts with 'time', 'pillar', 'mode' (Glidning,
+            Velting), 'coefficient', 'margin' and 'state' (ok/ ikke ok)
+        """
+        start = time.perf_counter()
+        level = float(reading['level'])
+        factors = self.uplifts(reading)
+        alerts = []
+        
+        for p, resp in zip(self.dam.pillars, self.responses):
+            old = self.loads.get(p.name)
+            if old is not None and old[0] == level:
+                if self.uplift[p.name] == factors[p.name]:
+                    continue
+                loads = old[1]
+            else:
+                loads = resp.loads(level, self.case.ice, 1)
+                self.loads[p.name] = (level, loads)
+            self.uplift[p.name] = factors[p.name]
+            
+            scaled = loads.copy()
+            scaled[4] *= factors[p.name]
+            gl, vm, vr = response.coefficients(scaled, resp.pivot,
+                                               resp.alpha, resp.phi)
+            coeffs = {'Glidning': float(gl),
+                      'Velting': float(vr if p.dam_type.startswith('Gr')
+                                       else vm)}
+            self.factors[p.name] = coeffs
+            margins = {
+                'Glidning': self.evaluation.glidning_margin(self.case, p, gl),
+                'Velting': self.evaluation.velting_margin(self.case, p, vm,
+                                                          vr)
+                }
+            for mode, margin in margins.items():
+                ok = bool(margin >= 0)
+                if self.state.get((p.name, mode), True) != ok:
+                    alerts.append({'time': reading.get('time'),
+                                   'pillar': p.name, 'mode': mode,
+                                   'coefficient': round(coeffs[mode], 3),
+                                   'margin': round(float(margin), 3),
+                                   'state': 'ok' if ok else 'ikke ok'})
+                self.state[(p.name, mode)] = ok
+        
+        self.updates += 1
+        self.latency.append(time.perf_counter() - start)
+        return alerts
+    
+    def alert(self, alert):
+        #default handler of alerts
+        self.context.info(f"{alert['time']}: {alert['pillar']} "
+                          f"{alert['mode']} {alert['coefficient']} "
+                          f"(margin {alert['margin']}) - {alert['state']}")
+    
+    async def run(self, source, on_alert = None):
+        """
+        Consume readings of a source until it is exhausted
+        
+        Parameters
+        ----------
+        source : async iterable
+            Readings or lines of readings (see parse()), see
+            socket_source(), tail_source() and simulated_source(); lines
+            and readings that cannot be read (e.g. a glitch of the data
+            logger) are logged and skipped
+        on_alert : callable, optional
+            Called with every alert; the default is alert()
+        
+        Returns
+        -------
+        int
+            Number of alerts
+        """
+        if on_alert is None:
+            on_alert = self.alert
+        count = 0
+        async for item in source:
+            try:
+                reading = parse(item) if isinstance(item, str) else item
+                if reading is None:
+                    continue
+                alerts = self.update(reading)
+            except (ValueError, KeyError, TypeError) as e:
+                self.skipped += 1
+                self.context.info(f'Reading skipped: {type(e).__name__}: '
+                                  f'{e} ({str(item).strip()})')
+                continue
+            for alert in alerts:
+                on_alert(alert)
+                count += 1
+        return count
+    
+    def summary(self):
+        """
+        Returns
+        -------
+        dict
+            Number of updates and skipped readings, mean and largest update
+            time (ms), pillars and modes that do not meet their threshold
+        """
+        latency = np.array(self.latency) * 1000
+        return {'updates': self.updates, 'skipped': self.skipped,
+                'mean_ms': round(float(latency.mean()), 3)
+                if len(latency) else None,
+                'max_ms': round(float(latency.max()), 3)
+                if len(latency) else None,
+                'failing': [k for k, ok in self.state.items() if not ok]}
+
+async def socket_source(host = '127.0.0.1', port = 8766):
+    """
+    Readings sent to a local socket, one per line, by any number of
+    connections
+    
+    Yields
+    ------
+    string
+        Line of a reading, see parse()
+    """
+    queue = asyncio.Queue()
+    
+    async def client(reader, writer):
+        while line := await reader.readline():
+            await queue.put(line.decode('utf-8', errors = 'replace'))
+        writer.close()
+    
+    server = await asyncio.start_server(client, host, port)
+    async with server:
+        while True:
+            yield await queue.get()
+
+async def tail_source(file_name, interval = 0.5, from_start = False):
+    """
+    Readings appended to a file (one per line, see parse()), e.g. the log
+    of a data logger; the file is polled for new lines
+    
+    Parameters
+    ----------
+    file_name : string
+    interval : positive float, optional
+        Time between two polls; the default is 0.5,
+        unit: s
+    from_start : bool, optional
+        Also yield the lines that exist already; the default is False
+    
+    Yields
+    ------
+    string
+        Line of a reading, see parse()
+    """
+    with open(file_name, encoding = 'utf-8', errors = 'replace') as f:
+        if not from_start:
+            f.seek(0, 2)
+        buffer = ''
+        while True:
+            data = f.readline()
+            if not data:
+                await asyncio.sleep(interval)
+                continue
+            buffer += data
+            if not buffer.endswith('\n'):
+                continue
+            line, buffer = buffer, ''
+            yield line
+
+async def simulated_source(levels, uplift = None, interval = 0):
+    """
+    Stand-in feed of readings, e.g. for tests and demonstrations
+    
+    Parameters
+    ----------
+    levels : list
+        Water levels,
+        unit: masl
+    uplift : list, optional
+        Uplift factors (numbers or per pillar); the default is no uplift
+        readings
+    interval : float, optional
+        Time between two readings; the default is 0,
+        unit: s
+    
+    Yields
+    ------
+    dict
+        Reading
+    """
+    uplift = [None] * len(levels) if uplift is None else uplift
+    for idx, (level, factor) in enumerate(zip(levels, uplift)):
+        reading = {'time': idx, 'level': level}
+        if factor is not None:
+            reading['uplift'] = factor
+        yield reading
+        await asyncio.sleep(interval)
@@ -2,10 +2,32 @@ from shapely.geometry import (
     Point, MultiPoint, LineString, MultiLineString, Polygon
     )
 from shapely.ops import unary_union
+import functools
+import threading
 import math
 
 from segment import Segment
 
+#guards the population of the caches of all pillars, e.g. when nodes of a
+#task graph (see pipeline.py) evaluate the same pillar in several threads
+_lock = threading.RLock()
+
+def cached(method):
+    #caches the result of a method (per argument); the geometry of a
+    #pillar does not depend on the water level, so it is only calculated
+    #once per pillar (see Pillar.clear_cache)
+    @functools.wraps(method)
+    def wrapper(self, *args):
+        key = (method.__name__, ) + args
+        cache = self._cache
+        if key not in cache:
+            with _lock:
+                cache = self._cache
+                if key not in cache:
+                    cache[key] = method(self, *args)
+        return cache[key]
+    return wrapper
+
 class Pillar: 
     """
     Pillar is the second level of classes forming a dam.
@@ -52,7 +74,22 @@ class Pillar:
         self.phi = phi
         self.dam_type = dam_type
         self.name = name
-               
+        self._cache = {}
+    
+    def clear_cache(self):
+        """
+        Clear the cached geometry, required after the segments or contacts
+        of the pillar have been changed
+        
+        Returns
+        -------
+        None.
+        
+        """
+        with _lock:
+            self._cache = {}
+    
+    @cached
     def get_union(self):
         """
         Returns
@@ -63,6 +100,7 @@ class Pillar:
         """
         return unary_union([i.poly for i in self.segments])
     
+    @cached
     def highest_point(self):
         """
         Returns
@@ -76,6 +114,7 @@ class Pillar:
         index = y.index(max(y))
         return Point(x[index], y[index])
     
+    @cached
     def lowest_point(self):
         """
         Returns
@@ -89,6 +128,7 @@ class Pillar:
         index = y.index(min(y))
         return Point(x[index], y[index])
     
+    @cached
     def left_contact(self):
         """
         Returns
@@ -104,6 +144,7 @@ class Pillar:
         x, y = splits[0].coords.xy
         return Point(x[1], y[1])
     
+    @cached
     def right_contact(self):
         """
         Returns
@@ -119,6 +160,7 @@ class Pillar:
         x, y = splits[-1].coords.xy
         return Point(x[0], y[0])
     
+    @cached
     def righternmost_x(self):
         """
         Returns
@@ -130,6 +172,7 @@ class Pillar:
         x, _ = self.get_union().exterior.coords.xy
         return max(x)
     
+    @cached
     def lefternmost_x(self):
         """
         Returns
@@ -141,6 +184,7 @@ class Pillar:
         x, _ = self.get_union().exterior.coords.xy
         return min(x)
     
+    @cached
     def cutting_surface(self):
         """
         Returns
@@ -172,6 +216,44 @@ class Pillar:
                         polys.append(poly)
         return unary_union(polys)
     
+    @cached
+    def cutting_strips(self, increment):
+        """
+        Parameters
+        ----------
+        increment : positive float
+            Strip width,
+            unit: m
+        
+        Returns
+        -------
+        list
+            Strips of the cutting surface, obtained by advancing along the
+            dam axis in steps of increment: (x-coordinate of the upstream
+            end, x-coordinate of the downstream end, axis of the strip)
+        
+        """
+        strips = []
+        surface = self.cutting_surface()
+        minx, miny, maxx, maxy = surface.bounds
+        line = LineString([(minx, miny), (maxx, miny)])
+        count = 0
+        new_axis = self.axis() - (maxy - miny) / 2 + increment / 2
+        while line.intersects(surface):
+            count += 1
+            intersec = line.intersection(surface)
+            if type(intersec) == LineString:
+                intersec = MultiLineString([intersec])
+            if type(intersec) not in (Point, MultiPoint):
+                intersec = intersec[0]
+                p1, p2 = intersec.coords
+                strips.append((p1[0], p2[0], new_axis))
+            new_y = miny + count * increment
+            line = LineString([(minx, new_y), (maxx, new_y)])
+            new_axis += increment
+        return strips
+    
+    @cached
     def max_depth(self):
         """
         Returns
@@ -184,6 +266,7 @@ class Pillar:
         _, miny, _, maxy = self.cutting_surface().bounds
         return maxy - miny
     
+    @cached
     def axis(self):
         """
         Returns
@@ -196,6 +279,7 @@ class Pillar:
         _, miny, _, maxy = self.cutting_surface().bounds
         return (maxy + miny) / 2
     
+    @cached
     def segments_above(self):
         """
         Returns
@@ -228,6 +312,7 @@ class Pillar:
                     )
         return segs_above
     
+    @cached
     def bottom_angle(self):
         """
         Returns
@@ -0,0 +1,327 @@
+import report, export, evaluation, manifest
+
+import functools
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+class Graph:
+    """
+    Lazy task graph. A node is identified by a key (e.g. ('page', 'P1'))
+    and calculated by a function of the results of its dependencies (other
+    nodes). Nodes are only calculated when a target that depends on them is
+    requested, every node at most once (results are memoized); nodes whose
+    dependencies are available are started at the same time on a thread
+    pool. The calculations (shapely, pandas, matplotlib) mostly hold the
+    GIL, so the threads mainly overlap file output; the time is saved by
+    the nodes that are not calculated (unrequested targets, shared nodes,
+    up-to-date outputs), not by parallel calculation. Shared state of the
+    nodes is guarded by locks (the geometry caches of the pillars, see
+    pillar.cached, and the manifests).
+    """
+    
+    def __init__(self):
+        self.nodes = {}
+        self.results = {}
+        self.computed = 0
+    
+    def add(self, key, func, deps = ()):
+        """
+        Add a node; a node that already exists is kept
+        
+        Parameters
+        ----------
+        key : hashable
+            Key of the node
+        func : callable
+            Function called with the results of deps as arguments
+        deps : iterable, optional
+            Keys of the dependencies; the default is no dependencies
+        
+        Returns
+        -------
+        hashable
+            Key of the node
+        """
+        if key not in self.nodes:
+            self.nodes[key] = (func, tuple(deps))
+        return key
+    
+    def value(self, key, result):
+        #add a node with a known result, e.g. an output that is up to date
+        self.nodes.setdefault(key, (None, ()))
+        self.results.setdefault(key, result)
+        return key
+    
+    def required(self, targets):
+        #keys of the nodes that have to be calculated for targets (nodes
+        #without memoized result that the targets depend on)
+        needed = set()
+        stack = list(targets)
+        while stack:
+            key = stack.pop()
+            if key in needed or key in self.results:
+                continue
+            if key not in self.nodes:
+                raise KeyError(f'Unknown node: {key}')
+            needed.add(key)
+            stack.extend(self.nodes[key][1])
+        return needed
+    
+    def run(self, targets, workers = None):
+        """
+        Calculate targets and the nodes they depend on
+        
+        Parameters
+        ----------
+        targets : list
+            Keys of the requested nodes
+        workers : positive int, optional
+            Number of nodes calculated at the same time (threads); the
+            default is the default of ThreadPoolExecutor
+        
+        Returns
+        -------
+        list
+            Results of the targets
+        """
+        needed = self.required(targets)
+        waiting = {k: {d for d in self.nodes[k][1] if d in needed}
+                   for k in needed}
+        dependents = {}
+        for key, deps in waiting.items():
+            for d in deps:
+                dependents.setdefault(d, []).append(key)
+        ready = [k for k, deps in waiting.items() if not deps]
+        running = {}
+        
+        with ThreadPoolExecutor(workers) as pool:
+            while ready or running:
+                for key in ready:
+                    func, deps = self.nodes[key]
+                    args = [self.results[d] for d in deps]
+                    running[pool.submit(func, *args)] = key
+                ready = []
+                
+                done, _ = wait(running, return_when = FIRST_COMPLETED)
+                for future in done:
+                    key = running.pop(future)
+                    if future.exception() is not None:
+                        for other in running:
+                            other.cancel()
+                        raise future.exception()
+                    self.results[key] = future.result()
+                    self.computed += 1
+                    for other in dependents.get(key, []):
+                        waiting[other].discard(key)
+                        if not waiting[other]:
+                            ready.append(other)
+        
+        return [self.results[k] for k in targets]
+
+class Pipeline:
+    """
+    Analysis of a dam (report, images, export) as a lazy task graph (see
+    Graph) with the nodes:
+    - ('record', pillar): result record of a pillar in all load cases
+    - ('drawing', pillar, case), ('image', pillar, case): figure of a
+      pillar in a load case, for the report page or as svg file
+    - ('page', pillar): report page of a pillar
+    - ('segments', case): segments of a load case (Stability.draw())
+    - ('export', case): exported segments of a load case
+    - 'evaluation': exported evaluation overview, merged from the records
+    - the targets 'report', 'overview', 'images' and 'export'; the report
+      of dams with many pillars is the overview (see Report.create_default)
+    Only the nodes of requested targets are added. Outputs whose inputs
+    have not changed since the last run (see manifest.py) are added with
+    their file as result and without dependencies, nothing is calculated
+    for them.
+    """
+    
+    def __init__(self, dam, levels, context = None, force = False):
+        """
+        Parameters
+        ----------
+        dam : instance of Dam
+        levels : list
+            Load cases or water levels, see Evaluation
+        context : instance of RunContext, optional
+            Output root and logger, see runcontext.py
+        force : bool, optional
+            Create all outputs; the default is False
+        
+        Returns
+        -------
+        None.
+        
+        """
+        self.dam = dam
+        self.report = report.Report(dam, levels, context)
+        self.context = self.report.context
+        self.export = export.Export(dam, levels, self.context)
+        self.cases = self.report.evaluation.cases
+        self.force = force
+        self.graph = Graph()
+        self.targets = {'report': self.add_report,
+                        'overview': self.add_overview,
+                        'images': self.add_images,
+                        'export': self.add_export}
+    
+    def record(self, p):
+        return self.graph.add(('record', p.name),
+                              functools.partial(
+                                  self.report.evaluation.evaluate_pillar, p
+                                  ))
+    
+    def drawing(self, p, case):
+        return self.graph.add(('drawing', p.name, case.name),
+                              functools.partial(
+                                  self.report.case_drawing, p, case
+                                  ))
+    
+    def page(self, p, value, pages, created, record, *figs):
+        pdf_dir = self.report.create_page(
+            record, p, list(figs), self.context.dir('result', 'pages')
+            )
+        pages.update(p.name, value)
+        created.append(p.name)
+        return pdf_dir
+    
+    def add_overview(self):
+        #dam-wide overview, see Report.create_overview
+        self.graph.add('overview', functools.partial(
+            self.report.create_overview, force = self.force
+            ))
+    
+    def add_report(self):
+        #report pages and merged report, see Report.create_report; for dams
+        #with many pillars the overview (see Report.create_default)
+        if len(self.dam.pillars) > report.OVERVIEW_PILLARS:
+            self.add_overview()
+            self.graph.add('report', lambda message: message, ['overview'])
+            return
+        
+        pages_dir = self.context.dir('result', 'pages')
+        pages = manifest.Manifest(f'{pages_dir}/manifest.json')
+        keys, values, created = [], [], []
+        
+        for p in self.dam.pillars:
+            key = ('page', p.name)
+            value = self.report.pillar_digest(p)
+            pdf_dir = f'{pages_dir}/{p.name}_summary.pdf'
+            values.append(value)
+            if not self.force and pages.is_current(p.name, value, pdf_dir):
+                keys.append(self.graph.value(key, pdf_dir))
+                continue
+            deps = [self.record(p)] + [self.drawing(p, c) for c in self.cases]
+            keys.append(self.graph.add(
+                key, functools.partial(self.page, p, value, pages, created),
+                deps
+                ))
+        
+        def merge(*file_dirs):
+            self.report.merge_pages(list(file_dirs), values, pages,
+                                    self.force)
+            pages.save()
+            return (f"PDFs created ({self.context.dir('result')}), "
+                    f'{len(created)} of {len(file_dirs)} pages updated')
+        
+        self.graph.add('report', merge, keys)
+    
+    def add_images(self):
+        #svg images, see Report.create_images
+        new_dir = self.context.dir('img')
+        images = manifest.Manifest(f'{new_dir}/manifest.json')
+        keys = []
+        
+        for p in self.dam.pillars:
+            key = ('images', p.name)
+            value = self.report.pillar_digest(p)
+            files = [f'{new_dir}/{case.name}_{p.name}.svg'
+                     for case in self.cases]
+            if not self.force and images.is_current(p.name, value, *files):
+                keys.append(self.graph.value(key, files))
+                continue
+            deps = [self.graph.add(('image', p.name, c.name),
+                                   functools.partial(
+                                       self.report.case_image, p, c
+                                       ))
+                    for c in self.cases]
+            
+            def pillar(*files, name = p.name, value = value):
+                images.update(name, value)
+                return list(files)
+            
+            keys.append(self.graph.add(key, pillar, deps))
+        
+        def save(*rearranged):
+            images.save()
+            self.context.info(f'Images created ({new_dir})')
+            return list(rearranged)
+        
+        self.graph.add('images', save, keys)
+    
+    def add_export(self):
+        #evaluation and segments per load case, see Export.export
+        new_dir = self.context.dir('export')
+        outputs = manifest.Manifest(f'{new_dir}/manifest.json')
+        if self.force:
+            outputs.hashes = {}
+        keys = []
+        
+        key, value, eval_dir = self.export.evaluation_inputs()
+        if outputs.is_current(key, value, eval_dir):
+            keys.append(self.graph.value('evaluation', 0))
+        else:
+            keys.append(self.graph.add(
+                'evaluation',
+                lambda *records: self.export.write_evaluation(
+                    evaluation.merge_records(records), outputs
+                    ),
+                [self.record(p) for p in self.dam.pillars]
+                ))
+        
+        for case in self.cases:
+            key, value, file_dirs = self.export.case_inputs(case)
+            if outputs.is_current(key, value, *file_dirs):
+                keys.append(self.graph.value(('export', case.name), 0))
+                continue
+            segs = self.graph.add(('segments', case.name),
+                                  functools.partial(self.case_segments, case))
+            keys.append(self.graph.add(
+                ('export', case.name),
+                functools.partial(self.export.write_case, case,
+                                  outputs = outputs),
+                [segs]
+                ))
+        
+        def save(*written):
+            outputs.save()
+            return f'Export finished ({new_dir}), {sum(written)} files updated'
+        
+        self.graph.add('export', save, keys)
+    
+    def case_segments(self, case):
+        return case.stability(self.dam).draw()
+    
+    def run(self, *targets, workers = None):
+        """
+        Create the requested outputs; nodes that are not required by the
+        targets are not calculated, nodes shared by several targets (e.g.
+        the records of the report and the evaluation) only once
+        
+        Parameters
+        ----------
+        *targets : string
+            'report', 'overview', 'images' and/ or 'export'
+        workers : positive int, optional
+            Number of nodes calculated at the same time, see Graph.run
+        
+        Returns
+        -------
+        list
+            Results of the targets (messages of report and export, image
+            files per pillar)
+        """
+        for target in targets:
+            if target not in self.graph.nodes:
+                self.targets[target]()
+        return self.graph.run(list(targets), workers)
@@ -0,0 +1,359 @@
+import response
+
+import math
+import numpy as np
+import pandas as pd
+
+#limit values of the limit states: failure if the coefficient falls below
+#the limit (for overturning of gravity dams: the resultant leaves the sole,
+#limit 0 as share of the sole, see evaluation.THRESHOLDS)
+LIMITS = {'Glidning': {'Gr': 1, 'Pl': 1},
+          'Velting': {'Gr': 0, 'Pl': 1}}
+
+#basic variables of the limit states, see LevelResponse.coefficients
+NAMES = ('level', 'ice', 'uplift', 'phi', 'g_water', 'concrete')
+
+#Euler-Mascheroni constant (Gumbel distribution)
+EULER = 0.5772156649015329
+
+def normal_cdf(u):
+    return 0.5 * np.vectorize(math.erfc)(-np.asarray(u, dtype = float)
+                                         / math.sqrt(2))
+
+class Variable:
+    """
+    Random variable of the limit states, defined by its distribution, mean
+    and standard deviation and transformed from the standard normal space
+    """
+    
+    def __init__(self, name, distribution = 'normal', mean = None, std = 0):
+        """
+        Parameters
+        ----------
+        name : string
+            One of NAMES: 'level' (water level, masl), 'ice' (ice load,
+            kN/m), 'uplift' (uplift factor), 'phi' (friction angle,
+            degrees), 'g_water' (specific weight of water, kN/m3),
+            'concrete' (factor on the specific weights of the segments)
+        distribution : string, optional
+            'normal', 'lognormal' or 'gumbel' (largest values, e.g. annual
+            maximum water level or ice load); the default is 'normal'
+        mean : float, optional
+            Mean value; the default is the nominal value of the pillar (see
+            Reliability.nominal), required for the water level; positive
+            for the lognormal distribution
+        std : float, optional
+            Standard deviation; the default is 0
+        
+        Returns
+        -------
+        None.
+        
+        """
+        if name not in NAMES:
+            raise ValueError(f'Unknown variable: {name}')
+        if distribution not in ('normal', 'lognormal', 'gumbel'):
+            raise ValueError(f'Unknown distribution: {distribution}')
+        if distribution == 'lognormal' and mean is not None and mean <= 0:
+            raise ValueError(f'The mean of the lognormal variable {name} '
+                             f'must be positive')
+        self.name = name
+        self.distribution = distribution
+        self.mean = mean
+        self.std = std
+    
+    def transform(self, u, mean):
+        """
+        Parameters
+        ----------
+        u : numpy.ndarray
+            Values in the standard normal space
+        mean : float
+            Mean value
+        
+        Returns
+        -------
+        numpy.ndarray
+            Values of the variable
+        
+        Raises
+        ------
+        ValueError
+            If the mean of a lognormal variable is not positive (e.g. the
+            nominal ice load 0)
+        """
+        if self.distribution == 'normal':
+            return mean + self.std * u
+        if self.distribution == 'lognormal':
+            if mean <= 0:
+                raise ValueError(f'The mean of the lognormal variable '
+                                 f'{self.name} must be positive, got {mean}')
+            zeta = math.sqrt(math.log(1 + (self.std / mean)**2))
+            return np.exp(math.log(mean) - zeta**2 / 2 + zeta * u)
+        #gumbel: x = m - b ln(-ln(F)), -ln(F) = -ln(1 - q) with the
+        #exceedance probability q, accurate in the upper tail
+        b = self.std * math.sqrt(6) / math.pi
+        q = 0.5 * np.vectorize(math.erfc)(np.asarray(u, dtype = float)
+                                          / math.sqrt(2))
+        return mean - EULER * b - b * np.log(-np.log1p(-q))
+
+class Reliability:
+    """
+    First- and second-order reliability method (FORM/ SORM) for sliding and
+    overturning of the pillars of a dam. The limit states are the stability
+    coefficients relative to their limit (see LIMITS), e.g. for sliding
+    g = glidning / limit - 1, failure for g < 0. The basic variables (see
+    Variable) are transformed to independent standard normal variables; the
+    design point is found with the HL-RF iteration (with a line search of
+    the step length), the reliability index
+    is its distance from the origin and the failure probability
+    Pf = Phi(-beta) (FORM), corrected for the curvatures of the limit state
+    at the design point with Breitung's formula (SORM).
+    The limit states are evaluated with the vectorized level response (see
+    response.py); the finite differences of the gradient (and the Hessian
+    of SORM) are evaluated in one batch per iteration.
+    """
+    
+    def __init__(self, dam, variables, fixed = None, limits = None,
+                 responses = None, step = 1e-4, tol = 1e-6, max_iter = 100):
+        """
+        Parameters
+        ----------
+        dam : instance of Dam
+        variables : list
+            Random variables as instances of Variable
+        fixed : dict, optional
+            Deterministic values of basic variables that are not random,
+            e.g. {'level': 101.5}; the default is the nominal values
+        limits : dict, optional
+            Limit values, see LIMITS; the default is LIMITS
+        responses : list, optional
+            Level responses of the pillars (see response.build); the default
+            is to build them
+        step : positive float, optional
+            Step of the finite differences in the standard normal space;
+            the default is 1e-4
+        tol : positive float, optional
+            Convergence tolerance of the design point; the default is 1e-6
+        max_iter : positive int, optional
+            Maximum number of iterations; the default is 100
+        
+        Returns
+        -------
+        None.
+        
+        """
+        self.dam = dam
+        self.variables = variables
+        self.fixed = fixed if fixed is not None else {}
+        self.limits = limits if limits is not None else LIMITS
+        names = [v.name for v in variables] + list(self.fixed)
+        if 'level' not in names:
+            raise ValueError('The water level must be a variable or fixed')
+        if any(v.name == 'level' and v.mean is None for v in variables):
+            raise ValueError('The mean of the water level is required')
+        if responses is None:
+            responses = response.build(dam, *self.domain())
+        self.responses = responses
+        self.step = step
+        self.tol = tol
+        self.max_iter = max_iter
+    
+    def domain(self):
+        #range of water levels of the level responses: the fixed level or
+        #mean -/+ 8 (10 for the upper tail) standard deviations, levels
+        #outside are calculated with the load classes
+        for v in self.variables:
+            if v.name == 'level':
+                return v.mean - 8 * v.std, v.mean + 10 * v.std + 0.5
+        level = self.fixed['level']
+        return level - 0.5, level + 0.5
+    
+    def nominal(self, resp):
+        #nominal values of the basic variables of a pillar
+        return {'level': None, 'ice': 0, 'uplift': 1, 'phi': resp.phi,
+                'g_water': resp.g_water, 'concrete': 1}
+    
+    def values(self, resp, u):
+        """
+        Parameters
+        ----------
+        resp : instance of LevelResponse
+        u : numpy.ndarray
+            Points in the standard normal space, shape (m, number of
+            variables)
+        
+        Returns
+        -------
+        dict
+            Values of all basic variables (arrays of shape (m, ))
+        """
+        out = self.nominal(resp)
+        out.update(self.fixed)
+        u = np.atleast_2d(u)
+        for idx, v in enumerate(self.variables):
+            mean = v.mean if v.mean is not None else out[v.name]
+            out[v.name] = v.transform(u[:, idx], mean)
+        return {k: np.broadcast_to(np.asarray(val, dtype = float),
+                                   (len(u), )) for k, val in out.items()}
+    
+    def limit_state(self, resp, mode, u):
+        """
+        Returns
+        -------
+        numpy.ndarray
+            Limit state at the points u (standard normal space), negative
+            for failure
+        """
+        x = self.values(resp, u)
+        #no water load below the lowest point of the pillar
+        level = np.maximum(x['level'], resp.pillar.lowest_point().y)
+        gl, vm, vr = resp.coefficients(
+            level, x['ice'], x['uplift'], x['phi'], x['g_water'],
+            x['concrete']
+            )
+        limit = self.limits[mode][resp.dam_type[:2]]
+        if mode == 'Glidning':
+            return gl / limit - 1
+        if resp.dam_type.startswith('Gr'):
+            return np.minimum(vr - resp.dist * limit,
+                              resp.dist - resp.dist * limit - vr) / resp.dist
+        return vm / limit - 1
+    
+    def gradient(self, resp, mode, u):
+        #limit state and gradient at u (central differences, one batch)
+        n = len(u)
+        points = np.vstack([u, u + self.step * np.eye(n),
+                            u - self.step * np.eye(n)])
+        g = self.limit_state(resp, mode, points)
+        return g[0], (g[1:n + 1] - g[n + 1:]) / (2 * self.step)
+    
+    def form(self, resp, mode):
+        """
+        Design point of a pillar and failure mode (HL-RF iteration)
+        
+        Returns
+        -------
+        dict
+            - 'beta': reliability index (negative if the mean values fail)
+            - 'pf': failure probability (FORM)
+            - 'u': design point in the standard normal space
+            - 'alpha': sensitivities (direction cosines of the design
+              point, alpha**2 sums up to 1)
+            - 'design': design point (values of the random variables)
+            - 'iterations', 'converged'; the iteration may not converge if
+              the design point lies on a kink of the limit state (e.g. the
+              level of the crest, where overtopping starts)
+        """
+        u = np.zeros(len(self.variables))
+        g0 = None
+        converged = False
+        steps = 0.5 ** np.arange(8)
+        for iteration in range(1, self.max_iter + 1):
+            g, grad = self.gradient(resp, mode, u)
+            if g0 is None:
+                g0 = abs(g) if g != 0 else 1
+            norm = np.linalg.norm(grad)
+            if not np.isfinite(g) or not np.isfinite(norm) or norm == 0:
+                break
+            direction = (grad @ u - g) / norm**2 * grad - u
+            
+            #step length (improved HL-RF): largest step of steps that
+            #decreases the merit function 0.5 |u|^2 + c |g|, all steps are
+            #evaluated in one batch
+            c = 2 * np.linalg.norm(u) / norm + 10
+            trial = u + steps[:, None] * direction
+            g_trial = self.limit_state(resp, mode, trial)
+            merit = 0.5 * (trial**2).sum(axis = 1) + c * np.abs(g_trial)
+            ok = np.isfinite(merit) & (merit < 0.5 * u @ u + c * abs(g))
+            step = steps[np.argmax(ok)] if ok.any() else steps[-1]
+            u = u + step * direction
+            
+            if step * np.linalg.norm(direction) \
+                    < self.tol * (1 + np.linalg.norm(u)) \
+                    and abs(g) < self.tol * g0:
+                converged = True
+                break
+        
+        g, grad = self.gradient(resp, mode, u)
+        norm = np.linalg.norm(grad)
+        alpha = -grad / norm if norm > 0 else np.zeros_like(u)
+        beta = float(alpha @ u)
+        x = self.values(resp, u)
+        return {'beta': beta,
+                'pf': float(normal_cdf(-beta)),
+                'u': u,
+                'alpha': alpha,
+                'grad': grad,
+                'design': {v.name: float(x[v.name][0])
+                           for v in self.variables},
+                'iterations': iteration,
+                'converged': converged}
+    
+    def sorm(self, resp, mode, result, step = 0.05):
+        """
+        Failure probability with Breitung's correction for the main
+        curvatures of the limit state at the design point of a FORM result;
+        the Hessian is calculated with central differences (one batch)
+        
+        Returns
+        -------
+        float
+            Failure probability (SORM); the FORM probability if the
+            correction is not defined (beta * curvature <= -1)
+        """
+        u, grad, beta = result['u'], result['grad'], result['beta']
+        n = len(u)
+        norm = np.linalg.norm(grad)
+        if n < 2 or norm == 0:
+            return result['pf']
+        
+        pairs = [(i, j) for i in range(n) for j in range(i + 1, n)]
+        e = step * np.eye(n)
+        points = [u] + [u + e[i] for i in range(n)] \
+            + [u - e[i] for i in range(n)]
+        for i, j in pairs:
+            points += [u + e[i] + e[j], u + e[i] - e[j],
+                       u - e[i] + e[j], u - e[i] - e[j]]
+        g = self.limit_state(resp, mode, np.array(points))
+        
+        hess = np.empty((n, n))
+        hess[np.diag_indices(n)] = (g[1:n + 1] - 2 * g[0]
+                                    + g[n + 1:2 * n + 1]) / step**2
+        for k, (i, j) in enumerate(pairs):
+            pp, pm, mp, mm = g[2 * n + 1 + 4 * k:2 * n + 5 + 4 * k]
+            hess[i, j] = hess[j, i] = (pp - pm - mp + mm) / (4 * step**2)
+        
+        #curvatures in the tangent plane at the design point
+        alpha = result['alpha']
+        q, _ = np.linalg.qr(np.column_stack([alpha, np.eye(n)]))
+        tangent = q[:, 1:n]
+        kappa = np.linalg.eigvalsh(tangent.T @ hess @ tangent / norm)
+        if np.any(beta * kappa <= -1):
+            return result['pf']
+        return float(result['pf'] * np.prod(1 / np.sqrt(1 + beta * kappa)))
+    
+    def table(self, modes = ('Glidning', 'Velting'), sorm = True):
+        """
+        Returns
+        -------
+        pandas.DataFrame
+            Reliability index, failure probabilities (FORM, SORM) and
+            design point per pillar and failure mode; design point columns
+            are named after the variables with *
+        """
+        rows = []
+        for resp in self.responses:
+            for mode in modes:
+                res = self.form(resp, mode)
+                pf_sorm = self.sorm(resp, mode, res) if sorm else np.nan
+                rows.append(
+                    [resp.name, mode, round(res['beta'], 3), res['pf'],
+                     pf_sorm, res['iterations'], res['converged']]
+                    + [round(res['design'][v.name], 3)
+                       for v in self.variables]
+                    )
+        return pd.DataFrame(rows, columns = [
+            'Damseksjon', 'Sikkerhet mot', 'Beta', 'Pf', 'Pf SORM',
+            'Iterasjoner', 'Konvergert'
+            ] + [f'{v.name}*' for v in self.variables])
@@ -1,10 +1,10 @@
-import stability, evaluation
+import stability, evaluation, dam, manifest, runcontext
 
-import os
+import math
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+from matplotlib.collections import PolyCollection
 
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
@@ -13,282 +13,381 @@ from reportlab.pdfgen import canvas
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER
 from reportlab.platypus import Table, TableStyle, Paragraph
+from reportlab.graphics import shapes
+from reportlab.graphics.shapes import Drawing
 from svglib.svglib import svg2rlg
 from PyPDF2 import PdfFileMerger, PdfFileReader
 
+def nice_ticks(lo, hi, n = 5):
+    #round tick values (steps of 1, 2 or 5 times a power of ten) within
+    #[lo, hi], about n ticks
+    raw = (hi - lo) / n
+    power = 10 ** math.floor(math.log10(raw))
+    step = min((s * power for s in (1, 2, 5, 10) if s * power >= raw))
+    first = math.ceil(lo / step) * step
+    return [round(first + i * step, 10)
+            for i in range(int((hi - first) / step) + 1)]
+
+#dams with more pillars get the dam-wide overview as default report
+#instead of one page per pillar (see Report.create_default)
+OVERVIEW_PILLARS = 50
+
 class Report:
     """
     Create pdf report containing calculations and figures;
-    current layout: one page per pillar
+    current layout: one page per pillar; files are written below the output
+    root of the run context (see runcontext.py)
     """
-    def __init__(self, dam, levels):
+    def __init__(self, dam, levels, context = None):
         self.dam = dam
         self.levels = levels
-        
-    def unlevel(self, obj):
-        #removes unnecessary levels from nested lists
-        while isinstance(obj, list) and len(obj) == 1:
-            obj = obj[0]
-        if isinstance(obj, list):
-            return [self.unlevel(item) for item in obj]
-        else:
-            return obj
-        
-    def rearrange_loads(self):
-        #necessary to match the order of loads to the order of moments
-        loads = [stability.Stability(self.dam, l).loads() for l in self.levels]
-        collected = []
-        for loads_level in loads:
-            collected.append(list(zip(*loads_level)))
-        return collected
-            
-        
-    def calc_arms(self):
+        self.evaluation = evaluation.Evaluation(dam, levels)
+        if context is None:
+            context = runcontext.RunContext()
+        self.context = context
+    
+    def calc_arms(self, loads, moments):
         #calculate moment arms from moments and loads, return 0 if attempting
         #to divide by zero
-        l = self.rearrange_loads()
-        m = [stability.Stability(self.dam, lv).moment() for lv in self.levels]
-        loads, moments = np.array(l), np.array(m)
+        loads, moments = np.array(loads), np.array(moments)
         return np.divide(
             moments, loads, out = np.zeros_like(moments), where = loads != 0
             )
         
-        
-    def create_level_tables(self):
-        #summaries of stability analyses at each water level
-        
-        #loads (rearranged), moments, moment arms
-        l = self.rearrange_loads()
-        m = [stability.Stability(self.dam, lv).moment() for lv in self.levels]
-        a = self.calc_arms()
+    def level_tables(self, record):
+        #summaries of the stability analyses of one pillar (result record,
+        #see Evaluation.evaluate_pillar) in each load case
         
         load_names = ('Islast', 'Vanntrykk', 'Vannvekt', 'Overtopping',
                       'Opptrykk', 'Egenvekt')
         
-        collected = []
+        dfs = []
         
-        for level, loads, moments, arms in zip(self.levels, l, m, a):
+        for level_name, loads, moments in zip(
+                record['level_names'], record['loads'], record['moments']
+                ):
             
-            if level == max(self.levels):
-                level_name = 'MFV'
-            elif level == min(self.levels):
-                level_name = 'HRV + is'
-            else:
-                level_name = 'DFV'
-                
-            dfs = []
+            arms = self.calc_arms(loads, moments)
                 
             col_names = (level_name, 'F [kN]', 'a [m]', 'M [kNm]')
             
-            for load, moment, arm in zip(loads, moments, arms):
-                
-                df = pd.DataFrame(list(zip(load_names, load, arm, moment)),
-                                  columns = col_names)
-                
-                if level != min(self.levels):
-                    df.iloc[0, 1:4] = 0
-                    
-                df = df.round(2)
-                
-                dfs.append(df)
-             
-            collected.append(dfs)
-        
-        #remove unnecessary levels from nested list of pandas dataframes
-        rearranged = self.unlevel([list(zip(*collected))])
-        return rearranged
-    
-    def create_summary_tables(self):
-        
-        ev = evaluation.Evaluation(self.dam, self.levels)
-        glidning, velting = ev.glidning(), ev.velting()
-        
-        no_pillars = int(len(glidning) / len(self.levels))
-        
-        gl_rearranged, ve_rearranged = [], []
-        
-        for i in range(0, no_pillars):
-            gl_rearranged.append(glidning[i::no_pillars])
-            ve_rearranged.append(velting[i::no_pillars])
-        
-        dfs = []
-            
-        for gl, ve in zip(gl_rearranged, ve_rearranged):
-            
-            col_names = (gl[0][2], 'HRV + is', 'DFV', 'MFV')
-            first_col =  ('Glidning', 'Velting', 'Sikkerhet')
-            
-            level_names = [i[1] for i in gl]
-            l_idx = [level_names.index(i) for i in col_names[1:]]          
+            df = pd.DataFrame(list(zip(load_names, loads, arms, moments)),
+                              columns = col_names)
             
-            gl_vals, gl_ok = [], []
-            for i in gl:
-                if isinstance(i[4], str):
-                    gl_vals.append(f'{i[3]} i [{i[4]}]')
-                else:
-                    gl_vals.append(f'{i[3]} >= {i[4]}')
-                gl_ok.append(i[5])
-                
-            ve_vals, ve_ok = [], []
-            for i in ve:
-                if isinstance(i[4], str):
-                    ve_vals.append(f'{i[3]} in [{i[4]}]')
-                else:
-                    ve_vals.append(f'{i[3]} >= {i[4]}')
-                ve_ok.append(i[5])
+            if loads[0] == 0:
+                df.iloc[0, 1:4] = 0
             
-            ok = []
-            for i, j in zip(gl_ok, ve_ok):
-                if i == 'ok' and j == 'ok':
-                    ok.append('ok')
-                else:
-                    ok.append('ikke ok')
-                    
-            hrv_col = gl_vals[l_idx[0]], ve_vals[l_idx[0]], ok[l_idx[0]]
-            dfv_col = gl_vals[l_idx[1]], ve_vals[l_idx[1]], ok[l_idx[1]]
-            mfv_col = gl_vals[l_idx[2]], ve_vals[l_idx[2]], ok[l_idx[2]]
-                    
+            df = df.round(2)
             
-            df = pd.DataFrame(list(zip(first_col, hrv_col, dfv_col, mfv_col)),
-                              columns = col_names)
             dfs.append(df)
                     
         return dfs
     
-    def create_images(self):
+    def create_level_tables(self):
+        #summaries of stability analyses in each load case
+        return [self.level_tables(r) for r in self.evaluation.iter_pillars()]
+    
+    def summary_table(self, record):
+        #summary of the evaluation of one pillar (result record, see
+        #Evaluation.evaluate_pillar)
+        
+        gl, ve = record['glidning'], record['velting']
         
-        new_dir = '../img'
+        col_names = [record['pillar']] + record['level_names']
+        first_col =  ('Glidning', 'Velting', 'Sikkerhet')
         
-        if not os.path.exists(new_dir):
-            os.makedirs(new_dir)
+        gl_vals, gl_ok = [], []
+        for i in gl:
+            if isinstance(i[4], str):
+                gl_vals.append(f'{i[3]} i [{i[4]}]')
+            else:
+                gl_vals.append(f'{i[3]} >= {i[4]}')
+            gl_ok.append(i[5])
+        
+        ve_vals, ve_ok = [], []
+        for i in ve:
+            if isinstance(i[4], str):
+                ve_vals.append(f'{i[3]} in [{i[4]}]')
+            else:
+                ve_vals.append(f'{i[3]} >= {i[4]}')
+            ve_ok.append(i[5])
+        
+        ok = []
+        for i, j in zip(gl_ok, ve_ok):
+            if i == 'ok' and j == 'ok':
+                ok.append('ok')
+            else:
+                ok.append('ikke ok')
+        
+        case_cols = list(zip(gl_vals, ve_vals, ok))
+        
+        return pd.DataFrame(list(zip(first_col, *case_cols)),
+                            columns = col_names)
+    
+    def create_summary_tables(self):
+        return [self.summary_table(r) for r in self.evaluation.iter_pillars()]
+    
+    def figure_data(self, p, case):
+        #polygons, centroid markers and pivot point of pillar p in load case
+        #"case"; shared by the images (matplotlib) and the drawings
+        #(reportlab) of the report
         
         #specificy color codes for loads (optional)
         load_colors = {'Islast': 'blue', 'Opptrykk': 'blue',
                        'Vanntrykk': 'blue', 'Vannvekt': 'blue',
                        'Overtopping': 'blue'}
         
-        #pillars
-        pillars = self.dam.pillars
+        #get segments of pillar p in load case "case"
+        segs_p = case.stability(dam.Dam([p])).draw_per_pillar()[0]
         
-        file_dirs = []
+        polys, fcs = [], []
+        markers = {'>': [], '^': [], 'v': []}
         
-        for level in self.levels:
-            
-            if level == min(self.levels):
-                ice = 100
-                level_name = 'HRV + is'
-            elif level == max(self.levels):
-                ice = 0
-                level_name = 'MFV'
+        for seg in segs_p:
+            if seg.name in load_colors.keys():
+                fc = load_colors[seg.name]
             else:
-                ice = 0
-                level_name = 'DFV'
-            
-            #get segments for level "level" as list of lists of segments
-            #(per pillar)
-            segs = stability.Stability(self.dam, level, ice).draw_per_pillar()
-            
-            for p, segs_p in zip(pillars, segs):
-                
-                pillar_name = p.name
-                
-                #set up figure and axes
-                fig, ax = plt.subplots()
-                ax.set_aspect('equal', 'datalim')
+                fc = 'gray'
+            if seg.load() > 0:
+                polys.append(list(seg.poly.exterior.coords))
+                fcs.append(fc)
                 
-                #pivot point
-                pp = p.right_contact()
-                ax.plot(pp.x, pp.y, 'o', color = 'black')
-                
-                #plot segments
-                for seg in segs_p:
-                    if seg.name in load_colors.keys():
-                        fc = load_colors[seg.name]
-                    else:
-                        fc = 'gray'
-                    if seg.load() > 0:
-                        xs, ys = seg.poly.exterior.xy
-                        ax.fill(xs, ys, fc = fc, ec = 'black', alpha = 0.3)
-                        
-                        #plot centroids
-                        if seg.name in ('Vanntrykk', 'Islast'):
-                            symb = '>'
-                        elif seg.name in ('Opptrykk'):
-                            symb = '^'
-                        else:
-                            symb = 'v'
-                        
-                        xs, ys = seg.centroid().xy
-                        ax.plot(xs, ys, symb, color = 'yellow')
-                        
-                ax.set_title(f'{level_name}: Tverrsnitt {pillar_name}')
-                ax.set_xlabel('X [m]')
-                ax.set_ylabel('Høyde over havet [m]')
-                    
-                file_dir = f'{new_dir}/{level_name}_{pillar_name}.svg'
-                fig.savefig(file_dir, format = 'svg')
-                plt.close(fig)
-                file_dirs.append(file_dir)
-                
-        print(f'Images created ({new_dir})')
+                #centroids
+                if seg.name in ('Vanntrykk', 'Islast'):
+                    symb = '>'
+                elif seg.name in ('Opptrykk'):
+                    symb = '^'
+                else:
+                    symb = 'v'
                 
+                c = seg.centroid()
+                markers[symb].append((c.x, c.y))
+        
+        pp = p.right_contact()
+        title = f'{case.name}: Tverrsnitt {p.name}'
+        return polys, fcs, markers, (pp.x, pp.y), title
+    
+    def case_image(self, p, case):
+        #create the image (svg file) of pillar p in one load case, returns
+        #the file path; all polygons are drawn as one collection
+        
+        new_dir = self.context.dir('img')
+        
+        polys, fcs, markers, pp, title = self.figure_data(p, case)
+        
+        #set up figure and axes
+        fig = self.context.figure()
+        ax = fig.subplots()
+        ax.set_aspect('equal', 'datalim')
+        
+        #pivot point
+        ax.plot(pp[0], pp[1], 'o', color = 'black')
+        
+        #plot segments
+        ax.add_collection(PolyCollection(
+            polys, facecolors = fcs, edgecolors = 'black', alpha = 0.3
+            ))
+        ax.autoscale_view()
+        
+        #plot centroids
+        for symb, pts in markers.items():
+            if pts:
+                xs, ys = zip(*pts)
+                ax.plot(xs, ys, symb, color = 'yellow')
+        
+        ax.set_title(title)
+        ax.set_xlabel('X [m]')
+        ax.set_ylabel('Høyde over havet [m]')
+        
+        file_dir = f'{new_dir}/{case.name}_{p.name}.svg'
+        fig.savefig(file_dir, format = 'svg')
+        return file_dir
+    
+    def pillar_images(self, p):
+        #create one image (svg file) per load case for pillar p, returns the
+        #file paths
+        return [self.case_image(p, case) for case in self.evaluation.cases]
+    
+    def case_drawing(self, p, case, width = 184, height = 138):
+        #create the vector drawing (reportlab) of pillar p in one load case;
+        #the drawings are placed directly on the report pages, no
+        #intermediate files are written
+        
+        fills = {'blue': colors.Color(0, 0, 1, alpha = 0.3),
+                 'gray': colors.Color(0.5, 0.5, 0.5, alpha = 0.3)}
+        
+        #plot area within the drawing
+        x0, y0, x1, y1 = 30, 22, width - 6, height - 14
+        
+        polys, fcs, markers, pp, title = self.figure_data(p, case)
+        
+        #data limits, extended to equal scales in x and y
+        xs = [x for poly in polys for x, _ in poly] + [pp[0]]
+        ys = [y for poly in polys for _, y in poly] + [pp[1]]
+        xmin, xmax, ymin, ymax = min(xs), max(xs), min(ys), max(ys)
+        scale = min((x1 - x0) / (xmax - xmin), (y1 - y0) / (ymax - ymin))
+        xc, yc = (xmin + xmax) / 2, (ymin + ymax) / 2
+        xmin = xc - (x1 - x0) / scale / 2
+        xmax = xc + (x1 - x0) / scale / 2
+        ymin = yc - (y1 - y0) / scale / 2
+        ymax = yc + (y1 - y0) / scale / 2
+        
+        def tx(x):
+            return x0 + (x - xmin) * scale
+        
+        def ty(y):
+            return y0 + (y - ymin) * scale
+        
+        d = Drawing(width, height)
+        
+        for poly, fc in zip(polys, fcs):
+            points = []
+            for x, y in poly:
+                points += [tx(x), ty(y)]
+            d.add(shapes.Polygon(
+                points, fillColor = fills[fc], strokeColor = colors.black,
+                strokeWidth = 0.2
+                ))
+        
+        #centroids
+        r = 1.2
+        for symb, pts in markers.items():
+            for x, y in pts:
+                x, y = tx(x), ty(y)
+                if symb == '>':
+                    points = [x - r, y - r, x - r, y + r, x + r, y]
+                elif symb == '^':
+                    points = [x - r, y - r, x + r, y - r, x, y + r]
+                else:
+                    points = [x - r, y + r, x + r, y + r, x, y - r]
+                d.add(shapes.Polygon(
+                    points, fillColor = colors.yellow, strokeWidth = 0
+                    ))
+            
+        #pivot point
+        d.add(shapes.Circle(tx(pp[0]), ty(pp[1]), 1.5,
+                            fillColor = colors.black, strokeWidth = 0))
+        
+        #axes, ticks and labels
+        d.add(shapes.Rect(x0, y0, x1 - x0, y1 - y0,
+                          fillColor = None, strokeWidth = 0.4))
+        for t in nice_ticks(xmin, xmax):
+            d.add(shapes.Line(tx(t), y0, tx(t), y0 - 2, strokeWidth = 0.4))
+            d.add(shapes.String(tx(t), y0 - 8, f'{t:g}', fontSize = 5,
+                                textAnchor = 'middle'))
+        for t in nice_ticks(ymin, ymax):
+            d.add(shapes.Line(x0, ty(t), x0 - 2, ty(t), strokeWidth = 0.4))
+            d.add(shapes.String(x0 - 3, ty(t) - 2, f'{t:g}', fontSize = 5,
+                                textAnchor = 'end'))
+        d.add(shapes.String((x0 + x1) / 2, 2, 'X [m]', fontSize = 5,
+                            textAnchor = 'middle'))
+        ylabel = shapes.Group(
+            shapes.String(0, 0, 'Høyde over havet [m]', fontSize = 5,
+                          textAnchor = 'middle'),
+            transform = (0, 1, -1, 0, 6, (y0 + y1) / 2)
+            )
+        d.add(ylabel)
+        d.add(shapes.String((x0 + x1) / 2, height - 9, title,
+                            fontSize = 6, textAnchor = 'middle'))
+        
+        return d
+    
+    def pillar_drawings(self, p, width = 184, height = 138):
+        #create one vector drawing per load case for pillar p, see
+        #case_drawing
+        return [self.case_drawing(p, case, width, height)
+                for case in self.evaluation.cases]
+    
+    def pillar_digest(self, p):
+        #content hash of the inputs of the page and images of pillar p
+        return manifest.digest(
+            manifest.pillar_fingerprint(p),
+            [manifest.case_fingerprint(c) for c in self.evaluation.cases],
+            self.evaluation.thresholds
+            )
+    
+    def create_images(self, force = False):
+        #images are only created for pillars whose inputs have changed since
+        #the last run (see manifest.py), unless force is True
+        
+        new_dir = self.context.dir('img')
+        images = manifest.Manifest(f'{new_dir}/manifest.json')
+        
         rearranged = []
-        for i in range(0, len(pillars)):
-            rearranged.append(file_dirs[i::len(pillars)])
+        
+        for p in self.dam.pillars:
+            key = p.name
+            value = self.pillar_digest(p)
+            files = [f'{new_dir}/{case.name}_{p.name}.svg'
+                     for case in self.evaluation.cases]
+            if force or not images.is_current(key, value, *files):
+                files = self.pillar_images(p)
+                images.update(key, value)
+            rearranged.append(files)
+        
+        images.save()
+        
+        self.context.info(f'Images created ({new_dir})')
         
         return rearranged
     
-    def create_report(self):
+    def create_page(self, record, p, figs, new_dir = None):
+        #create the report page of pillar p from its result record and
+        #figures (drawings or svg files), returns the file path; the default
+        #directory is result below the output root
         
-        new_dir = '../result'
+        if new_dir is None:
+            new_dir = self.context.dir('result')
         
-        if not os.path.exists(new_dir):
-            os.makedirs(new_dir)
-        
-        summary_tables = self.create_summary_tables()
-        level_tables = self.create_level_tables()
-        fig_dirs = self.create_images()
-        pillars = self.dam.pillars
+        summary = self.summary_table(record)
+        level = self.level_tables(record)
         
         cwidth = 24
         
-        file_dirs = []
-    
-        for summary, level, figs, p in zip(
-                summary_tables, level_tables, fig_dirs, pillars
-                ):
+        #three load cases per page, more load cases continue on the
+        #following pages
+        per_page = 3
+        
+        name = list(summary.columns)[0]
+        file_dir = f'{new_dir}/{name}_summary.pdf'
+        
+        c = canvas.Canvas(file_dir, pagesize = A4)
+        width, height = A4
+        
+        for first in range(0, len(level), per_page):
+        
+            chunk = slice(first, first + per_page)
             
             t_style = TableStyle([('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
                               ('ALIGN', (0,0), (-1,-1), 'CENTER'),
                               ('INNERGRID', (0,0), (-1,-1), 0.25,
                                colors.black)])
             
-            name = list(summary.columns)[0]
-            file_dir = f'{new_dir}/{name}_summary.pdf'
-            file_dirs.append(file_dir)
-            
-            c = canvas.Canvas(file_dir, pagesize = A4)
-            width, height = A4
-            
-            for idx, l in enumerate(level):
+            for idx, l in enumerate(level[chunk]):
                 table = l.to_records(index = False).tolist()
                 table.insert(0, list(l.columns))
                 t = Table(table, colWidths = cwidth * mm)
                 t.setStyle(t_style)
                 t.wrapOn(c, width, height)
                 t.drawOn(c, 0.1 * width, (0.55 - idx * 0.2) * height)
-                
-            for idx, fig in enumerate(figs):
-                drawing = svg2rlg(fig)
-                sx = sy = 0.4
-                drawing.width = drawing.minWidth() * sx
-                drawing.height = drawing.height * sy
-                drawing.scale(sx, sy)
+            
+            for idx, fig in enumerate(figs[chunk]):
+                if isinstance(fig, Drawing):
+                    drawing = fig
+                else:
+                    drawing = svg2rlg(fig)
+                    sx = sy = 0.4
+                    drawing.width = drawing.minWidth() * sx
+                    drawing.height = drawing.height * sy
+                    drawing.scale(sx, sy)
                 drawing.wrapOn(c, width, height)
                 drawing.drawOn(c, 0.58 * width, (0.54 - idx * 0.2) * height)
-                
-            table = summary.to_records(index = False).tolist()
-            table.insert(0, list(summary.columns))
+            
+            page_summary = summary.iloc[
+                :, [0] + list(range(1, len(summary.columns)))[chunk]
+                ]
+            table = page_summary.to_records(index = False).tolist()
+            table.insert(0, list(page_summary.columns))
             t = Table(table, colWidths = (cwidth + 10) * mm)
             
             for row, values, in enumerate(table):
@@ -308,11 +407,11 @@ class Report:
             t.wrapOn(c, width, height)
             t.drawOn(c, 0.18 * width, 0.75 * height)
             
-            styles = getSampleStyleSheet()    
+            styles = getSampleStyleSheet()
             ptext = f'{name} er beregnet som: {p.dam_type}'
-            p = Paragraph(ptext, style = styles['Normal'])
-            p.wrapOn(c, 150 * mm, 25 * mm)
-            p.drawOn(c, 0.17 * width , 0.84 * height)
+            para = Paragraph(ptext, style = styles['Normal'])
+            para.wrapOn(c, 150 * mm, 25 * mm)
+            para.drawOn(c, 0.17 * width , 0.84 * height)
             
             styles.add(ParagraphStyle(name = 'Header',
                                       parent = styles['Heading1'],
@@ -321,24 +420,337 @@ class Report:
                                       ))
             
             ptext = f'Stabilitetsberegning: {name}'
-            p = Paragraph(ptext, style = styles['Header'])
-            p.wrapOn(c, 150 * mm, 40 * mm)
-            p.drawOn(c, 0.17 * width , 0.9 * height)
+            para = Paragraph(ptext, style = styles['Header'])
+            para.wrapOn(c, 150 * mm, 40 * mm)
+            para.drawOn(c, 0.17 * width , 0.9 * height)
+            
+            c.showPage()
+        
+        c.save()
+        
+        return file_dir
+    
+    def merge_pages(self, file_dirs, values, pages, force = False):
+        #merge the pages to the report (Dam_summary.pdf), only if a page or
+        #the order of pages has changed; values are the digests of the pages
+        #(see pillar_digest), pages the manifest of the pages, returns the
+        #file path
+        
+        file_dir = f"{self.context.dir('result')}/Dam_summary.pdf"
+        value = manifest.digest(file_dirs, values)
+        
+        if force or not pages.is_current('Dam_summary', value, file_dir):
+            merger = PdfFileMerger()
             
-            c.save()
+            for pdf_dir in file_dirs:
+                with open(pdf_dir,'rb') as pdf:
+                    merger.append(PdfFileReader(pdf))
             
-        file_dir = f'{new_dir}/Dam_summary.pdf'
-        merger = PdfFileMerger()
+            merger.write(file_dir)
+            merger.close()
+            pages.update('Dam_summary', value)
+        
+        return file_dir
+    
+    def create_report(self, records = None, force = False):
+        """
+        Create one report page per pillar and merge the pages; pages are
+        created pillar by pillar as soon as the results of a pillar are
+        available.
+        Pages are kept in ../result/pages; a page is only created again if
+        the inputs of its pillar (geometry, load cases, thresholds) have
+        changed since the last run (see manifest.py), the merged report is
+        rebuilt from the cached pages
+        
+        Parameters
+        ----------
+        records : iterable, optional
+            Result records (see Evaluation.iter_pillars) in pillar order;
+            the default is to calculate the records of changed pillars only
+        force : bool, optional
+            Create all pages; the default is False
+        """
+        
+        new_dir = self.context.dir('result')
+        pages_dir = self.context.dir('result', 'pages')
+        pages = manifest.Manifest(f'{pages_dir}/manifest.json')
         
-        for pdf_dir in file_dirs:
-            with open(pdf_dir,'rb') as pdf:
-                merger.append(PdfFileReader(pdf))
+        if records is not None:
+            records = iter(records)
+        
+        file_dirs = []
+        values = []
+        created = 0
+        
+        for p in self.dam.pillars:
+            if records is not None:
+                record = next(records)
+            else:
+                record = None
+            
+            key = p.name
+            value = self.pillar_digest(p)
+            pdf_dir = f'{pages_dir}/{p.name}_summary.pdf'
             
-        merger.write(file_dir)
-        merger.close()
+            if force or not pages.is_current(key, value, pdf_dir):
+                if record is None:
+                    record = self.evaluation.evaluate_pillar(p)
+                figs = self.pillar_drawings(p)
+                pdf_dir = self.create_page(record, p, figs, pages_dir)
+                pages.update(key, value)
+                created += 1
+            
+            file_dirs.append(pdf_dir)
+            values.append(value)
+        
+        self.merge_pages(file_dirs, values, pages, force)
+        pages.save()
+        
+        return (f'PDFs created ({new_dir}), {created} of '
+                f'{len(file_dirs)} pages updated')
+
+    def overview_table(self):
+        """
+        Stability of all pillars along the dam axis; the loads are
+        calculated once per load case for the whole dam (see
+        Evaluation.stability), not pillar by pillar
+        
+        Returns
+        -------
+        pandas.DataFrame
+            One row per load case, pillar and failure mode (in this order)
+            with the columns of evaluation.HEADER, 'Akse' (position of the
+            pillar along the dam axis, see Pillar.axis) and 'Margin' (see
+            Evaluation.glidning_margin/ velting_margin)
+        """
+        ev = self.evaluation
+        axes = [p.axis() for p in self.dam.pillars]
+        
+        rows = {'Glidning': [], 'Velting': []}
+        for case, stab in zip(ev.cases, ev.stability()):
+            gl = stab.glidning()
+            vm = stab.velting_moment()
+            vr = stab.velting_resultant()
+            for idx, p in enumerate(self.dam.pillars):
+                rows['Glidning'].append(
+                    ev.glidning_row(case, p, gl[idx])
+                    + [axes[idx], ev.glidning_margin(case, p, gl[idx])]
+                    )
+                rows['Velting'].append(
+                    ev.velting_row(case, p, vm[idx], vr[idx])
+                    + [axes[idx],
+                       ev.velting_margin(case, p, vm[idx], vr[idx])]
+                    )
+        
+        df = pd.DataFrame(rows['Glidning'] + rows['Velting'],
+                          columns = evaluation.HEADER + ['Akse', 'Margin'])
+        df['Akse'] = df['Akse'].astype(float).round(2)
+        df['Margin'] = df['Margin'].astype(float).round(3)
+        return df
+    
+    def overview_drawing(self, table, width = 510, height = 360):
+        #factors of safety of all pillars along the dam axis in one drawing,
+        #one panel per failure mode and one line per load case; the factors
+        #are shown relative to their threshold (1 + margin, i.e. 1 is the
+        #threshold; for the resultant of gravity dams: the distance to the
+        #nearer end of the sole relative to the smallest distance), pillars
+        #that do not meet the threshold are marked red
+        
+        cases = list(dict.fromkeys(table['Lasttilfelle']))
+        palette = [colors.blue, colors.green, colors.orange, colors.purple,
+                   colors.brown, colors.darkcyan, colors.magenta, colors.olive]
+        
+        d = Drawing(width, height)
         
-        for pdf_dir in file_dirs:
-            os.remove(pdf_dir)
+        #plot area of the panels; legend to the right
+        x0, x1 = 34, width - 96
+        panel = height / 2
+        
+        for m_idx, mode in enumerate(['Glidning', 'Velting']):
+            sub = table[table['Sikkerhet mot'] == mode]
+            x = sub['Akse'].to_numpy()[:len(sub) // len(cases)]
+            order = np.argsort(x, kind = 'stable')
+            x = x[order]
+            values = 1 + sub['Margin'].to_numpy().reshape(len(cases), -1)
+            values = values[:, order]
+            
+            #values far above the threshold are cut at the top of the panel
+            finite = values[np.isfinite(values)]
+            ymin = min(0, finite.min()) if finite.size else 0
+            ymax = min(max(2, finite.max()) if finite.size else 2, 4)
+            values = np.clip(np.nan_to_num(values, posinf = ymax), ymin, ymax)
+            xmin, xmax = x.min(), x.max()
+            if xmax == xmin:
+                xmin, xmax = xmin - 1, xmax + 1
+            
+            y0 = height - (m_idx + 1) * panel + 22
+            y1 = height - m_idx * panel - 14
+            
+            def tx(v):
+                return x0 + (v - xmin) / (xmax - xmin) * (x1 - x0)
+            
+            def ty(v):
+                return y0 + (v - ymin) / (ymax - ymin) * (y1 - y0)
+            
+            px = tx(x)
+            for c_idx, case in enumerate(cases):
+                color = palette[c_idx % len(palette)]
+                py = ty(values[c_idx])
+                if len(px) > 1:
+                    d.add(shapes.PolyLine(
+                        np.column_stack([px, py]).ravel().tolist(),
+                        strokeColor = color, strokeWidth = 0.6
+                        ))
+                else:
+                    d.add(shapes.Circle(px[0], py[0], 1, fillColor = color,
+                                        strokeWidth = 0))
+                for xi, yi in zip(px[values[c_idx] < 1],
+                                  py[values[c_idx] < 1]):
+                    d.add(shapes.Circle(xi, yi, 1.2, fillColor = colors.red,
+                                        strokeWidth = 0))
+                if m_idx == 0:
+                    ly = height - 20 - c_idx * 9
+                    d.add(shapes.Line(x1 + 8, ly + 2, x1 + 18, ly + 2,
+                                      strokeColor = color, strokeWidth = 1))
+                    d.add(shapes.String(x1 + 21, ly, case, fontSize = 6))
             
-        return f'PDFs created ({new_dir})'
-        
\ No newline at end of file
+            #threshold
+            d.add(shapes.Line(x0, ty(1), x1, ty(1), strokeColor = colors.red,
+                              strokeWidth = 0.5, strokeDashArray = [3, 2]))
+            
+            #axes, ticks and labels
+            d.add(shapes.Rect(x0, y0, x1 - x0, y1 - y0,
+                              fillColor = None, strokeWidth = 0.4))
+            for t in nice_ticks(xmin, xmax, 8):
+                d.add(shapes.Line(tx(t), y0, tx(t), y0 - 2, strokeWidth = 0.4))
+                d.add(shapes.String(tx(t), y0 - 8, f'{t:g}', fontSize = 6,
+                                    textAnchor = 'middle'))
+            for t in nice_ticks(ymin, ymax):
+                d.add(shapes.Line(x0, ty(t), x0 - 2, ty(t), strokeWidth = 0.4))
+                d.add(shapes.String(x0 - 3, ty(t) - 2, f'{t:g}', fontSize = 6,
+                                    textAnchor = 'end'))
+            d.add(shapes.String((x0 + x1) / 2, y0 - 16, 'Akse [m]',
+                                fontSize = 6, textAnchor = 'middle'))
+            ylabel = shapes.Group(
+                shapes.String(0, 0, 'Sikkerhetsfaktor / krav', fontSize = 6,
+                              textAnchor = 'middle'),
+                transform = (0, 1, -1, 0, 8, (y0 + y1) / 2)
+                )
+            d.add(ylabel)
+            d.add(shapes.String((x0 + x1) / 2, y1 + 4, mode, fontSize = 8,
+                                textAnchor = 'middle'))
+        
+        return d
+    
+    def create_overview(self, worst = 20, force = False):
+        """
+        Create a dam-wide overview instead of one page per pillar, e.g. for
+        dams with many pillars: the factors of safety of all pillars and
+        load cases along the dam axis (one drawing) and the sections with
+        the smallest margins (Dam_overview.pdf); the complete table, sorted
+        by margin, is written to Dam_overview.xlsx. The files are only
+        created again if the inputs of a pillar have changed
+        
+        Parameters
+        ----------
+        worst : positive int, optional
+            Number of rows of the table of the worst sections; the default
+            is 20
+        force : bool, optional
+            Create the overview even if it is up to date; the default is
+            False
+        
+        Raises
+        ------
+        ValueError
+            If the dam has no pillars or there are no load cases
+        """
+        if not self.dam.pillars:
+            raise ValueError('Overview of a dam without pillars')
+        if not self.evaluation.cases:
+            raise ValueError('Overview without load cases')
+        
+        new_dir = self.context.dir('result')
+        outputs = manifest.Manifest(f'{new_dir}/manifest.json')
+        
+        file_dir = f'{new_dir}/Dam_overview.pdf'
+        xlsx_dir = f'{new_dir}/Dam_overview.xlsx'
+        value = manifest.digest(
+            [self.pillar_digest(p) for p in self.dam.pillars], worst
+            )
+        if not force and outputs.is_current('Dam_overview', value, file_dir,
+                                            xlsx_dir):
+            return f'Overview is up to date ({file_dir})'
+        
+        table = self.overview_table()
+        table = table[['Damseksjon', 'Akse'] + evaluation.HEADER[:2]
+                      + evaluation.HEADER[3:5] + ['Margin', 'Stabilitet']]
+        ranked = table.sort_values('Margin', kind = 'stable')
+        ranked.to_excel(xlsx_dir, index = False)
+        
+        c = canvas.Canvas(file_dir, pagesize = A4)
+        width, height = A4
+        
+        styles = getSampleStyleSheet()
+        styles.add(ParagraphStyle(name = 'Header',
+                                  parent = styles['Heading1'],
+                                  alignment = TA_CENTER,
+                                  fontSize = 16
+                                  ))
+        n_fail = (ranked['Stabilitet'] == 'ikke ok').sum()
+        para = Paragraph('Stabilitetsoversikt', style = styles['Header'])
+        para.wrapOn(c, 150 * mm, 40 * mm)
+        para.drawOn(c, 0.17 * width , 0.93 * height)
+        ptext = (f'{len(self.dam.pillars)} damseksjoner, '
+                 f'{len(self.evaluation.cases)} lasttilfeller, '
+                 f'{n_fail} kontroller ikke ok')
+        para = Paragraph(ptext, style = styles['Normal'])
+        para.wrapOn(c, 150 * mm, 25 * mm)
+        para.drawOn(c, 0.1 * width , 0.9 * height)
+        
+        drawing = self.overview_drawing(table)
+        drawing.wrapOn(c, width, height)
+        drawing.drawOn(c, (width - drawing.width) / 2, 0.89 * height
+                       - drawing.height)
+        
+        rows = ranked.head(worst)
+        data = rows.to_records(index = False).tolist()
+        data.insert(0, list(rows.columns))
+        t_style = TableStyle([('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+                              ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+                              ('FONTSIZE', (0,0), (-1,-1), 6),
+                              ('TOPPADDING', (0,0), (-1,-1), 1),
+                              ('BOTTOMPADDING', (0,0), (-1,-1), 1),
+                              ('INNERGRID', (0,0), (-1,-1), 0.25,
+                               colors.black)])
+        for row, cells in enumerate(data):
+            for column, cell in enumerate(cells):
+                if cell == 'ikke ok':
+                    t_style.add('BACKGROUND', (column, row), (column, row),
+                                colors.red)
+                if cell == 'ok':
+                    t_style.add('BACKGROUND', (column, row), (column, row),
+                                colors.green)
+        t = Table(data, colWidths = 22 * mm)
+        t.setStyle(t_style)
+        _, t_height = t.wrapOn(c, width, height)
+        t.drawOn(c, (width - 8 * 22 * mm) / 2,
+                 0.87 * height - drawing.height - t_height)
+        
+        c.showPage()
+        c.save()
+        
+        outputs.update('Dam_overview', value)
+        outputs.save()
+        
+        return f'Overview created ({file_dir})'
+    
+    def create_default(self, force = False):
+        """
+        Create the default report: one page per pillar (see create_report)
+        or, for dams with more than OVERVIEW_PILLARS pillars, the dam-wide
+        overview (see create_overview)
+        """
+        if len(self.dam.pillars) > OVERVIEW_PILLARS:
+            return self.create_overview(force = force)
+        return self.create_report(force = force)
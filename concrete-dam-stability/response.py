@@ -0,0 +1,278 @@
+import stability, load, dam
+
+import numpy as np
+
+#order of loads, same as Stability.basic()
+LOADS = ('Islast', 'Vanntrykk', 'Vannvekt', 'Overtopping', 'Opptrykk',
+         'Egenvekt')
+
+def coefficients(loads, pivot, alpha, phi):
+    """
+    Vectorized calculation of the stability coefficients, equivalent to
+    Stability.glidning(), velting_moment() and velting_resultant()
+    
+    Parameters
+    ----------
+    loads : numpy.ndarray
+        Array of shape (..., 6, 3): load F, first moments F * x and F * y
+        (x, y: load centroid) of the loads in the order of LOADS
+    pivot : tuple
+        Coordinates (x, y) of the pivot point (downstream contact)
+    alpha : float or numpy.ndarray
+        Shear surface angle,
+        unit: degrees
+    phi : float or numpy.ndarray
+        Friction angle,
+        unit: degrees
+    
+    Returns
+    -------
+    tuple
+        Arrays of shape (...): sliding coefficient, overturning
+        coefficient (moment ratio), position of the resultant
+    """
+    f, fx, fy = loads[..., 0], loads[..., 1], loads[..., 2]
+    px, py = pivot
+    
+    #moments about the pivot point; horizontal loads (ice, water pressure)
+    #act with their height above the pivot, vertical loads with their
+    #distance from the pivot
+    m = np.empty_like(f)
+    m[..., :2] = fy[..., :2] - f[..., :2] * py
+    m[..., 2:] = f[..., 2:] * px - fx[..., 2:]
+    
+    fh = f[..., 0] + f[..., 1]
+    fv = f[..., 2:].sum(axis = -1)
+    
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        gl = np.abs(fv * np.tan(np.radians(phi + alpha)) / fh)
+        m_pos = np.where(m >= 0, m, 0).sum(axis = -1)
+        m_neg = np.where(m < 0, m, 0).sum(axis = -1)
+        vm = np.abs(m_pos / m_neg)
+        vr = m.sum(axis = -1) / np.sqrt(fh**2 + fv**2)
+    return gl, vm, vr
+
+def sample(pillar, level):
+    """
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (5, 3): load and first moments of the level-dependent
+        loads of pillar (ice load 1 kN/m, uplift factor 1) calculated with
+        the load classes
+    """
+    stab = stability.Stability(dam.Dam([pillar]), level, ice = 1, uplift = 1)
+    out = np.zeros((5, 3))
+    for idx, l in enumerate(stab.basic()[:5]):
+        f = l.calc_load()[0]
+        if f != 0:
+            c = l.calc_centroid()[0]
+            out[idx] = f, f * c.x, f * c.y
+    return out
+
+def self_weight(pillar):
+    """
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (3, ): self weight and its first moments
+    """
+    ev = load.Egenvekt(dam.Dam([pillar]))
+    ev_load, ev_c = ev.calc_load()[0], ev.calc_centroid()[0]
+    return np.array([ev_load, ev_load * ev_c.x, ev_load * ev_c.y])
+
+class LevelResponse:
+    """
+    Precomputed response of the loads of a pillar as functions of the water
+    level. Between geometric breakpoints (vertex elevations of the profile,
+    contacts, crest), the level-dependent loads and their first moments are
+    polynomials of at most third degree in the water level; they are
+    interpolated from the load classes (see load.py) at four levels per
+    interval and verified at a fifth level, intervals that do not verify are
+    split. Afterwards, loads and stability coefficients at any level within
+    the domain are evaluated without geometric operations; levels outside
+    the domain and in intervals that did not verify within max_depth splits
+    (see inexact) are calculated with the load classes, so the response is
+    exact at every level.
+    """
+    
+    def __init__(self, pillar, lower = None, upper = None, g_water = 9.81,
+                 tol = 1e-7, max_depth = 8):
+        """
+        Parameters
+        ----------
+        pillar : instance of Pillar
+        lower : float, optional
+            Lowest water level of the domain; the default is the lowest
+            point of the pillar,
+            unit: masl
+        upper : float, optional
+            Highest water level of the domain; the default is 5 m above the
+            highest point of the pillar,
+            unit: masl
+        g_water : positive float, optional
+            Specific weight of water; the default is 9.81,
+            unit: kN/m3
+        tol : positive float, optional
+            Relative tolerance of the verification; the default is 1e-7
+        max_depth : positive int, optional
+            Maximum number of interval splits; intervals that do not verify
+            after max_depth splits are evaluated with the load classes; the
+            default is 8
+        
+        Returns
+        -------
+        None.
+        
+        """
+        self.pillar = pillar
+        self.g_water = g_water
+        self.tol = tol
+        self.max_depth = max_depth
+        
+        left, right = pillar.left_contact(), pillar.right_contact()
+        highest = pillar.highest_point()
+        if lower is None:
+            lower = pillar.lowest_point().y
+        if upper is None:
+            upper = highest.y + 5
+        self.lower, self.upper = lower, upper
+        
+        #level-independent quantities
+        self.name = pillar.name
+        self.dam_type = pillar.dam_type
+        self.phi = pillar.phi
+        self.alpha = pillar.bottom_angle()
+        self.pivot = (right.x, right.y)
+        self.dist = right.x - left.x
+        self.egenvekt = self_weight(pillar)
+        
+        #breakpoints
+        ys = {left.y, right.y, highest.y, pillar.lowest_point().y + 0.25}
+        for seg in pillar.segments:
+            ys.update(seg.poly.exterior.coords.xy[1])
+        breaks = sorted(y for y in ys if lower < y < upper)
+        breaks = [lower] + breaks + [upper]
+        
+        edges, coeffs, verified = [], [], []
+        for a, b in zip(breaks[:-1], breaks[1:]):
+            self.fit(a, b, 0, edges, coeffs, verified)
+        self.breaks = np.array(edges + [upper])
+        self.coeffs = np.array(coeffs)
+        self.verified = np.array(verified)
+        
+        #intervals (lower, upper level) that are not interpolated
+        self.inexact = [(float(a), float(b)) for a, b, ok in zip(
+            self.breaks[:-1], self.breaks[1:], self.verified
+            ) if not ok]
+    
+    def sample(self, level):
+        #level-dependent loads and first moments, see sample()
+        return sample(self.pillar, level)
+    
+    def fit(self, a, b, depth, edges, coeffs, verified):
+        #cubic interpolation in the local coordinate u = (level - a)/(b - a)
+        nodes = np.array([0.1, 0.37, 0.63, 0.9])
+        samples = np.array([self.sample(a + u * (b - a)) for u in nodes])
+        vander = np.vander(nodes, 4, increasing = True)
+        c = np.linalg.solve(vander, samples.reshape(4, -1))
+        c = c.T.reshape(5, 3, 4)
+        
+        u = 0.5
+        check = self.sample(a + u * (b - a))
+        pred = c @ np.array([1, u, u**2, u**3])
+        ok = np.all(np.abs(pred - check) <= self.tol * (1 + np.abs(check)))
+        if ok or depth >= self.max_depth:
+            edges.append(a)
+            coeffs.append(c)
+            verified.append(bool(ok))
+        else:
+            m = (a + b) / 2
+            self.fit(a, m, depth + 1, edges, coeffs, verified)
+            self.fit(m, b, depth + 1, edges, coeffs, verified)
+    
+    def loads(self, levels, ice = 100, uplift = 1, g_water = None,
+              concrete = 1):
+        """
+        Parameters
+        ----------
+        levels : float or array_like
+            Water levels,
+            unit: masl
+        ice : float or array_like, optional
+            Ice load; the default is 100,
+            unit: kN/m
+        uplift : float or array_like, optional
+            Uplift factor; the default is 1
+        g_water : float or array_like, optional
+            Specific weight of water; the default is the specific weight
+            of the response,
+            unit: kN/m3
+        concrete : float or array_like, optional
+            Factor on the self weight (specific weights of all segments);
+            the default is 1
+        
+        Returns
+        -------
+        numpy.ndarray
+            Array of shape (..., 6, 3): load and first moments of the loads
+            in the order of LOADS
+        """
+        levels = np.asarray(levels, dtype = float)
+        flat = levels.reshape(-1)
+        
+        idx = np.clip(
+            np.searchsorted(self.breaks, flat, side = 'right') - 1,
+            0, len(self.coeffs) - 1
+            )
+        a, b = self.breaks[idx], self.breaks[idx + 1]
+        u = (flat - a) / (b - a)
+        powers = np.stack([np.ones_like(u), u, u**2, u**3], axis = -1)
+        var = np.einsum('nlqk,nk->nlq', self.coeffs[idx], powers)
+        
+        #levels outside of the domain or in intervals that did not verify
+        #are calculated with the load classes
+        outside = ((flat < self.lower) | (flat > self.upper)
+                   | ~self.verified[idx])
+        for i in np.flatnonzero(outside & ~np.isnan(flat)):
+            var[i] = self.sample(flat[i])
+        
+        out = np.empty((len(flat), 6, 3))
+        out[:, :5] = var
+        out[:, 5] = self.egenvekt
+        out = out.reshape(levels.shape + (6, 3))
+        
+        water = 1 if g_water is None else np.asarray(g_water) / self.g_water
+        out[..., 0, :] *= np.asarray(ice, dtype = float)[..., None]
+        out[..., 1:4, :] *= np.asarray(water, dtype = float)[..., None, None]
+        out[..., 4, :] *= (np.asarray(uplift, dtype = float)
+                           * water)[..., None]
+        out[..., 5, :] *= np.asarray(concrete, dtype = float)[..., None]
+        return out
+    
+    def coefficients(self, levels, ice = 100, uplift = 1, phi = None,
+                     g_water = None, concrete = 1):
+        """
+        Stability coefficients at the given water levels, see loads() for
+        the parameters; phi is the friction angle, the default is the
+        friction angle of the pillar
+        
+        Returns
+        -------
+        tuple
+            Arrays: sliding coefficient, overturning coefficient (moment
+            ratio), position of the resultant
+        """
+        if phi is None:
+            phi = self.phi
+        loads = self.loads(levels, ice, uplift, g_water, concrete)
+        return coefficients(loads, self.pivot, self.alpha, phi)
+
+def build(dam, lower = None, upper = None, **kwargs):
+    """
+    Returns
+    -------
+    list
+        List of instances of LevelResponse, one per pillar of dam
+    """
+    return [LevelResponse(p, lower, upper, **kwargs) for p in dam.pillars]
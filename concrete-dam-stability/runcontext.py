@@ -0,0 +1,67 @@
+import os
+import sys
+import logging
+
+from matplotlib.figure import Figure
+
+class RunContext:
+    """
+    Context of an analysis run: output root, logger and plotting. Reports,
+    exports and writers receive a context instead of writing to fixed
+    relative paths, printing to stdout and using the global pyplot state,
+    so that several analyses can run at the same time in one process (e.g.
+    threads or async tasks of a service), each with its own context.
+    """
+    
+    def __init__(self, root = '..', logger = None, name = 'dam'):
+        """
+        Parameters
+        ----------
+        root : string, optional
+            Output root; images, results and exports are written to the
+            sub directories img, result and export; the default is '..'
+            (relative to the working directory, as before)
+        logger : logging.Logger, optional
+            Logger of progress messages; the default is a logger of this
+            context that writes to stdout
+        name : string, optional
+            Name of the default logger; the default is 'dam'
+        
+        Returns
+        -------
+        None.
+        
+        """
+        self.root = root
+        if logger is None:
+            #not registered in the logging module, i.e. not shared
+            logger = logging.Logger(name, logging.INFO)
+            handler = logging.StreamHandler(sys.stdout)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+        self.logger = logger
+    
+    def dir(self, *parts):
+        """
+        Returns
+        -------
+        string
+            Path of a directory below the output root, created if it does
+            not exist, e.g. dir('result', 'pages')
+        """
+        path = os.path.join(self.root, *parts)
+        os.makedirs(path, exist_ok = True)
+        return path
+    
+    def info(self, message):
+        self.logger.info(message)
+    
+    def figure(self):
+        """
+        Returns
+        -------
+        matplotlib.figure.Figure
+            New figure that is not managed by pyplot (no global state, no
+            need to close it)
+        """
+        return Figure()
@@ -0,0 +1,153 @@
+import evaluation, dam
+
+class Screening:
+    """
+    Screen a dam for failing pillars: instead of a full evaluation, only the
+    governing pillar, load case and failure mode (the one with the
+    smallest margin to its threshold) is determined.
+    Work is ordered cheapest-first: sliding only requires the loads and is
+    checked for all pillars and load cases before overturning, which
+    additionally requires the load centroids.
+    """
+    
+    def __init__(self, dam, levels, thresholds = None,
+                 skip_velting = False, stop_at_failure = False):
+        """
+        Parameters
+        ----------
+        dam : instance of Dam
+        levels : list
+            List of load cases or water levels, see Evaluation
+        thresholds : dict, optional
+            Threshold values, see evaluation.THRESHOLDS
+        skip_velting : bool, optional
+            Do not check overturning of pillars that already fail in
+            sliding; the default is False
+        stop_at_failure : bool, optional
+            Stop at the first failure found, the governing case is then the
+            first failure rather than the worst one; the default is False
+        
+        Returns
+        -------
+        None.
+        
+        """
+        self.dam = dam
+        self.levels = levels
+        self.evaluation = evaluation.Evaluation(dam, levels, thresholds)
+        self.skip_velting = skip_velting
+        self.stop_at_failure = stop_at_failure
+    
+    def candidates(self):
+        #yields (mode, pillar, load case, coefficient, margin) in the order of
+        #increasing cost; stabilities of single pillars are kept for the
+        #overturning check, so that the loads are only calculated once
+        ev = self.evaluation
+        stabs = {}
+        failed = set()
+        
+        for p in self.dam.pillars:
+            stabs[p.name] = ev.stability(dam.Dam([p]))
+            for case, stab in zip(ev.cases, stabs[p.name]):
+                gl_i = stab.glidning()[0]
+                margin = ev.glidning_margin(case, p, gl_i)
+                if margin < 0:
+                    failed.add(p.name)
+                yield 'Glidning', p, case, gl_i, margin
+        
+        for p in self.dam.pillars:
+            if self.skip_velting and p.name in failed:
+                continue
+            for case, stab in zip(ev.cases, stabs.pop(p.name)):
+                vm_i = stab.velting_moment()[0]
+                vr_i = stab.velting_resultant()[0]
+                if p.dam_type.startswith('Gr'):
+                    coeff = vr_i
+                else:
+                    coeff = vm_i
+                margin = ev.velting_margin(case, p, vm_i, vr_i)
+                yield 'Velting', p, case, coeff, margin
+    
+    def screen(self):
+        """
+        Returns
+        -------
+        dict
+            Governing case:
+            - 'mode': failure mode (Glidning, Velting)
+            - 'level_name': load case name (e.g. HRV + is, DFV, MFV)
+            - 'pillar': pillar name
+            - 'coefficient': stability coefficient
+            - 'threshold': threshold (see Evaluation.threshold)
+            - 'margin': relative margin to the threshold
+            - 'result': stability (ok/ ikke ok)
+            - 'checks': number of checks carried out
+            None if there is nothing to check (no pillars or load cases)
+        """
+        governing = None
+        checks = 0
+        for mode, p, case, coeff, margin in self.candidates():
+            checks += 1
+            if governing is None or margin < governing[4]:
+                governing = (mode, p, case, coeff, margin)
+            if self.stop_at_failure and margin < 0:
+                break
+        
+        if governing is None:
+            return None
+        mode, p, case, coeff, margin = governing
+        if margin >= 0:
+            result = 'ok'
+        else:
+            result = 'ikke ok'
+        return {'mode': mode,
+                'level_name': case.name,
+                'pillar': p.name,
+                'coefficient': round(coeff, 2),
+                'threshold': self.evaluation.threshold(mode, case, p),
+                'margin': round(margin, 3),
+                'result': result,
+                'checks': checks}
+    
+    def summary(self):
+        """
+        Returns
+        -------
+        string
+            One-line summary of the governing case
+        """
+        s = self.screen()
+        if s is None:
+            return 'Ingen kontroller'
+        return (f"{s['pillar']}, {s['level_name']}: {s['mode']} "
+                f"{s['coefficient']} (krav {round(s['threshold'], 2)}, "
+                f"margin {s['margin']}) - {s['result']} "
+                f"[{s['checks']} kontroller]")
+
+def screen_dams(dams, levels, **kwargs):
+    """
+    Screen several dams, e.g. after a change of the threshold values
+    
+    Parameters
+    ----------
+    dams : dict
+        Instances of Dam by name
+    levels : dict or list
+        Load cases or water levels by dam name, or one list of load cases
+        or water levels for all dams
+    **kwargs
+        Keyword arguments of Screening
+    
+    Returns
+    -------
+    dict
+        Governing case (see Screening.screen) by dam name
+    """
+    results = {}
+    for name, d in dams.items():
+        if isinstance(levels, dict):
+            lv = levels[name]
+        else:
+            lv = levels
+        results[name] = Screening(d, lv, **kwargs).screen()
+    return results
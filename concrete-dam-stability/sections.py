@@ -0,0 +1,173 @@
+import evaluation, dam
+from pillar import Pillar
+from segment import Segment
+
+import numpy as np
+
+#cached geometry of a pillar that only depends on its segment profiles,
+#not on the contacts or the axis (see pillar.cached)
+SHARED = [('get_union', ), ('highest_point', ), ('lowest_point', ),
+          ('righternmost_x', ), ('lefternmost_x', )]
+
+class SectionGenerator:
+    """
+    Generate analysis sections (instances of Pillar) along a dam from the
+    upstream and downstream rock lines (longitudinal profiles of the
+    contact elevations) and a profile template, e.g. a section every 0.5 m
+    of a gravity dam instead of one per pillar. The contacts of every
+    section are interpolated from the rock lines at its station.
+    Profile work is shared: the geometry that only depends on the template
+    (union of the segments, highest and lowest point, ...) is calculated
+    once for all sections, and sections with the same contacts (rounded to
+    the resolution) are only evaluated once.
+    """
+    
+    def __init__(self, profile, upstream, downstream, crest_width, phi,
+                 dam_type = 'Gravitasjonsdam', resolution = 0.01):
+        """
+        Parameters
+        ----------
+        profile : list
+            Profile template: segments as tuples (polygon, specific weight,
+            name), e.g. [(pilar_poly, 23.54, 'Betong')]; the width of the
+            segments is the spacing of the sections
+        upstream, downstream : list
+            Rock lines: points (station, elevation) along the dam axis,
+            stations increasing,
+            unit: m, masl
+        crest_width : positive float
+            Width of the dam crest,
+            unit: m
+        phi : positive float
+            Friction angle,
+            unit: degrees
+        dam_type : string, optional
+            Dam type; the default is 'Gravitasjonsdam'
+        resolution : positive float, optional
+            Contacts are rounded to this resolution, sections with the same
+            contacts are evaluated once; the default is 0.01,
+            unit: m
+        
+        Returns
+        -------
+        None.
+        
+        """
+        self.profile = profile
+        self.upstream = np.asarray(upstream, dtype = float)
+        self.downstream = np.asarray(downstream, dtype = float)
+        self.crest_width = crest_width
+        self.phi = phi
+        self.dam_type = dam_type
+        self.resolution = resolution
+        
+        #geometry of the template, shared by all sections
+        template = Pillar([Segment(poly, 1, w, 0, name)
+                           for poly, w, name in profile],
+                          None, None, crest_width, phi, dam_type, 'Mal')
+        self.shared = {key: getattr(template, key[0])() for key in SHARED}
+    
+    def contacts(self, stations):
+        """
+        Returns
+        -------
+        tuple
+            Arrays of the upstream and downstream contact elevations at the
+            stations (rounded to the resolution)
+        """
+        stations = np.asarray(stations, dtype = float)
+        out = []
+        for line in (self.upstream, self.downstream):
+            y = np.interp(stations, line[:, 0], line[:, 1])
+            out.append(np.round(y / self.resolution) * self.resolution)
+        lowest = self.shared[('lowest_point', )].y
+        highest = self.shared[('highest_point', )].y
+        for y in out:
+            if np.any(y <= lowest) or np.any(y >= highest):
+                raise ValueError('Contacts outside of the profile template '
+                                 f'({lowest} - {highest} masl)')
+        return out[0], out[1]
+    
+    def sections(self, spacing = 1., start = None, end = None):
+        """
+        Parameters
+        ----------
+        spacing : positive float, optional
+            Distance of the sections (width of a section); the default is
+            1,
+            unit: m
+        start, end : float, optional
+            Range of stations; the default is the range of the rock lines,
+            unit: m
+        
+        Returns
+        -------
+        list
+            List of instances of Pillar, one section per spacing (the last
+            one may be narrower) with the station of its center as axis
+        """
+        if start is None:
+            start = max(self.upstream[0, 0], self.downstream[0, 0])
+        if end is None:
+            end = min(self.upstream[-1, 0], self.downstream[-1, 0])
+        edges = np.append(np.arange(start, end, spacing), end)
+        edges = edges[np.append(True, np.diff(edges) > 1e-9)]
+        stations = (edges[:-1] + edges[1:]) / 2
+        widths = np.diff(edges)
+        contact_l, contact_r = self.contacts(stations)
+        
+        sections = []
+        for station, width, l, r in zip(stations, widths, contact_l,
+                                        contact_r):
+            station = round(float(station), 3)
+            segs = [Segment(poly, float(width), w, station, name)
+                    for poly, w, name in self.profile]
+            p = Pillar(segs, float(l), float(r), self.crest_width, self.phi,
+                       self.dam_type, f'Snitt {station}')
+            p._cache.update(self.shared)
+            sections.append(p)
+        return sections
+    
+    def key(self, p):
+        #sections with the same key have the same results
+        return (p.contact_l, p.contact_r, p.segments[0].width)
+    
+    def evaluate(self, sections, levels, thresholds = None):
+        """
+        Evaluate sections in batch: one evaluation (see Evaluation) of the
+        distinct sections, the results are assigned to all sections with
+        the same contacts and width
+        
+        Parameters
+        ----------
+        sections : list
+            Sections, see sections()
+        levels : list
+            Load cases or water levels, see Evaluation
+        thresholds : dict, optional
+            Threshold values, see evaluation.THRESHOLDS
+        
+        Returns
+        -------
+        list
+            Rows with the columns of evaluation.HEADER, in the same order as
+            Evaluation.glidning() + Evaluation.velting() of all sections
+        """
+        distinct = {}
+        for p in sections:
+            distinct.setdefault(self.key(p), p)
+        ev = evaluation.Evaluation(dam.Dam(list(distinct.values())), levels,
+                                   thresholds)
+        rows = {}
+        for row in ev.glidning() + ev.velting():
+            rows[(row[0], row[1], row[2])] = row
+        
+        result = []
+        for mode in ('Glidning', 'Velting'):
+            for case in ev.cases:
+                for p in sections:
+                    rep = distinct[self.key(p)]
+                    row = list(rows[(mode, case.name, rep.name)])
+                    row[2] = p.name
+                    result.append(row)
+        return result
@@ -0,0 +1,441 @@
+import evaluation, loadcase, response, jobs, dam
+
+import sys
+import json
+import time
+import threading
+import numpy as np
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+class Models:
+    """
+    Prepared dam models kept in memory by the service: the dams of setup
+    modules or snapshots (see jobs.setup_dam) and the level response of
+    every pillar (see response.LevelResponse), built once when they are
+    first needed (or in advance, see warm()) and shared by all requests.
+    Only the allowed setups are loaded, a request cannot import other
+    modules or open other files.
+    """
+    
+    def __init__(self, allowed = ()):
+        self.allowed = set(allowed)
+        self.responses = {}
+        self.lock = threading.Lock()
+        self.building = {}
+    
+    def pillars(self, setup):
+        #pillars of an allowed setup by name
+        if setup not in self.allowed:
+            raise KeyError(f'Unknown setup: {setup}')
+        return jobs.setup_dam(setup)
+    
+    def pillar(self, setup, name):
+        pillars = self.pillars(setup)
+        if name not in pillars:
+            raise KeyError(f'Unknown pillar: {name}')
+        return pillars[name]
+    
+    def response(self, setup, name):
+        """
+        Returns
+        -------
+        instance of LevelResponse
+            Level response of a pillar; concurrent requests for the same
+            pillar wait for one build, and get its exception if it fails
+        """
+        key = (setup, name)
+        with self.lock:
+            if key in self.responses:
+                return self.responses[key]
+            owner = key not in self.building
+            if owner:
+                #event and exception of the build
+                self.building[key] = [threading.Event(), None]
+            build = self.building[key]
+        if not owner:
+            build[0].wait()
+            if build[1] is not None:
+                raise build[1]
+            return self.responses[key]
+        try:
+            resp = response.LevelResponse(self.pillar(setup, name))
+            with self.lock:
+                self.responses[key] = resp
+        except Exception as e:
+            build[1] = e
+            raise
+        finally:
+            with self.lock:
+                self.building.pop(key)[0].set()
+        return resp
+    
+    def warm(self, setup, executor = None, names = None):
+        """
+        Build the level responses of pillars of a setup (default: all
+        pillars) in advance, in parallel if an executor is given
+        
+        Returns
+        -------
+        int
+            Number of pillars
+        """
+        if names is None:
+            names = list(self.pillars(setup))
+        if executor is None:
+            for name in names:
+                self.response(setup, name)
+        else:
+            list(executor.map(lambda n: self.response(setup, n), names))
+        return len(names)
+
+class Batcher:
+    """
+    Collects the level queries (sweeps, critical level searches) of
+    concurrent requests for a short time and answers all queries of a
+    pillar with one vectorized evaluation of its level response. The level
+    responses are built before a query is queued (see submit), so the
+    batching thread only evaluates and a pillar that is not built yet does
+    not delay the queries of other pillars
+    """
+    
+    def __init__(self, models, window = 0.005, max_batch = 256):
+        """
+        Parameters
+        ----------
+        models : instance of Models
+        window : positive float, optional
+            Time to wait for further queries after the first one of a
+            batch; the default is 0.005,
+            unit: s
+        max_batch : positive int, optional
+            Largest number of queries of a batch; the default is 256
+        
+        Returns
+        -------
+        None.
+        
+        """
+        self.models = models
+        self.window = window
+        self.max_batch = max_batch
+        self.cond = threading.Condition()
+        self.pending = []
+        self.batches = 0
+        threading.Thread(target = self.loop, daemon = True).start()
+    
+    def submit(self, setup, name, levels, ice = 0, uplift = 1, phi = None):
+        """
+        Queue a query of the stability coefficients of a pillar; the level
+        response of the pillar is built first if necessary (in the calling
+        thread, see Models.response)
+        
+        Returns
+        -------
+        concurrent.futures.Future
+            Result: tuple of arrays (glidning, velting_moment,
+            velting_resultant), see LevelResponse.coefficients
+        """
+        levels = np.atleast_1d(np.asarray(levels, dtype = float))
+        resp = self.models.response(setup, name)
+        if phi is None:
+            phi = resp.phi
+        args = np.broadcast_arrays(levels, *[
+            np.asarray(i, dtype = float) for i in (ice, uplift, phi)
+            ])
+        future = Future()
+        with self.cond:
+            self.pending.append((resp, args, future))
+            self.cond.notify()
+        return future
+    
+    def loop(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+            time.sleep(self.window)
+            with self.cond:
+                batch = self.pending[:self.max_batch]
+                self.pending = self.pending[self.max_batch:]
+            self.batches += 1
+            self.run(batch)
+    
+    def run(self, batch):
+        #one evaluation per pillar for all queries of the batch (grouped by
+        #level response)
+        groups = {}
+        for resp, args, future in batch:
+            groups.setdefault(id(resp), (resp, []))[1].append((args, future))
+        for resp, queries in groups.values():
+            futures = [f for _, f in queries]
+            try:
+                sizes = [len(args[0]) for args, _ in queries]
+                levels, ice, uplift, phi = [
+                    np.concatenate([args[i] for args, _ in queries])
+                    for i in range(4)
+                    ]
+                out = resp.coefficients(levels, ice, uplift, phi)
+            except Exception as e:
+                for f in futures:
+                    f.set_exception(e)
+                continue
+            bounds = np.cumsum([0] + sizes)
+            for f, a, b in zip(futures, bounds[:-1], bounds[1:]):
+                f.set_result(tuple(arr[a:b] for arr in out))
+
+class Service:
+    """
+    Analysis service: answers evaluation, level sweep and critical level
+    requests with the prepared models (see Models). Sweeps and critical
+    level searches are batched (see Batcher), evaluations (load classes)
+    run in a bounded pool of worker threads.
+    """
+    
+    def __init__(self, setups = (), workers = 4, max_requests = 32,
+                 window = 0.005, allowed = ()):
+        """
+        Parameters
+        ----------
+        setups : list, optional
+            Setups (see jobs.setup_dam) whose models are built at start-up
+        workers : positive int, optional
+            Number of worker threads of evaluations; the default is 4
+        max_requests : positive int, optional
+            Largest number of requests handled at the same time, further
+            requests are rejected (HTTP 503); the default is 32
+        window : positive float, optional
+            Batching window, see Batcher; the default is 0.005,
+            unit: s
+        allowed : list, optional
+            Further setups that may be requested, loaded at their first
+            request; requests of other setups are rejected (HTTP 400)
+        
+        Returns
+        -------
+        None.
+        
+        """
+        self.models = Models(list(setups) + list(allowed))
+        self.executor = ThreadPoolExecutor(workers)
+        self.batcher = Batcher(self.models, window)
+        self.slots = threading.BoundedSemaphore(max_requests)
+        for setup in setups:
+            self.models.warm(setup, self.executor)
+        self.endpoints = {'evaluate': self.evaluate,
+                          'sweep': self.sweep,
+                          'critical': self.critical,
+                          'pillars': self.pillars}
+    
+    def pillars(self, request):
+        """
+        Request: 'setup'
+        
+        Returns
+        -------
+        dict
+            Pillar names, dam types and friction angles
+        """
+        pillars = self.models.pillars(request['setup'])
+        return {'pillars': [{'name': p.name, 'dam_type': p.dam_type,
+                             'phi': p.phi} for p in pillars.values()]}
+    
+    def evaluate(self, request):
+        """
+        Evaluation of pillars in load cases with the load classes (see
+        Evaluation.evaluate_pillar); request: 'setup', 'levels' (water
+        levels or load cases as [name, level, ice, uplift,
+        threshold_class]), 'pillars' (names, optional; the default is all
+        pillars)
+        
+        Returns
+        -------
+        dict
+            'rows': evaluation overview (columns: evaluation.HEADER),
+            'records': result records
+        """
+        pillars = self.models.pillars(request['setup'])
+        names = request.get('pillars') or list(pillars)
+        levels = request['levels']
+        if all(isinstance(i, list) for i in levels):
+            levels = [loadcase.LoadCase(*c) for c in levels]
+        cases = loadcase.as_cases(levels)
+        
+        def evaluate_pillar(name):
+            p = pillars[name]
+            ev = evaluation.Evaluation(dam.Dam([p]), cases)
+            return ev.evaluate_pillar(p)
+        
+        for name in names:
+            if name not in pillars:
+                raise KeyError(f'Unknown pillar: {name}')
+        records = list(self.executor.map(evaluate_pillar, names))
+        return {'header': evaluation.HEADER,
+                'rows': evaluation.merge_records(records),
+                'records': records}
+    
+    def sweep(self, request):
+        """
+        Stability coefficients of pillars at a list of water levels (level
+        response); request: 'setup', 'levels', 'pillars' (optional), 'ice',
+        'uplift', 'phi' (optional, numbers or lists as long as levels)
+        
+        Returns
+        -------
+        dict
+            Coefficients per pillar
+        """
+        setup = request['setup']
+        names = request.get('pillars') or list(self.models.pillars(setup))
+        self.models.warm(setup, self.executor, names)
+        futures = [self.batcher.submit(
+            setup, name, request['levels'], request.get('ice', 0),
+            request.get('uplift', 1), request.get('phi')
+            ) for name in names]
+        result = {}
+        for name, future in zip(names, futures):
+            gl, vm, vr = future.result()
+            result[name] = {'glidning': gl, 'velting_moment': vm,
+                            'velting_resultant': vr}
+        return {'levels': request['levels'], 'pillars': result}
+    
+    def critical(self, request):
+        """
+        Critical water level of pillars: lowest water level at which a
+        threshold (see Evaluation.threshold) is no longer met, searched on a
+        grid of water levels between 'lower' and 'upper' (default: upstream
+        contact of the pillar and upper end of the domain of the level
+        response) with the resolution 'step' (default 0.01 m);
+        request: 'setup', 'pillars' (optional), 'ice', 'uplift', 'phi',
+        'threshold_class' (default 'normal'), 'lower', 'upper', 'step'
+        
+        Returns
+        -------
+        dict
+            Per pillar and failure mode (Glidning, Velting): critical water
+            level (None if the threshold is met in the whole range)
+        """
+        setup = request['setup']
+        names = request.get('pillars') or list(self.models.pillars(setup))
+        step = request.get('step', 0.01)
+        case = loadcase.LoadCase(
+            'Kritisk', None, request.get('ice', 0), request.get('uplift', 1),
+            request.get('threshold_class', 'normal')
+            )
+        ev = evaluation.Evaluation(dam.Dam([]), [case])
+        self.models.warm(setup, self.executor, names)
+        
+        grids, futures = [], []
+        for name in names:
+            resp = self.models.response(setup, name)
+            lower = request.get('lower', resp.pillar.left_contact().y)
+            upper = request.get('upper', resp.upper)
+            levels = np.arange(lower, upper + step / 2, step)
+            grids.append(levels)
+            futures.append(self.batcher.submit(
+                setup, name, levels, case.ice, case.uplift,
+                request.get('phi')
+                ))
+        
+        result = {}
+        for name, levels, future in zip(names, grids, futures):
+            p = self.models.pillar(setup, name)
+            gl, vm, vr = future.result()
+            margins = {'Glidning': ev.glidning_margin(case, p, gl),
+                       'Velting': ev.velting_margin(case, p, vm, vr)}
+            result[name] = {}
+            for mode, margin in margins.items():
+                failing = np.flatnonzero(np.asarray(margin) < 0)
+                result[name][mode] = (round(float(levels[failing[0]]), 6)
+                                      if len(failing) else None)
+        return {'pillars': result}
+    
+    def handle(self, endpoint, request):
+        """
+        Answer a request; requests beyond max_requests are rejected
+        
+        Returns
+        -------
+        tuple
+            HTTP status and response (json serializable): errors of the
+            request are answered with 400, other errors (e.g. geometry that
+            cannot be evaluated) with 500
+        """
+        if endpoint not in self.endpoints:
+            return 404, {'error': f'Unknown endpoint: {endpoint}'}
+        if not self.slots.acquire(blocking = False):
+            return 503, {'error': 'Too many requests'}
+        try:
+            start = time.perf_counter()
+            result = self.endpoints[endpoint](request)
+            result['time'] = round(time.perf_counter() - start, 4)
+            return 200, result
+        except KeyError as e:
+            return 400, {'error': str(e.args[0])}
+        except (TypeError, ValueError) as e:
+            return 400, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': f'{type(e).__name__}: {e}'}
+        finally:
+            self.slots.release()
+    
+    def server(self, host = '127.0.0.1', port = 8765):
+        """
+        Returns
+        -------
+        http.server.ThreadingHTTPServer
+            HTTP server of the service (localhost by default), e.g.
+            POST /sweep with a json body, or GET /pillars?setup=dam_setup;
+            start with serve_forever()
+        """
+        service = self
+        
+        class Handler(BaseHTTPRequestHandler):
+        
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                self.reply(*service.handle(url.path.strip('/'), query))
+            
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    request = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    self.reply(400, {'error': 'Invalid json'})
+                    return
+                path = urlparse(self.path).path.strip('/')
+                self.reply(*service.handle(path, request))
+            
+            def reply(self, status, result):
+                body = json.dumps(result, default = to_json).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, *args):
+                pass
+        
+        class Server(ThreadingHTTPServer):
+            #queued connections of concurrent dashboard requests
+            request_queue_size = 128
+            daemon_threads = True
+        
+        return Server((host, port), Handler)
+
+def to_json(value):
+    #numpy values of results
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return float(value)
+
+if __name__ == '__main__':
+    #service: python service.py <setup> [port]
+    setup = sys.argv[1] if len(sys.argv) > 1 else 'dam_setup'
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8765
+    server = Service([setup]).server(port = port)
+    print(f'Serving {setup} on http://127.0.0.1:{port}')
+    server.serve_forever()
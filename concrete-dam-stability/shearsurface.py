@@ -0,0 +1,241 @@
+import stability, evaluation, loadcase, dam
+
+import copy
+import math
+import numpy as np
+from shapely.geometry import LineString
+
+#cached geometry of a pillar that does not depend on the contact points
+#(see pillar.cached), shared by the candidate planes
+INDEPENDENT = ['get_union', 'highest_point', 'lowest_point',
+               'righternmost_x', 'lefternmost_x']
+
+class ShearSurfaceSearch:
+    """
+    Search for the critical shear surface of a pillar. Candidate planes are
+    defined by the elevations of their upstream and downstream end (as the
+    contact points of a pillar, see Pillar.left_contact/ right_contact);
+    every combination of elevations on a grid above (and optionally below)
+    the contact points is a candidate, e.g. lift joints in the concrete or
+    weaker planes along the foundation. Planes with the upstream end above
+    the water level are skipped.
+    Candidates are evaluated with segments_above and the load classes on a
+    copy of the pillar. A cheap lower bound of the sliding coefficient
+    (all loads except the uplift, which is bounded) is calculated first,
+    the uplift strips are only calculated for candidates that are
+    evaluated in the order of increasing bound until the bound of the next
+    candidate exceeds the smallest coefficient found.
+    Note: below the contact points, the profile is counted as concrete.
+    """
+    
+    def __init__(self, pillar, level, ice = 0, uplift = 1, above = 3,
+                 below = 0, step = 0.25, max_angle = 45, g_water = 9.81):
+        """
+        Parameters
+        ----------
+        pillar : instance of Pillar
+        level : float
+            Water level,
+            unit: masl
+        ice : float, optional
+            Ice load; the default is 0,
+            unit: kN/m
+        uplift : float, optional
+            Uplift factor; the default is 1
+        above, below : positive float, optional
+            Range of the elevations of the candidate planes above and below
+            the contact points; the defaults are 3 and 0,
+            unit: m
+        step : positive float, optional
+            Spacing of the elevations; the default is 0.25,
+            unit: m
+        max_angle : positive float, optional
+            Candidates steeper than max_angle are skipped; the default is
+            45,
+            unit: degrees
+        g_water : positive float, optional
+            Specific weight of water; the default is 9.81,
+            unit: kN/m3
+        
+        Returns
+        -------
+        None.
+        
+        """
+        self.pillar = pillar
+        self.level = level
+        self.ice = ice
+        self.uplift = uplift
+        self.offsets = np.arange(-below, above + step / 2, step)
+        self.max_angle = max_angle
+        self.g_water = g_water
+        
+        #contact-independent geometry, shared by the candidates
+        for name in INDEPENDENT:
+            getattr(pillar, name)()
+    
+    def plane(self, contact_l, contact_r):
+        """
+        Returns
+        -------
+        instance of Pillar
+            Copy of the pillar with the contact elevations of a candidate
+            plane; the contact-independent geometry is shared
+        """
+        pc = copy.copy(self.pillar)
+        pc.contact_l = round(float(contact_l), 3)
+        pc.contact_r = round(float(contact_r), 3)
+        pc._cache = {k: v for k, v in self.pillar._cache.items()
+                     if k[0] in INDEPENDENT}
+        return pc
+    
+    def has_contact(self, elevation):
+        #a plane end has a contact point if its elevation lies within the
+        #profile (see Pillar.left_contact)
+        return (self.pillar.lowest_point().y < elevation
+                < self.pillar.highest_point().y)
+    
+    def lower_bound(self, pc):
+        """
+        Lower bound of the sliding coefficient of a candidate plane: all
+        loads are calculated with the load classes except the uplift, which
+        requires the strips of the shear surface and is replaced by an
+        upper bound
+        
+        Returns
+        -------
+        float
+        """
+        left, right = pc.left_contact(), pc.right_contact()
+        angle = pc.bottom_angle()
+        if not 0 < self.pillar.phi + angle < 90:
+            return 0
+        stab = stability.Stability(
+            dam.Dam([pc]), self.level, self.ice, self.uplift
+            )
+        ice, vt, vv, ov, _, ev = stab.basic()
+        ice, vt, vv, ov, ev = [i.calc_load()[0] for i in (ice, vt, vv, ov, ev)]
+        #uplift (see Opptrykk): triangles of height |h| on strips of width
+        #0.05 m; the strips lie on the rectangles of the shear surface
+        #(see Pillar.cutting_surface), each rectangle is covered by at most
+        #width / 0.05 + 1 strips
+        h = self.level - left.y
+        line = LineString([left, right])
+        length = sum(s.poly.intersection(line).length * (s.width + 0.05)
+                     for s in pc.segments)
+        op = 0.5 * abs(h) * self.g_water * self.uplift * length
+        fh = abs(ice + vt)
+        fv = vv + ov + ev - op
+        if fv <= 0:
+            return 0
+        if fh == 0:
+            return math.inf
+        return fv * math.tan(math.radians(self.pillar.phi + angle)) / fh
+    
+    def candidates(self):
+        """
+        Returns
+        -------
+        list
+            Valid candidate planes as tuples (lower bound, contact_l,
+            contact_r, pillar copy), sorted by lower bound
+        """
+        p = self.pillar
+        cands = []
+        for dl in self.offsets:
+            for dr in self.offsets:
+                pc = self.plane(p.contact_l + dl, p.contact_r + dr)
+                if pc.contact_l >= self.level:
+                    continue
+                if not (self.has_contact(pc.contact_l)
+                        and self.has_contact(pc.contact_r)):
+                    continue
+                if abs(pc.bottom_angle()) > self.max_angle:
+                    continue
+                bound = self.lower_bound(pc)
+                cands.append((bound, pc.contact_l, pc.contact_r, pc))
+        cands.sort(key = lambda i: i[0])
+        return cands
+    
+    def glidning(self, pc):
+        #sliding coefficient of a candidate plane (load classes)
+        stab = stability.Stability(
+            dam.Dam([pc]), self.level, self.ice, self.uplift
+            )
+        return stab.glidning()[0]
+    
+    def search(self):
+        """
+        Returns
+        -------
+        dict
+            Governing plane:
+            - 'pillar': pillar name
+            - 'contact_l', 'contact_r': elevations of the plane ends
+            - 'angle': plane angle
+            - 'glidning': sliding coefficient
+            - 'candidates': number of valid candidates
+            - 'evaluated': number of candidates evaluated with the load
+              classes (the others were pruned by their bound)
+            - 'plane': copy of the pillar with the governing plane
+        
+        Raises
+        ------
+        ValueError
+            If there is no valid candidate plane (e.g. the water level is
+            below the contact points)
+        """
+        cands = self.candidates()
+        best, best_pc = math.inf, None
+        evaluated = 0
+        for bound, cl, cr, pc in cands:
+            if bound >= best:
+                break
+            gl = self.glidning(pc)
+            evaluated += 1
+            if best_pc is None or gl < best:
+                best, best_pc = gl, pc
+        if best_pc is None:
+            raise ValueError(f'No valid shear surface of {self.pillar.name} '
+                             f'at water level {self.level}')
+        
+        return {'pillar': self.pillar.name,
+                'contact_l': best_pc.contact_l,
+                'contact_r': best_pc.contact_r,
+                'angle': round(best_pc.bottom_angle(), 2),
+                'glidning': best,
+                'candidates': len(cands),
+                'evaluated': evaluated,
+                'plane': best_pc}
+
+def search_dam(dam, levels, thresholds = None, **kwargs):
+    """
+    Search the critical shear surface of every pillar in every load case
+    
+    Parameters
+    ----------
+    dam : instance of Dam
+    levels : list
+        Load cases or water levels, see Evaluation
+    thresholds : dict, optional
+        Threshold values, see evaluation.THRESHOLDS
+    **kwargs
+        Keyword arguments of ShearSurfaceSearch
+    
+    Returns
+    -------
+    list
+        Result rows as Evaluation.glidning() with the elevations of the
+        governing plane (upstream, downstream) appended
+    """
+    cases = loadcase.as_cases(levels)
+    ev = evaluation.Evaluation(dam, cases, thresholds)
+    rows = []
+    for case in cases:
+        for p in dam.pillars:
+            s = ShearSurfaceSearch(
+                p, case.level, case.ice, case.uplift, **kwargs
+                ).search()
+            row = ev.glidning_row(case, s['plane'], s['glidning'])
+            rows.append(row + [s['contact_l'], s['contact_r']])
+    return rows
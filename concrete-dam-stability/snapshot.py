@@ -0,0 +1,244 @@
+import manifest
+from dam import Dam
+from pillar import Pillar
+from segment import Segment
+
+import json
+import numpy as np
+from shapely import wkb
+from shapely.geometry.base import BaseGeometry
+
+#version of the snapshot format; snapshots of other versions are rejected
+VERSION = 1
+
+#first bytes of a snapshot file
+MAGIC = b'DAMSNAP\n'
+
+#file suffix of snapshots (see jobs.setup_dam)
+SUFFIX = '.damsnap'
+
+#strip width of the uplift, see Opptrykk.draw()
+INCREMENT = 0.05
+
+#cached geometry of a pillar (see pillar.cached) that is prepared and
+#stored, as (method name, arguments)
+PREPARED = [('get_union', ), ('highest_point', ), ('lowest_point', ),
+            ('left_contact', ), ('right_contact', ), ('righternmost_x', ),
+            ('lefternmost_x', ), ('cutting_surface', ),
+            ('cutting_strips', INCREMENT), ('max_depth', ), ('axis', ),
+            ('segments_above', ), ('bottom_angle', )]
+
+def prepare(dam):
+    #calculate the cached geometry of all pillars
+    for p in dam.pillars:
+        for name, *args in PREPARED:
+            getattr(p, name)(*args)
+    return dam
+
+def source_digest(dam):
+    """
+    Returns
+    -------
+    string
+        Content hash of the inputs of a dam (see manifest.pillar_fingerprint),
+        to check whether a snapshot is up to date
+    """
+    return manifest.digest([manifest.pillar_fingerprint(p)
+                            for p in dam.pillars])
+
+class Blocks:
+    """
+    Data blocks of a snapshot: one block of float64 values (arrays, e.g.
+    uplift strips and loads) and one block of binary geometries (WKB)
+    """
+    
+    def __init__(self, floats = None, blobs = None):
+        self.floats = floats
+        self.blobs = blobs
+        self._floats = []
+        self._blobs = []
+        self._size = 0
+        self._offset = 0
+    
+    def add_geometry(self, geom):
+        data = wkb.dumps(geom)
+        self._blobs.append(data)
+        self._offset += len(data)
+        return [self._offset - len(data), len(data)]
+    
+    def add_array(self, values):
+        arr = np.asarray(values, dtype = '<f8')
+        self._floats.append(arr.ravel())
+        self._size += arr.size
+        return [self._size - arr.size, list(arr.shape)]
+    
+    def geometry(self, ref):
+        offset, length = ref
+        return wkb.loads(bytes(self.blobs[offset:offset + length]))
+    
+    def array(self, ref):
+        offset, shape = ref
+        size = int(np.prod(shape))
+        return self.floats[offset:offset + size].reshape(shape)
+    
+    def float_data(self):
+        return np.concatenate([np.zeros(0, dtype = '<f8')] + self._floats)
+    
+    def blob_data(self):
+        return b''.join(self._blobs)
+
+def encode(blocks, value):
+    #header entry of a cached value; geometries and segments are stored as
+    #WKB, lists of numbers (e.g. the uplift strips) as arrays
+    if isinstance(value, BaseGeometry):
+        return {'geometry': blocks.add_geometry(value)}
+    if isinstance(value, list) and all(isinstance(i, Segment) for i in value):
+        if value:
+            return {'segments': [encode_segment(blocks, i) for i in value]}
+    if isinstance(value, list):
+        rows = np.asarray(value, dtype = float).reshape(len(value), -1) \
+            if value else np.zeros((0, 0))
+        return {'array': blocks.add_array(rows)}
+    return {'value': value}
+
+def decode(blocks, entry):
+    if 'geometry' in entry:
+        return blocks.geometry(entry['geometry'])
+    if 'segments' in entry:
+        return [decode_segment(blocks, i) for i in entry['segments']]
+    if 'array' in entry:
+        return [tuple(float(i) for i in row)
+                for row in blocks.array(entry['array'])]
+    return entry['value']
+
+def encode_segment(blocks, seg):
+    return {'name': seg.name,
+            'width': seg.width,
+            'spec_weight': seg.spec_weight,
+            'axis': seg.axis,
+            'poly': blocks.add_geometry(seg.poly)}
+
+def decode_segment(blocks, entry):
+    return Segment(blocks.geometry(entry['poly']), entry['width'],
+                   entry['spec_weight'], entry['axis'], entry['name'])
+
+def write(dam, file_name):
+    """
+    Write a prepared dam to a snapshot file: the pillars and their cached
+    geometry (see PREPARED).
+    Format: MAGIC, length of the header (8 bytes), json header (padded to
+    8 bytes), float64 block (little endian, can be memory-mapped), block of
+    geometries (WKB)
+    
+    Parameters
+    ----------
+    dam : instance of Dam
+        The geometry is prepared if it is not cached yet
+    file_name : string
+        Path of the snapshot, e.g. 'dam.damsnap'
+    
+    Returns
+    -------
+    string
+        Path of the snapshot
+    """
+    prepare(dam)
+    blocks = Blocks()
+    pillars = []
+    for p in dam.pillars:
+        cache = [[list(key), encode(blocks, p._cache[key])]
+                 for key in PREPARED]
+        pillars.append({'name': p.name,
+                        'contact_l': p.contact_l,
+                        'contact_r': p.contact_r,
+                        'crest_width': p.crest_width,
+                        'phi': p.phi,
+                        'dam_type': p.dam_type,
+                        'segments': [encode_segment(blocks, s)
+                                     for s in p.segments],
+                        'cache': cache})
+    
+    floats = blocks.float_data()
+    header = {'version': VERSION,
+              'source': source_digest(dam),
+              'pillars': pillars,
+              'floats': int(floats.size)}
+    data = json.dumps(header, separators = (',', ':')).encode('utf-8')
+    data += b' ' * (-len(data) % 8)
+    
+    with open(file_name, 'wb') as f:
+        f.write(MAGIC)
+        f.write(len(data).to_bytes(8, 'little'))
+        f.write(data)
+        f.write(floats.tobytes())
+        f.write(blocks.blob_data())
+    return file_name
+
+class Snapshot:
+    """
+    Prepared dam read from a snapshot file (see write):
+    - dam: instance of Dam with the cached geometry of its pillars, no
+      geometry has to be calculated again
+    - source: content hash of the inputs (see source_digest)
+    """
+    
+    def __init__(self, file_name, mmap = True):
+        """
+        Parameters
+        ----------
+        file_name : string
+            Path of the snapshot
+        mmap : bool, optional
+            Memory-map the float block instead of reading it, e.g. when
+            several worker processes use the same snapshot; the default is
+            True
+        
+        Returns
+        -------
+        None.
+        
+        """
+        with open(file_name, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'{file_name} is not a snapshot')
+            length = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(length))
+            if header['version'] != VERSION:
+                raise ValueError(f"Snapshot version {header['version']} "
+                                 f'is not supported (version {VERSION})')
+            start = len(MAGIC) + 8 + length
+            size = header['floats']
+            if mmap and size:
+                floats = np.memmap(file_name, dtype = '<f8', mode = 'r',
+                                   offset = start, shape = (size, ))
+            else:
+                floats = np.fromfile(f, dtype = '<f8', count = size)
+            f.seek(start + 8 * size)
+            blobs = f.read()
+        
+        blocks = Blocks(floats, blobs)
+        pillars = []
+        for entry in header['pillars']:
+            p = Pillar([decode_segment(blocks, s) for s in entry['segments']],
+                       entry['contact_l'], entry['contact_r'],
+                       entry['crest_width'], entry['phi'], entry['dam_type'],
+                       entry['name'])
+            for key, value in entry['cache']:
+                p._cache[tuple(key)] = decode(blocks, value)
+            pillars.append(p)
+        
+        self.file_name = file_name
+        self.source = header['source']
+        self.dam = Dam(pillars)
+    
+    def is_current(self, dam):
+        #True if the snapshot was written from the same inputs as dam
+        return self.source == source_digest(dam)
+
+def read(file_name, mmap = True):
+    """
+    Returns
+    -------
+    instance of Snapshot
+    """
+    return Snapshot(file_name, mmap)
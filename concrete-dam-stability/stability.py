@@ -8,10 +8,15 @@ class Stability:
     evaluated at a following stage (see Evaluation);
     the examined failure modes are sliding and overturning
     """
-    def __init__(self, dam, level, ice = 100):
+    def __init__(self, dam, level, ice = 100, uplift = 1, increment = None):
         self.dam = dam
         self.level = level
         self.ice = ice
+        self.uplift = uplift
+        self.increment = increment
+        self._loads = None
+        self._centroids = None
+        self._base = None
         
     def basic(self):
         #return list of load instances
@@ -19,7 +24,8 @@ class Stability:
         vt = load.Vanntrykk(self.dam, self.level)
         vv = load.Vannvekt(self.dam, self.level)
         ov = load.Overtopping(self.dam, self.level)    
-        op = load.Opptrykk(self.dam, self.level)
+        op = load.Opptrykk(self.dam, self.level, uplift = self.uplift,
+                           increment = self.increment)
         ev = load.Egenvekt(self.dam)
         return [ice, vt, vv, ov, op, ev]
         
@@ -46,8 +52,33 @@ class Stability:
             rearranged.append([ice_i, vt_i, vv_i, ov_i] + op_i + ev_i)
         return rearranged
     
+    def scaled(self, ice, uplift = 1):
+        #returns the stability at the same water level with another ice load
+        #and uplift factor; the ice load and the uplift are proportional to
+        #ice and uplift, so the loads of this instance are scaled instead
+        #of recalculated (requires ice and uplift of this instance != 0)
+        stab = Stability(self.dam, self.level, ice, uplift)
+        stab._base = self
+        return stab
+    
     def loads(self):
-        return [i.calc_load() for i in self.basic()]
+        #loads are cached, every failure mode is derived from the same loads
+        if self._loads is None and self._base is not None:
+            ice, vt, vv, ov, op, ev = self._base.loads()
+            f_ice = self.ice / self._base.ice
+            f_op = self.uplift / self._base.uplift
+            self._loads = [[l * f_ice for l in ice], vt, vv, ov,
+                           [l * f_op for l in op], ev]
+        elif self._loads is None:
+            self._loads = [i.calc_load() for i in self.basic()]
+        return self._loads
+    
+    def centroids(self):
+        if self._centroids is None and self._base is not None:
+            self._centroids = self._base.centroids()
+        elif self._centroids is None:
+            self._centroids = [i.calc_centroid() for i in self.basic()]
+        return self._centroids
     
     def horizontal_loads(self):
         ice_load, vt_load, vv_load, ov_load, op_load, ev_load = self.loads()     
@@ -64,7 +95,7 @@ class Stability:
         
         ice_load, vt_load, vv_load, ov_load, op_load, ev_load = self.loads()
         
-        ice_c, vt_c, vv_c, ov_c, op_c, ev_c = [i.calc_centroid() for i in self.basic()]
+        ice_c, vt_c, vv_c, ov_c, op_c, ev_c = self.centroids()
         
         m_lists = []
         for idx, pt in enumerate(pt_list):
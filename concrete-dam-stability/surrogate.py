@@ -0,0 +1,350 @@
+import response
+
+import itertools
+import numpy as np
+import pandas as pd
+from numpy.polynomial import chebyshev
+
+#parameters of the surrogates, see exact()
+PARAMETERS = ('level', 'ice', 'uplift', 'phi')
+
+#stability coefficients, see response.coefficients
+OUTPUTS = ('glidning', 'velting_moment', 'velting_resultant')
+
+def exact(pillar, level, ice = 0, uplift = 1, phi = None, weight = None):
+    """
+    Stability coefficients of a pillar calculated with the load classes
+    (same results as Stability); the level-dependent loads are calculated
+    once per distinct water level, ice load and uplift scale them
+    
+    Parameters
+    ----------
+    pillar : instance of Pillar
+    level, ice, uplift, phi : float or array_like
+        Water level (masl), ice load (kN/m), uplift factor, friction angle
+        (degrees; the default is the friction angle of the pillar)
+    weight : numpy.ndarray, optional
+        Self weight, see response.self_weight
+    
+    Returns
+    -------
+    dict
+        Arrays of the coefficients, keys: OUTPUTS
+    """
+    if phi is None:
+        phi = pillar.phi
+    if weight is None:
+        weight = response.self_weight(pillar)
+    level, ice, uplift, phi = np.broadcast_arrays(
+        *[np.asarray(i, dtype = float) for i in (level, ice, uplift, phi)]
+        )
+    shape = level.shape
+    levels, inverse = np.unique(level.ravel(), return_inverse = True)
+    samples = np.array([response.sample(pillar, l) for l in levels])
+    
+    loads = np.empty((level.size, 6, 3))
+    loads[:, :5] = samples[inverse]
+    loads[:, 5] = weight
+    loads[:, 0] *= ice.ravel()[:, None]
+    loads[:, 4] *= uplift.ravel()[:, None]
+    
+    right = pillar.right_contact()
+    out = response.coefficients(
+        loads, (right.x, right.y), pillar.bottom_angle(), phi.ravel()
+        )
+    return {k: v.reshape(shape) for k, v in zip(OUTPUTS, out)}
+
+class Surrogate:
+    """
+    Surrogate model of the stability coefficients of a pillar over a box of
+    parameters (water level, ice load, uplift factor, friction angle) for
+    instant what-if queries. The coefficients are smooth between the
+    geometric breakpoints of the water level (vertex elevations of the
+    profile, see response.LevelResponse), so the box is split at them into
+    pieces; per piece, the surrogate is fitted to samples of the exact
+    calculation (see exact()) - a Chebyshev grid of water levels, each
+    combined with a grid of the other parameters, which only scale the
+    loads - as polynomial (total degree) or radial basis functions (thin
+    plate splines) by least squares. The surrogate is validated at random
+    points of the box; the largest validation error is reported as error
+    bound. Queries outside the box, and outputs whose error bound exceeds
+    the tolerance, are calculated exactly.
+    """
+    
+    def __init__(self, pillar, domain, method = 'poly', degree = 5,
+                 levels = 9, nodes = 7, centers = 200, validation = 500,
+                 tol = None, seed = 0):
+        """
+        Parameters
+        ----------
+        pillar : instance of Pillar
+        domain : dict
+            Ranges (lower, upper) of the parameters (keys: PARAMETERS), e.g.
+            {'level': (274, 277), 'phi': (40, 50)}; parameters without
+            range are fixed: ice 0, uplift 1, phi of the pillar, or a single
+            value, e.g. {'ice': 100}
+        method : string, optional
+            'poly' (polynomial) or 'rbf' (radial basis functions); the
+            default is 'poly'
+        degree : positive int, optional
+            Total degree of the polynomial (the tail of the radial basis
+            functions is linear); the default is 5
+        levels, nodes : positive int, optional
+            Number of water levels per piece and of values of the other
+            parameters of the training grid; the defaults are 9 and 7
+        centers : positive int, optional
+            Number of centers of the radial basis functions per piece; the
+            default is 200
+        validation : positive int, optional
+            Number of validation points; the default is 500
+        tol : dict, optional
+            Largest permitted error per output (keys: OUTPUTS); outputs
+            with a larger error bound are calculated exactly; the default
+            is to use all surrogates
+        seed : int, optional
+            Seed of the random validation points and centers
+        
+        Returns
+        -------
+        None.
+        
+        """
+        if method not in ('poly', 'rbf'):
+            raise ValueError(f'Unknown method: {method}')
+        self.pillar = pillar
+        self.name = pillar.name
+        self.method = method
+        self.degree = degree
+        self.weight = response.self_weight(pillar)
+        self.fixed = {'ice': 0, 'uplift': 1, 'phi': pillar.phi}
+        self.ranges = {}
+        for key, value in domain.items():
+            if key not in PARAMETERS:
+                raise ValueError(f'Unknown parameter: {key}')
+            if np.ndim(value) == 0:
+                self.fixed[key] = value
+            else:
+                self.ranges[key] = (float(value[0]), float(value[1]))
+        if 'level' not in self.ranges:
+            raise ValueError('A range of water levels is required')
+        self.dims = [k for k in PARAMETERS if k in self.ranges]
+        rng = np.random.default_rng(seed)
+        
+        #pieces between the breakpoints of the water level
+        lower, upper = self.ranges['level']
+        left, right = pillar.left_contact(), pillar.right_contact()
+        ys = {left.y, right.y, pillar.highest_point().y,
+              pillar.lowest_point().y + 0.25}
+        for seg in pillar.segments:
+            ys.update(seg.poly.exterior.coords.xy[1])
+        self.breaks = np.array([lower] + sorted(
+            y for y in ys if lower < y < upper
+            ) + [upper])
+        
+        #training grid: Chebyshev-Lobatto points, one exact load
+        #calculation per water level
+        self.pieces = []
+        for a, b in zip(self.breaks[:-1], self.breaks[1:]):
+            grids = []
+            for key in self.dims:
+                n = levels if key == 'level' else nodes
+                t = -np.cos(np.pi * np.arange(n) / (n - 1))
+                lo, hi = (a, b) if key == 'level' else self.ranges[key]
+                grids.append(lo + (t + 1) / 2 * (hi - lo))
+            mesh = np.meshgrid(*grids, indexing = 'ij')
+            train = {k: m.ravel() for k, m in zip(self.dims, mesh)}
+            y = self.exact(train)
+            x = self.normalize(train, (a, b))
+            
+            piece = {'level': (a, b), 'coeffs': {}}
+            if method == 'rbf':
+                idx = rng.choice(len(x), min(centers, len(x)),
+                                 replace = False)
+                piece['centers'] = x[idx]
+            basis = self.basis(x, piece)
+            for key in OUTPUTS:
+                if not np.all(np.isfinite(y[key])):
+                    continue
+                #positive ratios (resisting/ driving) are fitted as
+                #reciprocals, which are linear in the ice load
+                inverse = bool(np.all(y[key] > 0))
+                values = 1 / y[key] if inverse else y[key]
+                piece['coeffs'][key] = (np.linalg.lstsq(
+                    basis, values, rcond = None
+                    )[0], inverse)
+            self.pieces.append(piece)
+        
+        #validation at random points of the box
+        val = {}
+        for key in self.dims:
+            lo, hi = self.ranges[key]
+            val[key] = rng.uniform(lo, hi, validation)
+        y_val = self.exact(val)
+        pred = self.surrogate(val)
+        self.errors = {}
+        for key in OUTPUTS:
+            err = np.abs(pred[key] - y_val[key])
+            err = err[np.isfinite(y_val[key])]
+            if np.isnan(err).any():
+                self.errors[key] = (np.inf, np.inf)
+            else:
+                self.errors[key] = (float(err.max()),
+                                    float(np.sqrt((err**2).mean())))
+        tol = tol or {}
+        self.valid = {k: self.errors[k][0] <= tol.get(k, np.inf)
+                      for k in OUTPUTS}
+    
+    def normalize(self, params, level):
+        #parameters mapped to [-1, 1] (water level: range level of a
+        #piece), shape (n, dims)
+        cols = []
+        for key in self.dims:
+            lo, hi = level if key == 'level' else self.ranges[key]
+            cols.append(2 * (np.asarray(params[key], dtype = float) - lo)
+                        / (hi - lo) - 1)
+        return np.column_stack(cols)
+    
+    def basis(self, x, piece):
+        #basis functions at normalized points x, shape (n, number of
+        #functions)
+        if self.method == 'poly':
+            return self.poly_basis(x, self.degree)
+        r = np.linalg.norm(x[:, None, :] - piece['centers'][None],
+                           axis = -1)
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            phi = np.where(r > 0, r**2 * np.log(r), 0)
+        return np.hstack([phi, self.poly_basis(x, 1)])
+    
+    def poly_basis(self, x, degree):
+        #products of Chebyshev polynomials of total degree <= degree
+        vander = [chebyshev.chebvander(x[:, i], degree)
+                  for i in range(x.shape[1])]
+        cols = []
+        for powers in itertools.product(range(degree + 1),
+                                        repeat = x.shape[1]):
+            if sum(powers) <= degree:
+                col = np.ones(len(x))
+                for v, k in zip(vander, powers):
+                    col = col * v[:, k]
+                cols.append(col)
+        return np.column_stack(cols)
+    
+    def exact(self, params):
+        p = dict(self.fixed)
+        p.update(params)
+        return exact(self.pillar, p['level'], p['ice'], p['uplift'],
+                     p['phi'], self.weight)
+    
+    def surrogate(self, params):
+        #predictions at points of the box (NaN if an output has no
+        #surrogate, i.e. not finite training values)
+        level = np.asarray(params['level'], dtype = float)
+        idx = np.clip(np.searchsorted(self.breaks, level, side = 'right') - 1,
+                      0, len(self.pieces) - 1)
+        out = {k: np.full(len(level), np.nan) for k in OUTPUTS}
+        for i in np.unique(idx):
+            piece = self.pieces[i]
+            mask = idx == i
+            x = self.normalize({k: np.asarray(params[k])[mask]
+                                for k in self.dims}, piece['level'])
+            basis = self.basis(x, piece)
+            for key, (c, inverse) in piece['coeffs'].items():
+                out[key][mask] = 1 / (basis @ c) if inverse else basis @ c
+        return out
+    
+    def inside(self, params):
+        #True for queries within the validated box (and at the fixed
+        #values of the other parameters)
+        n = len(params['level'])
+        ok = np.ones(n, dtype = bool)
+        for key in PARAMETERS:
+            value = params[key]
+            if key in self.ranges:
+                lo, hi = self.ranges[key]
+                ok &= (value >= lo) & (value <= hi)
+            else:
+                ok &= np.isclose(value, self.fixed[key])
+        return ok
+    
+    def predict(self, level, ice = None, uplift = None, phi = None):
+        """
+        Batch prediction of the stability coefficients; queries outside the
+        validated box are calculated exactly
+        
+        Parameters
+        ----------
+        level, ice, uplift, phi : float or array_like
+            Parameters of the queries, see exact(); parameters that are
+            None take their fixed value (or the middle of their range)
+        
+        Returns
+        -------
+        dict
+            Arrays of the coefficients (keys: OUTPUTS) and 'exact': True
+            for queries that were calculated exactly
+        """
+        params = {'level': level, 'ice': ice, 'uplift': uplift, 'phi': phi}
+        for key in PARAMETERS:
+            if params[key] is None:
+                if key in self.ranges:
+                    params[key] = sum(self.ranges[key]) / 2
+                else:
+                    params[key] = self.fixed[key]
+        arrays = np.broadcast_arrays(*[
+            np.atleast_1d(np.asarray(params[k], dtype = float))
+            for k in PARAMETERS
+            ])
+        params = dict(zip(PARAMETERS, arrays))
+        n = len(params['level'])
+        inside = self.inside(params)
+        
+        out = {k: np.empty(n) for k in OUTPUTS}
+        use = {k: inside & self.valid[k] for k in OUTPUTS}
+        if inside.any():
+            pred = self.surrogate({k: params[k][inside] for k in self.dims})
+            for key in OUTPUTS:
+                out[key][inside] = pred[key]
+        redo = ~np.logical_and.reduce([use[k] for k in OUTPUTS])
+        if redo.any():
+            ex = exact(self.pillar, *[params[k][redo] for k in PARAMETERS],
+                       weight = self.weight)
+            for key in OUTPUTS:
+                out[key][~use[key]] = ex[key][~use[key][redo]]
+        out['exact'] = redo
+        return out
+
+class DamSurrogates:
+    """
+    Surrogates of all pillars of a dam (see Surrogate), queried by pillar
+    name
+    """
+    
+    def __init__(self, dam, domain, **kwargs):
+        self.surrogates = {p.name: Surrogate(p, domain, **kwargs)
+                           for p in dam.pillars}
+    
+    def query(self, name, level, ice = None, uplift = None, phi = None):
+        """
+        Returns
+        -------
+        dict
+            Stability coefficients of pillar name, see Surrogate.predict
+        """
+        return self.surrogates[name].predict(level, ice, uplift, phi)
+    
+    def errors(self):
+        """
+        Returns
+        -------
+        pandas.DataFrame
+            Error bounds (largest and root mean square validation error)
+            per pillar and output, and whether the surrogate is used
+        """
+        rows = []
+        for name, s in self.surrogates.items():
+            for key in OUTPUTS:
+                max_err, rms = s.errors[key]
+                rows.append([name, key, max_err, rms, s.valid[key]])
+        return pd.DataFrame(rows, columns = [
+            'Damseksjon', 'Koeffisient', 'Maks. feil', 'RMS feil', 'Brukes'
+            ])
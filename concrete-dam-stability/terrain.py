@@ -0,0 +1,332 @@
+import os
+import json
+import numpy as np
+
+#first bytes of a binary grid cache
+MAGIC = b'DAMGRID\n'
+
+#file suffix of binary grid caches (next to the ASCII grid)
+SUFFIX = '.damgrid'
+
+#keys of the header of an ASCII grid (ESRI)
+HEADER = ('ncols', 'nrows', 'xllcorner', 'yllcorner', 'xllcenter',
+          'yllcenter', 'cellsize', 'nodata_value')
+
+def read_header(f):
+    #header of an ASCII grid, the file is positioned at the first value
+    header = {}
+    while True:
+        pos = f.tell()
+        line = f.readline()
+        parts = line.split()
+        if not parts or parts[0].lower() not in HEADER:
+            f.seek(pos)
+            return header
+        header[parts[0].lower()] = float(parts[1])
+
+def convert(file_name, cache_name = None):
+    """
+    Convert an ASCII grid (ESRI: ncols, nrows, xllcorner/ xllcenter,
+    yllcorner/ yllcenter, cellsize, nodata_value, rows from north to south)
+    to a binary grid cache, line by line (the grid is never held in memory
+    as a whole). Format: MAGIC, length of the header (8 bytes), json header
+    (padded to 8 bytes), float32 values (little endian, rows from north to
+    south, NaN for no data)
+    
+    Parameters
+    ----------
+    file_name : string
+        Path of the ASCII grid
+    cache_name : string, optional
+        Path of the cache; the default is file_name + SUFFIX
+    
+    Returns
+    -------
+    string
+        Path of the cache
+    """
+    if cache_name is None:
+        cache_name = file_name + SUFFIX
+    stat = os.stat(file_name)
+    with open(file_name, encoding = 'utf-8') as f:
+        h = read_header(f)
+        ncols, nrows = int(h['ncols']), int(h['nrows'])
+        cellsize = h['cellsize']
+        #origin: center of the south-western cell
+        x0 = h['xllcenter'] if 'xllcenter' in h else \
+            h['xllcorner'] + cellsize / 2
+        y0 = h['yllcenter'] if 'yllcenter' in h else \
+            h['yllcorner'] + cellsize / 2
+        header = {'ncols': ncols, 'nrows': nrows, 'x0': x0, 'y0': y0,
+                  'cellsize': cellsize, 'dtype': '<f4',
+                  'source': [stat.st_size, stat.st_mtime]}
+        data = json.dumps(header).encode('utf-8')
+        data += b' ' * (-len(data) % 8)
+        nodata = h.get('nodata_value')
+        
+        count = 0
+        with open(cache_name, 'wb') as out:
+            out.write(MAGIC)
+            out.write(len(data).to_bytes(8, 'little'))
+            out.write(data)
+            for line in f:
+                values = np.array(line.split(), dtype = float)
+                if nodata is not None:
+                    values[values == nodata] = np.nan
+                out.write(values.astype('<f4').tobytes())
+                count += len(values)
+    if count != ncols * nrows:
+        os.remove(cache_name)
+        raise ValueError(f'{file_name}: {count} values, expected '
+                         f'{ncols * nrows}')
+    return cache_name
+
+class Terrain:
+    """
+    Gridded rock surface, memory-mapped: only the parts of the grid that are
+    sampled are read from disk, so large scanned foundation surfaces can be
+    used without loading them. Elevations are interpolated bilinearly
+    between the cell centers, vectorized over any number of points.
+    """
+    
+    def __init__(self, values, x0, y0, cellsize):
+        """
+        Parameters
+        ----------
+        values : numpy.ndarray
+            Elevations, shape (rows, columns), rows from north to south
+            (e.g. numpy.memmap), NaN for no data,
+            unit: masl
+        x0, y0 : float
+            Coordinates of the center of the south-western cell,
+            unit: m
+        cellsize : positive float
+            Cell size,
+            unit: m
+        
+        Returns
+        -------
+        None.
+        
+        """
+        self.values = values
+        self.nrows, self.ncols = values.shape
+        self.x0 = x0
+        self.y0 = y0
+        self.cellsize = cellsize
+    
+    def sample(self, x, y):
+        """
+        Parameters
+        ----------
+        x, y : float or array_like
+            Coordinates of the points,
+            unit: m
+        
+        Returns
+        -------
+        numpy.ndarray
+            Bilinearly interpolated elevations (NaN outside of the grid or
+            next to cells without data),
+            unit: masl
+        """
+        x, y = np.broadcast_arrays(np.asarray(x, dtype = float),
+                                   np.asarray(y, dtype = float))
+        #column and row (from the south) of the points
+        col = (x - self.x0) / self.cellsize
+        row = (y - self.y0) / self.cellsize
+        half = 0.5 + 1e-9
+        inside = ((col >= -half) & (col <= self.ncols - 1 + half)
+                  & (row >= -half) & (row <= self.nrows - 1 + half))
+        col = np.clip(col, 0, self.ncols - 1)
+        row = np.clip(row, 0, self.nrows - 1)
+        
+        c0 = np.minimum(np.floor(col).astype(int), max(self.ncols - 2, 0))
+        r0 = np.minimum(np.floor(row).astype(int), max(self.nrows - 2, 0))
+        c1 = np.minimum(c0 + 1, self.ncols - 1)
+        r1 = np.minimum(r0 + 1, self.nrows - 1)
+        tc, tr = col - c0, row - r0
+        
+        #rows of the array are stored from the north
+        top = self.nrows - 1
+        z00 = self.values[top - r0, c0]
+        z01 = self.values[top - r0, c1]
+        z10 = self.values[top - r1, c0]
+        z11 = self.values[top - r1, c1]
+        z = ((1 - tr) * ((1 - tc) * z00 + tc * z01)
+             + tr * ((1 - tc) * z10 + tc * z11))
+        return np.where(inside, z, np.nan)
+
+def read(file_name, mmap = True):
+    """
+    Open a terrain grid: a binary grid cache, or an ASCII grid that is
+    converted to a cache next to it at the first use (and again when it
+    has changed, see convert())
+    
+    Parameters
+    ----------
+    file_name : string
+        Path of an ASCII grid (.asc) or a cache
+    mmap : bool, optional
+        Memory-map the values; the default is True
+    
+    Returns
+    -------
+    instance of Terrain
+    """
+    cache_name = file_name
+    if not file_name.endswith(SUFFIX):
+        cache_name = file_name + SUFFIX
+        stat = os.stat(file_name)
+        if not os.path.exists(cache_name) or \
+                read_cache_header(cache_name)[0]['source'] != \
+                [stat.st_size, stat.st_mtime]:
+            convert(file_name, cache_name)
+    
+    header, offset = read_cache_header(cache_name)
+    shape = (header['nrows'], header['ncols'])
+    if mmap:
+        values = np.memmap(cache_name, dtype = header['dtype'], mode = 'r',
+                           offset = offset, shape = shape)
+    else:
+        values = np.fromfile(cache_name, dtype = header['dtype'],
+                             offset = offset).reshape(shape)
+    return Terrain(values, header['x0'], header['y0'], header['cellsize'])
+
+def read_cache_header(cache_name):
+    #header of a binary grid cache and offset of its values
+    with open(cache_name, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{cache_name} is not a grid cache')
+        length = int.from_bytes(f.read(8), 'little')
+        header = json.loads(f.read(length))
+    return header, len(MAGIC) + 8 + length
+
+def read_raw(file_name, nrows, ncols, x0, y0, cellsize, dtype = '<f4'):
+    """
+    Memory-map a raw binary grid (rows from north to south, without header)
+    
+    Returns
+    -------
+    instance of Terrain
+        See Terrain for the parameters
+    """
+    values = np.memmap(file_name, dtype = dtype, mode = 'r',
+                       shape = (nrows, ncols))
+    return Terrain(values, x0, y0, cellsize)
+
+def footprint(axis, stations, offsets):
+    """
+    Plan coordinates of points of sections
+    
+    Parameters
+    ----------
+    axis : list
+        Dam axis in plan: points (x, y), the station is the distance along
+        the axis; downstream is to the right of the axis direction
+    stations : array_like
+        Stations of the sections,
+        unit: m
+    offsets : array_like
+        Distance of the points from the axis, downstream positive (the
+        x-coordinates of the profiles), same shape as stations or scalar,
+        unit: m
+    
+    Returns
+    -------
+    tuple
+        Arrays of the x and y coordinates
+    """
+    axis = np.asarray(axis, dtype = float)
+    seg = np.diff(axis, axis = 0)
+    lengths = np.hypot(seg[:, 0], seg[:, 1])
+    chainage = np.append(0, np.cumsum(lengths))
+    stations, offsets = np.broadcast_arrays(
+        np.asarray(stations, dtype = float),
+        np.asarray(offsets, dtype = float)
+        )
+    idx = np.clip(np.searchsorted(chainage, stations, side = 'right') - 1,
+                  0, len(seg) - 1)
+    t = (stations - chainage[idx]) / lengths[idx]
+    dx, dy = seg[idx, 0] / lengths[idx], seg[idx, 1] / lengths[idx]
+    x = axis[idx, 0] + t * seg[idx, 0] + offsets * dy
+    y = axis[idx, 1] + t * seg[idx, 1] - offsets * dx
+    return x, y
+
+def rock_lines(terrain, axis, stations, upstream, downstream):
+    """
+    Rock lines of a dam for the section generator (see sections.py):
+    elevations of the rock surface along the upstream and downstream
+    contact lines
+    
+    Parameters
+    ----------
+    terrain : instance of Terrain
+    axis : list
+        Dam axis in plan, see footprint()
+    stations : array_like
+        Stations of the rock lines,
+        unit: m
+    upstream, downstream : float or array_like
+        Offsets of the upstream and downstream contact from the axis
+        (x-coordinates of the profile),
+        unit: m
+    
+    Returns
+    -------
+    tuple
+        Upstream and downstream rock line: lists of points (station,
+        elevation)
+    """
+    stations = np.asarray(stations, dtype = float)
+    lines = []
+    for offset in (upstream, downstream):
+        z = terrain.sample(*footprint(axis, stations, offset))
+        lines.append(list(zip(stations.tolist(), z.tolist())))
+    return lines[0], lines[1]
+
+def set_contacts(terrain, pillars, axis, upstream, downstream,
+                 iterations = 2):
+    """
+    Set the contact elevations of pillars (contact_l, contact_r) from the
+    rock surface, sampled at the station of each pillar (mean axis of its
+    segments) at the offsets of the contacts; the offsets are refined with
+    the contact points of the profile (see Pillar.left_contact), which
+    depend on the elevations
+    
+    Parameters
+    ----------
+    terrain : instance of Terrain
+    pillars : list
+        List of instances of Pillar
+    axis : list
+        Dam axis in plan, see footprint()
+    upstream, downstream : float or array_like
+        Initial offsets of the upstream and downstream contact (e.g. the
+        upstream and downstream toe of the profile),
+        unit: m
+    iterations : int, optional
+        Number of refinements of the offsets; the default is 2
+    
+    Returns
+    -------
+    tuple
+        Arrays of the upstream and downstream contact elevations
+    """
+    stations = np.array([np.mean([s.axis for s in p.segments])
+                         for p in pillars])
+    offsets = [np.broadcast_to(np.asarray(upstream, dtype = float),
+                               stations.shape),
+               np.broadcast_to(np.asarray(downstream, dtype = float),
+                               stations.shape)]
+    for i in range(iterations + 1):
+        z_l = terrain.sample(*footprint(axis, stations, offsets[0]))
+        z_r = terrain.sample(*footprint(axis, stations, offsets[1]))
+        if np.isnan(z_l).any() or np.isnan(z_r).any():
+            raise ValueError('Contacts outside of the terrain grid')
+        for p, l, r in zip(pillars, z_l, z_r):
+            p.contact_l, p.contact_r = float(l), float(r)
+            p.clear_cache()
+        offsets = [np.array([p.left_contact().x for p in pillars]),
+                   np.array([p.right_contact().x for p in pillars])]
+    return z_l, z_r
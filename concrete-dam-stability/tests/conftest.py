@@ -0,0 +1,18 @@
+import os
+import sys
+import copy
+import pytest
+
+#the modules of the package are imported by name (flat layout)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dam_setup
+
+@pytest.fixture
+def pillars():
+    #copies of the pillars of dam_setup (plate dam and gravity dam pillars)
+    return copy.deepcopy(dam_setup.dam_construction.pillars)
+
+@pytest.fixture
+def cases():
+    return list(dam_setup.cases)
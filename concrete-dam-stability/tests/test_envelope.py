@@ -0,0 +1,30 @@
+import numpy as np
+
+import envelope, evaluation, dam
+
+def test_pruned_envelope_matches_all_combinations(pillars):
+    #the governing combination with pruning of dominated combinations is
+    #the one with the smallest margin of all combinations
+    d = dam.Dam([pillars[3], pillars[19]])
+    cases = envelope.combinations([275, 275.8, 276.3], ices = (0, 50, 100),
+                                  uplifts = (0.5, 1))
+    env = envelope.Envelope(d, cases)
+    table = env.table()
+    
+    ev = evaluation.Evaluation(d, cases)
+    margins = {}
+    for case, stab in zip(ev.cases, ev.stability()):
+        gl, vm, vr = (stab.glidning(), stab.velting_moment(),
+                      stab.velting_resultant())
+        for i, p in enumerate(d.pillars):
+            margins.setdefault((p.name, 'Glidning'), []).append(
+                ev.glidning_margin(case, p, gl[i]))
+            margins.setdefault((p.name, 'Velting'), []).append(
+                ev.velting_margin(case, p, vm[i], vr[i]))
+    
+    for _, row in table.iterrows():
+        values = margins[(row['Damseksjon'], row['Sikkerhet mot'])]
+        assert row['Margin'] == round(float(np.min(values)), 3)
+    assert env.counts['evaluated'] < env.counts['combinations']
+    #one load calculation per pillar and level
+    assert env.counts['levels'] == 2 * 3
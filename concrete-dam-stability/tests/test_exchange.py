@@ -0,0 +1,41 @@
+import collections
+import pytest
+
+import exchange, export, loadcase, runcontext, dam
+
+def exported_segments(exp, case):
+    #segments exported per load case: (name, axis) and load
+    segs = []
+    for p in exp.dam.pillars:
+        for rows in exp.pillar_rows(case, p):
+            for name, axis, weight, width, x, y in rows:
+                seg = {'x': x[:-1], 'y': y[:-1], 'width': width,
+                       'weight': weight}
+                segs.append((name, round(axis, 3),
+                             exchange.segment_load(seg)))
+    return segs
+
+def test_write_read_round_trip(tmp_path, pillars, cases):
+    data = exchange.instanced(dam.Dam(pillars[17:]), cases)
+    file_name = str(tmp_path / 'geometry.json')
+    exchange.write(data, file_name)
+    assert exchange.read(file_name) == data
+
+@pytest.mark.parametrize('uplift', [1, 0])
+def test_expand_matches_export(tmp_path, pillars, uplift):
+    d = dam.Dam([pillars[0], pillars[19]])
+    cases = [loadcase.LoadCase('HRV + is', 275, ice = 100,
+                               uplift = uplift),
+             loadcase.LoadCase('MFV', 276.5, uplift = uplift)]
+    exp = export.Export(d, cases, runcontext.RunContext(str(tmp_path)))
+    data = exchange.instanced(d, cases)
+    for case in cases:
+        expected = exported_segments(exp, case)
+        segs = [(i['name'], round(i['axis'], 3), exchange.segment_load(i))
+                for i in exchange.expand(data, case.name)]
+        assert collections.Counter(i[:2] for i in segs) == \
+            collections.Counter(i[:2] for i in expected)
+        #coordinates are rounded to DECIMALS
+        assert sum(i[2] for i in segs) == \
+            pytest.approx(sum(i[2] for i in expected), rel = 1e-4)
+        assert (uplift == 0) == all(i[0] != 'Opptrykk' for i in segs)
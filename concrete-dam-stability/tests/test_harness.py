@@ -0,0 +1,26 @@
+import harness, load
+
+def test_fast_paths_accepted(pillars):
+    h = harness.Harness([pillars[0], pillars[19]]
+                        + harness.synthetic_pillars(2))
+    assert list(h.engines) == ['LevelResponse']
+    assert h.accepted()
+    assert set(h.results['Motor']) == {'LevelResponse'}
+
+def test_discretization_study(pillars):
+    h = harness.discretization([pillars[19]], levels = [275, 276.33])
+    assert h.accepted()
+    #strips of other widths do not meet the tolerance of the fast paths
+    h.tolerances = harness.TOLERANCES
+    h.results = None
+    assert not h.accepted()
+
+def test_refined_uplift_keeps_class_increment(pillars):
+    default = load.Opptrykk.increment
+    engine = harness.refined_uplift(0.01)
+    fine = engine(pillars[19], [275])
+    assert load.Opptrykk.increment == default
+    coarse = harness.reference(pillars[19], [275])
+    assert fine['Opptrykk'][0] != coarse['Opptrykk'][0]
+    assert fine['Opptrykk'][0] == harness.reference(
+        pillars[19], [275], increment = 0.01)['Opptrykk'][0]
@@ -0,0 +1,78 @@
+import time
+import threading
+import pytest
+
+import jobs
+
+def test_results_in_unit_order_and_resume(tmp_path):
+    file_name = str(tmp_path / 'jobs.sqlite')
+    store = jobs.JobStore(file_name)
+    assert store.add('j', 'evaluate', [{'i': i} for i in range(5)]) == 5
+    #adding the job again keeps the units
+    assert store.add('j', 'evaluate', [{'i': i} for i in range(5)]) == 0
+    units = store.claim('j', 'A', 3)
+    assert [u[0] for u in units] == [0, 1, 2]
+    for idx, _, payload in reversed(units):
+        assert store.complete('j', 'A', idx, payload['i'] * 10)
+    assert store.progress('j') == {'pending': 2, 'claimed': 0, 'done': 3}
+    assert store.results('j') == [0, 10, 20, None, None]
+    store.close()
+
+def test_reused_job_name_with_other_units(tmp_path):
+    store = jobs.JobStore(str(tmp_path / 'jobs.sqlite'))
+    store.add('j', 'evaluate', [{'i': i} for i in range(3)])
+    for task, payloads in [('evaluate', [{'i': 5}, {'i': 1}, {'i': 2}]),
+                           ('sweep', [{'i': i} for i in range(3)]),
+                           ('evaluate', [{'i': 0}])]:
+        with pytest.raises(ValueError, match = 'other units'):
+            store.add('j', task, payloads)
+    #nothing was added, further units of the same job can be added
+    assert store.progress('j')['pending'] == 3
+    assert store.add('j', 'evaluate', [{'i': i} for i in range(4)]) == 1
+    store.close()
+
+def test_complete_checks_worker(tmp_path):
+    store = jobs.JobStore(str(tmp_path / 'jobs.sqlite'), lease = 0.05)
+    store.add('j', 'evaluate', [{}])
+    store.claim('j', 'A')
+    time.sleep(0.1)
+    #the lease of A has expired, B claims the unit
+    assert store.claim('j', 'B')
+    assert not store.complete('j', 'A', 0, 'a')
+    assert store.complete('j', 'B', 0, 'b')
+    assert not store.complete('j', 'B', 0, 'c')
+    assert store.results('j') == ['b']
+
+def test_renew_all_claimed_units(tmp_path):
+    store = jobs.JobStore(str(tmp_path / 'jobs.sqlite'), lease = 100)
+    store.add('j', 'evaluate', [{}, {}, {}])
+    store.claim('j', 'A', 2)
+    assert store.renew('j', 'A') == 2
+    assert store.renew('j', 'A', 1) == 1
+    assert store.renew('j', 'B', 0) == 0
+
+def test_batch_leases_are_kept_while_computing(tmp_path, monkeypatch):
+    #a worker claims all units at once; its leases are shorter than the
+    #whole batch but renewed while it computes, no other worker takes over
+    file_name = str(tmp_path / 'jobs.sqlite')
+    monkeypatch.setitem(jobs.TASKS, 'slow',
+                        lambda payload: (time.sleep(0.3), payload['i'])[1])
+    init = jobs.JobStore.__init__
+    monkeypatch.setattr(
+        jobs.JobStore, '__init__',
+        lambda self, f, lease = 0.4, timeout = 60: init(self, f, lease,
+                                                        timeout)
+        )
+    store = jobs.JobStore(file_name)
+    store.add('j', 'slow', [{'i': i} for i in range(4)])
+    counts = {}
+    a = threading.Thread(target = lambda: counts.update(
+        A = jobs.run_worker(file_name, 'j', 'A', batch = 4)))
+    a.start()
+    time.sleep(0.8)
+    counts['B'] = jobs.run_worker(file_name, 'j', 'B')
+    a.join()
+    assert counts == {'A': 4, 'B': 0}
+    assert store.results('j') == [0, 1, 2, 3]
+    rows = store.con.execute('SELECT worker, attempts FROM units').fetchall()
+    assert rows == [('A', 1)] * 4
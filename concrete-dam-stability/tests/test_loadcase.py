@@ -0,0 +1,16 @@
+import pytest
+
+import loadcase, evaluation, dam
+
+def test_from_levels_numbers_repeated_names():
+    names = [c.name for c in loadcase.from_levels([275, 275.5, 275.8, 276])]
+    assert names == ['HRV + is', 'DFV 1', 'DFV 2', 'MFV']
+    names = [c.name for c in loadcase.from_levels([275, 276])]
+    assert names == ['HRV + is', 'MFV']
+
+def test_duplicate_names_rejected(pillars):
+    cases = [loadcase.LoadCase('DFV', 275), loadcase.LoadCase('DFV', 276)]
+    with pytest.raises(ValueError, match = 'unique'):
+        loadcase.as_cases(cases)
+    with pytest.raises(ValueError, match = 'unique'):
+        evaluation.Evaluation(dam.Dam(pillars[:1]), cases)
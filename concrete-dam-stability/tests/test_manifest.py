@@ -0,0 +1,43 @@
+import os
+import copy
+import pandas as pd
+
+import dam, export, loadcase, manifest, runcontext
+
+def test_manifest_staleness(tmp_path):
+    out = str(tmp_path / 'out.txt')
+    m = manifest.Manifest(str(tmp_path / 'manifest.json'))
+    value = manifest.digest([1, 2], 'a')
+    assert not m.is_current(out, value, out)
+    open(out, 'w').close()
+    m.update(out, value)
+    m.save()
+    m = manifest.Manifest(str(tmp_path / 'manifest.json'))
+    assert m.is_current(out, value, out)
+    #changed inputs or missing file
+    assert not m.is_current(out, manifest.digest([1, 3], 'a'), out)
+    os.remove(out)
+    assert not m.is_current(out, value, out)
+
+def test_pillar_fingerprint_changes_with_inputs(pillars):
+    p = pillars[0]
+    before = manifest.digest(manifest.pillar_fingerprint(p))
+    q = copy.deepcopy(p)
+    q.contact_l += 0.001
+    assert manifest.digest(manifest.pillar_fingerprint(q)) != before
+    assert manifest.digest(manifest.pillar_fingerprint(p)) == before
+
+def exported(context):
+    directory = context.dir('export')
+    return {f: pd.read_excel(f'{directory}/{f}', header = None)
+            for f in sorted(os.listdir(directory)) if f.endswith('.xlsx')}
+
+def test_export_only_stale_files(tmp_path, pillars, cases):
+    d = dam.Dam(pillars[17:])
+    context = runcontext.RunContext(str(tmp_path))
+    assert '10 files updated' in export.Export(d, cases, context).export()
+    assert '0 files updated' in export.Export(d, cases, context).export()
+    changed = cases[:2] + [loadcase.LoadCase('MFV', 276.5,
+                                             threshold_class = 'ulykke')]
+    #evaluation and the three files of the changed load case
+    assert '4 files updated' in export.Export(d, changed, context).export()
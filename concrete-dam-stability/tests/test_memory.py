@@ -0,0 +1,73 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import tracemalloc
+
+import dam, export, load, memory, runcontext
+
+def test_tracker_nested_stages():
+    tracker = memory.Tracker()
+    with tracker.stage('outer'):
+        kept = np.ones(250000)
+        with tracker.stage('inner'):
+            tmp = np.ones(500000)
+            del tmp
+    table = tracker.table()
+    assert list(table['Trinn']) == ['inner', 'outer']
+    assert list(table['Nivaa']) == [1, 0]
+    inner, outer = table.to_dict('records')
+    assert inner['Topp (MB)'] == pytest.approx(4, rel = 0.05)
+    assert inner['Beholdt (MB)'] == pytest.approx(0, abs = 0.05)
+    #the peak of the inner stage counts for the outer stage
+    assert outer['Topp (MB)'] == pytest.approx(6, rel = 0.05)
+    assert outer['Beholdt (MB)'] == pytest.approx(2, rel = 0.05)
+    assert not tracemalloc.is_tracing()
+    del kept
+
+@pytest.mark.parametrize('idx', [0, 12, 19])
+@pytest.mark.parametrize('level', [266.0, 275.5, 277.0])
+def test_opptrykk_matches_strips(pillars, idx, level):
+    #closed-form uplift (load and centroid) against the drawn strips
+    d = dam.Dam([pillars[idx]])
+    op = load.Opptrykk(d, level, uplift = 0.8)
+    segs = op.draw()[0]
+    loads = [s.load() for s in segs]
+    x = sum(l * s.centroid().x for l, s in zip(loads, segs)) / sum(loads)
+    assert op.calc_load()[0] == pytest.approx(-sum(loads), rel = 1e-10)
+    assert op.calc_centroid()[0].x == pytest.approx(x, rel = 1e-10)
+
+def exported(context):
+    directory = context.dir('export')
+    return {f: pd.read_excel(f'{directory}/{f}', header = None)
+            for f in sorted(os.listdir(directory)) if f.endswith('.xlsx')}
+
+def test_bounded_export_matches_export(tmp_path, pillars, cases):
+    d = dam.Dam(pillars[17:])
+    full = runcontext.RunContext(str(tmp_path / 'full'))
+    bounded = runcontext.RunContext(str(tmp_path / 'bounded'))
+    export.Export(d, cases, full).export()
+    export.Export(d, cases, bounded).export(bounded = True)
+    a, b = exported(full), exported(bounded)
+    assert list(a) == list(b)
+    for name in a:
+        assert a[name].equals(b[name]), name
+    #both modes record the same content hashes
+    assert '0 files updated' in export.Export(d, cases, bounded).export()
+
+def test_profile_writes_to_temporary_directory(tmp_path, pillars, cases,
+                                               monkeypatch):
+    #the default output root is '..' (see RunContext)
+    (tmp_path / 'work').mkdir()
+    monkeypatch.chdir(tmp_path / 'work')
+    table = memory.profile(dam.Dam(pillars[19:]), cases, bounded = True)
+    assert list(table['Trinn']) == ['Evaluering', 'Eksport', 'Tabeller']
+    assert os.listdir(tmp_path) == ['work']
+
+def test_bounded_export_uses_less_memory(pillars, cases):
+    d = dam.Dam(pillars[10:])
+    peaks = []
+    for bounded in (False, True):
+        table = memory.profile(d, cases, bounded = bounded)
+        peaks.append(table.set_index('Trinn').loc['Eksport', 'Topp (MB)'])
+    assert peaks[1] < peaks[0]
@@ -0,0 +1,42 @@
+import asyncio
+import pytest
+
+import dam, monitor, runcontext
+
+def test_parse():
+    assert monitor.parse('t1, 275.5, 0.8') == {'time': 't1', 'level': 275.5,
+                                              'uplift': 0.8}
+    assert monitor.parse('{"level": 276, "uplift": {"Pilar 1": 0.5}}') \
+        == {'level': 276, 'uplift': {'Pilar 1': 0.5}}
+    assert monitor.parse('  ') is None
+    for line in ('garbage', '{"time": 1}', '{"level"', 't1,abc', '[1, 2]'):
+        with pytest.raises(ValueError):
+            monitor.parse(line)
+
+def test_malformed_lines_are_skipped(tmp_path, pillars):
+    m = monitor.Monitor(dam.Dam(pillars[19:]),
+                        context = runcontext.RunContext(str(tmp_path)))
+    messages = []
+    m.context.info = messages.append
+    
+    async def source():
+        for line in ['t1,276.0\n', 'garbage\n', '{"time": "t2"\n',
+                     '{"x": 1}\n', 't3,abc\n', '\n', 't4,277.9\n']:
+            yield line
+        yield {'time': 't5', 'level': 276.5}
+    
+    asyncio.run(m.run(source()))
+    summary = m.summary()
+    assert summary['updates'] == 3
+    assert summary['skipped'] == 4
+    assert sum(i.startswith('Reading skipped') for i in messages) == 4
+
+def test_tail_source_yields_lines(tmp_path):
+    file_name = tmp_path / 'feed.log'
+    file_name.write_text('t1,275\nbad\n')
+    
+    async def read():
+        source = monitor.tail_source(str(file_name), 0.01, from_start = True)
+        return [await source.__anext__(), await source.__anext__()]
+    
+    assert asyncio.run(read()) == ['t1,275\n', 'bad\n']
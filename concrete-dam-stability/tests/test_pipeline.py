@@ -0,0 +1,84 @@
+import os
+import time
+import threading
+import pytest
+
+import pipeline, pillar, runcontext, dam
+
+def test_graph_calculates_required_nodes_once():
+    calls = []
+    
+    def node(name, value):
+        def func(*args):
+            calls.append(name)
+            return value + sum(args)
+        return func
+    
+    g = pipeline.Graph()
+    g.add('a', node('a', 1))
+    g.add('b', node('b', 10), ['a'])
+    g.add('c', node('c', 100), ['a'])
+    g.add('d', node('d', 1000), ['b', 'c'])
+    g.add('unused', node('unused', 0))
+    g.value('known', 5)
+    g.add('e', node('e', 0), ['known'])
+    assert g.run(['d', 'b'], workers = 3) == [1112, 11]
+    assert sorted(calls) == ['a', 'b', 'c', 'd']
+    #results are memoized
+    assert g.run(['d', 'e']) == [1112, 5]
+    assert sorted(calls) == ['a', 'b', 'c', 'd', 'e']
+    assert g.computed == 5
+    with pytest.raises(KeyError):
+        g.run(['missing'])
+
+def test_graph_keeps_results_of_failed_run():
+    g = pipeline.Graph()
+    g.add('ok', lambda: 1)
+    g.add('fail', lambda x: x / 0, ['ok'])
+    with pytest.raises(ZeroDivisionError):
+        g.run(['fail'])
+    assert g.results == {'ok': 1}
+
+class Slow:
+    #object with a cached method that counts its calculations
+    def __init__(self):
+        self._cache = {}
+        self.calls = 0
+    
+    @pillar.cached
+    def value(self, x):
+        self.calls += 1
+        time.sleep(0.01)
+        return x * 2
+
+def test_cache_is_populated_once():
+    obj = Slow()
+    barrier = threading.Barrier(8)
+    results = []
+    
+    def run():
+        barrier.wait()
+        results.append(obj.value(3))
+    threads = [threading.Thread(target = run) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [6] * 8
+    assert obj.calls == 1
+
+def test_pipeline_export(tmp_path, pillars, cases):
+    d = dam.Dam(pillars[17:])
+    context = runcontext.RunContext(str(tmp_path))
+    pipe = pipeline.Pipeline(d, cases, context)
+    message, = pipe.run('export', workers = 4)
+    assert '10 files updated' in message
+    #records and segments of every load case
+    assert pipe.graph.computed == len(d.pillars) + 2 * len(cases) + 2
+    assert len(os.listdir(context.dir('export'))) == 11
+    
+    #up-to-date outputs are not calculated again
+    pipe = pipeline.Pipeline(d, cases, context)
+    message, = pipe.run('export')
+    assert '0 files updated' in message
+    assert pipe.graph.computed == 1
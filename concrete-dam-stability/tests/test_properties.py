@@ -0,0 +1,53 @@
+import os
+import json
+import pytest
+
+import export, runcontext, dam
+
+@pytest.fixture
+def exp(tmp_path, pillars, cases):
+    return export.Export(dam.Dam([pillars[0], pillars[19]]), cases,
+                         runcontext.RunContext(str(tmp_path)))
+
+def definition(name):
+    with open(os.path.join(export.DYNAMO, f'{name}.json'),
+              encoding = 'utf-8') as f:
+        return [i['Data']['Name']
+                for i in json.load(f)['Data']['Definitions']]
+
+def test_every_property_of_the_definitions(exp, cases):
+    props = exp.properties()
+    for name in ('Stabilitet', 'Egenskaper'):
+        names = definition(name)
+        for values in props[name].values():
+            for v in values:
+                assert list(v) == names
+                assert all(isinstance(i, str) for i in v.values())
+    assert len(props['Stabilitet']['Pilar 1']) == 2 * len(cases)
+
+def test_segment_keys_are_stable(exp, cases):
+    #a key refers to the same segment in every load case, segments without
+    #load are left out
+    egenskaper = exp.properties()['Egenskaper']
+    for key, values in egenskaper.items():
+        assert len({(v['Name'], v['Axis'], v['Width']) for v in values}) == 1
+        assert len(values) == len({v['Vannstand'] for v in values})
+    #ice load only in the load case with ice
+    assert [v['Vannstand'] for v in egenskaper['Pilar 1: Islast']] == \
+        [c.name for c in cases if c.ice > 0]
+    strips = [k for k in egenskaper if k.startswith('Pilar 20: Opptrykk')]
+    assert len(strips) > 1
+    assert all(len(egenskaper[k]) == len(cases) for k in strips)
+
+def test_missing_property_value():
+    with pytest.raises(ValueError, match = 'Volume'):
+        export.property_set(['Name', 'Volume'], {'Name': 'a'})
+
+def test_export_properties_only_when_changed(exp):
+    assert 'finished' in exp.export_properties()
+    file_name = f"{exp.context.dir('export')}/properties.json"
+    with open(file_name, encoding = 'utf-8') as f:
+        assert json.load(f) == json.loads(json.dumps(exp.properties()))
+    mtime = os.stat(file_name).st_mtime_ns
+    exp.export_properties()
+    assert os.stat(file_name).st_mtime_ns == mtime
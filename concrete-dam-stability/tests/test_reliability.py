@@ -0,0 +1,82 @@
+import math
+import pytest
+
+import dam, reliability, stability
+
+def critical_level(p, lower, upper, ice = 0):
+    #water level at which the sliding coefficient is 1 (bisection with the
+    #load classes)
+    def g(level):
+        return stability.Stability(dam.Dam([p]), level, ice).glidning()[0] - 1
+    assert g(lower) > 0 > g(upper)
+    for i in range(60):
+        mid = (lower + upper) / 2
+        lower, upper = (mid, upper) if g(mid) > 0 else (lower, mid)
+    return (lower + upper) / 2
+
+def test_form_single_normal_variable(pillars):
+    #with the water level as only (normal) variable, the limit state is
+    #monotonic in the level and beta is the distance of the critical level
+    #from the mean in standard deviations
+    p = pillars[19]
+    mean, std = 275.0, 0.8
+    crit = critical_level(p, mean, 290)
+    rel = reliability.Reliability(
+        dam.Dam([p]), [reliability.Variable('level', mean = mean, std = std)]
+        )
+    res = rel.form(rel.responses[0], 'Glidning')
+    assert res['converged']
+    assert res['beta'] == pytest.approx((crit - mean) / std, abs = 1e-4)
+    assert res['pf'] == pytest.approx(
+        0.5 * math.erfc(res['beta'] / math.sqrt(2)), rel = 1e-9
+        )
+    assert res['design']['level'] == pytest.approx(crit, abs = 1e-4)
+
+def test_sorm_equals_form_for_one_variable(pillars):
+    p = pillars[19]
+    rel = reliability.Reliability(
+        dam.Dam([p]), [reliability.Variable('level', mean = 275, std = 0.8)]
+        )
+    res = rel.form(rel.responses[0], 'Glidning')
+    assert rel.sorm(rel.responses[0], 'Glidning', res) == res['pf']
+
+def test_form_design_point_on_limit_state(pillars):
+    p = pillars[12]
+    rel = reliability.Reliability(dam.Dam([p]), [
+        reliability.Variable('level', 'gumbel', mean = 275.5, std = 0.4),
+        reliability.Variable('uplift', mean = 1, std = 0.2),
+        reliability.Variable('phi', 'lognormal', mean = 50, std = 4)
+        ])
+    resp = rel.responses[0]
+    res = rel.form(resp, 'Glidning')
+    assert res['converged']
+    assert abs(rel.limit_state(resp, 'Glidning', res['u'])[0]) < 1e-5
+    assert sum(res['alpha']**2) == pytest.approx(1)
+    assert res['beta'] == pytest.approx(math.hypot(*res['u']), rel = 1e-6)
+
+def test_unknown_variable():
+    with pytest.raises(ValueError):
+        reliability.Variable('height')
+
+def test_lognormal_mean_must_be_positive(pillars):
+    with pytest.raises(ValueError, match = 'positive'):
+        reliability.Variable('ice', 'lognormal', mean = 0, std = 20)
+    #the nominal ice load is 0
+    rel = reliability.Reliability(
+        dam.Dam([pillars[19]]),
+        [reliability.Variable('ice', 'lognormal', std = 20)],
+        fixed = {'level': 275}
+        )
+    with pytest.raises(ValueError, match = 'ice must be positive'):
+        rel.form(rel.responses[0], 'Glidning')
+
+def test_water_level_required(pillars, monkeypatch):
+    #checked before the level responses are built
+    def build(*args):
+        raise AssertionError('level responses built')
+    monkeypatch.setattr(reliability.response, 'build', build)
+    d = dam.Dam([pillars[19]])
+    with pytest.raises(ValueError, match = 'water level'):
+        reliability.Reliability(d, [reliability.Variable('ice', std = 20)])
+    with pytest.raises(ValueError, match = 'mean of the water level'):
+        reliability.Reliability(d, [reliability.Variable('level', std = 1)])
@@ -0,0 +1,34 @@
+import os
+import pandas as pd
+import pytest
+
+import report, evaluation, runcontext, dam
+
+def test_overview_table(pillars, cases):
+    d = dam.Dam(pillars[15:])
+    table = report.Report(d, cases).overview_table()
+    ev = evaluation.Evaluation(d, cases)
+    rows = ev.glidning() + ev.velting()
+    assert table[evaluation.HEADER].values.tolist() == \
+        [list(r) for r in rows]
+    assert ((table['Margin'] < 0) == (table['Stabilitet'] == 'ikke ok')).all()
+    assert list(table['Akse'][:len(d.pillars)]) == \
+        [round(p.axis(), 2) for p in d.pillars]
+
+def test_create_overview(tmp_path, pillars, cases):
+    context = runcontext.RunContext(str(tmp_path))
+    rep = report.Report(dam.Dam(pillars[10:]), cases, context)
+    assert 'created' in rep.create_overview(worst = 5)
+    result = context.dir('result')
+    assert os.path.exists(f'{result}/Dam_overview.pdf')
+    table = pd.read_excel(f'{result}/Dam_overview.xlsx')
+    assert len(table) == 2 * 10 * len(cases)
+    assert table['Margin'].is_monotonic_increasing
+    assert 'up to date' in rep.create_overview(worst = 5)
+
+def test_overview_without_cases_or_pillars(tmp_path, pillars, cases):
+    context = runcontext.RunContext(str(tmp_path))
+    with pytest.raises(ValueError, match = 'load cases'):
+        report.Report(dam.Dam(pillars[:3]), [], context).create_overview()
+    with pytest.raises(ValueError, match = 'pillars'):
+        report.Report(dam.Dam([]), cases, context).create_overview()
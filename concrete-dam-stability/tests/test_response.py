@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+import dam, response, stability
+
+LEVELS = [262.5, 268.0, 274.0, 275.5, 276.3, 277.5]
+
+@pytest.mark.parametrize('idx', [0, 5, 12, 19])
+def test_level_response_matches_stability(pillars, idx):
+    p = pillars[idx]
+    levels = [l for l in LEVELS if l > p.left_contact().y]
+    resp = response.LevelResponse(p)
+    loads = resp.loads(levels, ice = 100, uplift = 0.7)
+    gl, vm, vr = resp.coefficients(levels, ice = 100, uplift = 0.7)
+    for i, level in enumerate(levels):
+        stab = stability.Stability(dam.Dam([p]), level, 100, 0.7)
+        ref = [l[0] for l in stab.loads()]
+        np.testing.assert_allclose(loads[i, :, 0], ref, rtol = 1e-9,
+                                   atol = 1e-8)
+        np.testing.assert_allclose(
+            [gl[i], vm[i], vr[i]],
+            [stab.glidning()[0], stab.velting_moment()[0],
+             stab.velting_resultant()[0]], rtol = 1e-9, atol = 1e-9
+            )
+
+def test_level_response_outside_domain(pillars):
+    #levels outside of the domain are calculated with the load classes
+    p = pillars[19]
+    resp = response.LevelResponse(p, 274, 275)
+    gl = resp.coefficients([276.5], ice = 0)[0]
+    stab = stability.Stability(dam.Dam([p]), 276.5, 0)
+    assert gl[0] == pytest.approx(stab.glidning()[0], rel = 1e-9)
+
+def test_unverified_intervals_use_load_classes(pillars):
+    #intervals that do not verify within max_depth are recorded and
+    #evaluated exactly
+    p = pillars[0]
+    resp = response.LevelResponse(p, max_depth = 0, tol = 1e-15)
+    assert not resp.verified.all()
+    assert len(resp.inexact) == (~resp.verified).sum()
+    levels = [275.5, 276.3]
+    gl = resp.coefficients(levels, ice = 50)[0]
+    for level, gl_i in zip(levels, gl):
+        stab = stability.Stability(dam.Dam([p]), level, 50)
+        assert gl_i == stab.glidning()[0]
+    assert response.LevelResponse(p).inexact == []
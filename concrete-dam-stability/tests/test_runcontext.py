@@ -0,0 +1,35 @@
+import io
+import os
+import logging
+
+import matplotlib.pyplot as plt
+
+import runcontext
+
+def test_dir_below_root(tmp_path):
+    context = runcontext.RunContext(str(tmp_path))
+    path = context.dir('result', 'pages')
+    assert path == os.path.join(str(tmp_path), 'result', 'pages')
+    assert os.path.isdir(path)
+    assert context.dir('result', 'pages') == path
+
+def test_contexts_log_separately(tmp_path):
+    streams = [io.StringIO(), io.StringIO()]
+    contexts = []
+    for stream in streams:
+        logger = logging.Logger('run', logging.INFO)
+        logger.addHandler(logging.StreamHandler(stream))
+        contexts.append(runcontext.RunContext(str(tmp_path), logger))
+    contexts[0].info('first')
+    contexts[1].info('second')
+    assert [s.getvalue() for s in streams] == ['first\n', 'second\n']
+    #the default loggers are not registered in the logging module
+    a, b = runcontext.RunContext(), runcontext.RunContext()
+    assert a.logger is not b.logger
+    assert a.logger is not logging.getLogger('dam')
+
+def test_figure_without_pyplot():
+    figures = plt.get_fignums()
+    fig = runcontext.RunContext().figure()
+    fig.add_subplot().plot([0, 1], [0, 1])
+    assert plt.get_fignums() == figures
@@ -0,0 +1,32 @@
+import pytest
+
+import screening, evaluation, loadcase, dam
+
+def test_nothing_to_check(pillars, cases):
+    for s in (screening.Screening(dam.Dam([]), cases),
+              screening.Screening(dam.Dam(pillars[:2]), [])):
+        assert s.screen() is None
+        assert s.summary() == 'Ingen kontroller'
+
+@pytest.mark.parametrize('level', [275, 276.33, 280])
+def test_margin_sign_matches_rows(pillars, level):
+    #the margins of both modes are negative exactly if the overview row
+    #is not ok
+    d = dam.Dam([pillars[0], pillars[19]])
+    cases = [loadcase.LoadCase('DFV', level, ice = 100)]
+    ev = evaluation.Evaluation(d, cases)
+    stab = ev.stability()[0]
+    gl, vm, vr = (stab.glidning(), stab.velting_moment(),
+                  stab.velting_resultant())
+    for i, p in enumerate(d.pillars):
+        row = ev.glidning_row(cases[0], p, gl[i])
+        assert (ev.glidning_margin(cases[0], p, gl[i]) < 0) == \
+            (row[-1] == 'ikke ok')
+        row = ev.velting_row(cases[0], p, vm[i], vr[i])
+        assert (ev.velting_margin(cases[0], p, vm[i], vr[i]) < 0) == \
+            (row[-1] == 'ikke ok')
+
+def test_governing_case(pillars, cases):
+    s = screening.Screening(dam.Dam(pillars[17:]), cases).screen()
+    assert s['checks'] == 2 * 3 * len(cases)
+    assert (s['margin'] < 0) == (s['result'] == 'ikke ok')
@@ -0,0 +1,41 @@
+import pytest
+
+import dam, dam_setup, evaluation, sections
+
+def generator(pillars, rise = 1):
+    p = pillars[19]
+    profile = [(dam_setup.plate_poly, dam_setup.concrete, 'Plate'),
+               (dam_setup.pilar_poly, dam_setup.concrete, 'Pilar')]
+    return sections.SectionGenerator(
+        profile, [(0, p.contact_l), (10, p.contact_l + rise)],
+        [(0, p.contact_r), (10, p.contact_r + rise)], dam_setup.width_cr,
+        p.phi)
+
+def test_sections_along_rock_lines(pillars):
+    gen = generator(pillars)
+    ss = gen.sections(4)
+    assert [p.name for p in ss] == ['Snitt 2.0', 'Snitt 6.0', 'Snitt 9.0']
+    #the last section is narrower
+    assert [p.segments[0].width for p in ss] == [4, 4, 2]
+    assert [p.contact_l for p in ss] == pytest.approx([273.13, 273.53,
+                                                      273.83])
+    #geometry of the template is shared, not recalculated
+    assert ss[0].get_union() is ss[2].get_union()
+
+def test_contacts_outside_template(pillars):
+    gen = generator(pillars, rise = 10)
+    with pytest.raises(ValueError, match = 'outside of the profile'):
+        gen.sections(1)
+
+def test_evaluate_matches_evaluation(pillars, cases):
+    gen = generator(pillars, rise = 0)
+    ss = gen.sections(3)
+    #all sections have the same contacts but the last one
+    assert len({gen.key(p) for p in ss}) == 2
+    rows = gen.evaluate(ss, cases)
+    ev = evaluation.Evaluation(dam.Dam(ss), cases)
+    expected = ev.glidning() + ev.velting()
+    assert len(rows) == len(expected)
+    for row, exp in zip(rows, expected):
+        assert row[:3] == exp[:3]
+        assert row[3:] == pytest.approx(exp[3:])
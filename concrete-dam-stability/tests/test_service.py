@@ -0,0 +1,95 @@
+import threading
+import pytest
+
+import service, response
+
+@pytest.fixture
+def svc():
+    s = service.Service(allowed = ('dam_setup', ))
+    yield s
+    s.executor.shutdown()
+
+def test_pillars(svc):
+    status, result = svc.handle('pillars', {'setup': 'dam_setup'})
+    assert status == 200
+    assert len(result['pillars']) == 20
+
+@pytest.mark.parametrize('setup', ['os', 'unknown_setup', '../dam_setup'])
+def test_unknown_setup_rejected(svc, setup):
+    status, result = svc.handle('pillars', {'setup': setup})
+    assert status == 400
+    assert result['error'] == f'Unknown setup: {setup}'
+
+def test_request_errors(svc):
+    assert svc.handle('nothing', {})[0] == 404
+    assert svc.handle('pillars', {})[0] == 400
+    status, _ = svc.handle('evaluate', {'setup': 'dam_setup',
+                                        'levels': [275],
+                                        'pillars': ['Pilar 99']})
+    assert status == 400
+
+def test_other_errors(svc, monkeypatch):
+    def fail(request):
+        raise RuntimeError('geometry')
+    monkeypatch.setitem(svc.endpoints, 'pillars', fail)
+    assert svc.handle('pillars', {'setup': 'dam_setup'}) == \
+        (500, {'error': 'RuntimeError: geometry'})
+
+def test_build_error_reaches_all_waiters(monkeypatch):
+    models = service.Models(['dam_setup'])
+    started = threading.Event()
+    release = threading.Event()
+    
+    def build(p):
+        started.set()
+        release.wait()
+        raise RuntimeError('build failed')
+    monkeypatch.setattr(response, 'LevelResponse', build)
+    
+    errors = []
+    def request():
+        try:
+            models.response('dam_setup', 'Pilar 1')
+        except RuntimeError as e:
+            errors.append(str(e))
+    threads = [threading.Thread(target = request) for i in range(4)]
+    threads[0].start()
+    started.wait()
+    for t in threads[1:]:
+        t.start()
+    release.set()
+    for t in threads:
+        t.join()
+    assert errors == ['build failed'] * 4
+    assert not models.building and not models.responses
+
+def test_sweep_matches_level_response(svc):
+    levels = [274.5, 275.5, 276.5]
+    status, result = svc.handle('sweep', {'setup': 'dam_setup',
+                                          'pillars': ['Pilar 20'],
+                                          'levels': levels, 'ice': 50})
+    assert status == 200
+    p = svc.models.pillar('dam_setup', 'Pilar 20')
+    gl = response.LevelResponse(p).coefficients(levels, 50)[0]
+    assert result['pillars']['Pilar 20']['glidning'] == pytest.approx(gl)
+
+def test_cold_pillar_does_not_delay_batch(monkeypatch):
+    models = service.Models(['dam_setup'])
+    batcher = service.Batcher(models)
+    models.response('dam_setup', 'Pilar 1')
+    release = threading.Event()
+    build = response.LevelResponse
+    
+    def slow(p):
+        release.wait(10)
+        return build(p)
+    monkeypatch.setattr(response, 'LevelResponse', slow)
+    cold = threading.Thread(target = batcher.submit,
+                            args = ('dam_setup', 'Pilar 2', [275]))
+    cold.start()
+    #the query of the built pillar is answered while the other one builds
+    future = batcher.submit('dam_setup', 'Pilar 1', [275, 276])
+    assert len(future.result(timeout = 5)[0]) == 2
+    assert cold.is_alive()
+    release.set()
+    cold.join()
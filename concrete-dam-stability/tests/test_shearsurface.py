@@ -0,0 +1,16 @@
+import pytest
+
+import shearsurface, stability, dam
+
+def test_contact_plane_is_a_candidate(pillars):
+    #the governing plane is at most as stable as the contact plane
+    p = pillars[19]
+    s = shearsurface.ShearSurfaceSearch(p, 276, ice = 100).search()
+    gl = stability.Stability(dam.Dam([p]), 276, 100).glidning()[0]
+    assert s['glidning'] <= gl + 1e-9
+    assert s['evaluated'] <= s['candidates']
+
+def test_no_valid_plane(pillars):
+    #water level below the contact points
+    with pytest.raises(ValueError, match = 'No valid shear surface'):
+        shearsurface.ShearSurfaceSearch(pillars[19], 250).search()
@@ -0,0 +1,58 @@
+import json
+import pytest
+
+import snapshot, evaluation, jobs, dam
+
+@pytest.fixture
+def written(tmp_path, pillars):
+    d = dam.Dam([pillars[0], pillars[7], pillars[19]])
+    return d, snapshot.write(d, str(tmp_path / 'dam.damsnap'))
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_read_equals_prepared_dam(written, cases, mmap):
+    d, file_name = written
+    snap = snapshot.read(file_name, mmap)
+    assert snap.is_current(d)
+    for p, q in zip(d.pillars, snap.dam.pillars):
+        assert (q.name, q.contact_l, q.contact_r, q.phi, q.dam_type) == \
+            (p.name, p.contact_l, p.contact_r, p.phi, p.dam_type)
+        for key in snapshot.PREPARED:
+            a, b = p._cache[key], q._cache[key]
+            if key[0] == 'segments_above':
+                assert [(s.name, s.axis, s.width) for s in a] == \
+                    [(s.name, s.axis, s.width) for s in b]
+                assert all(s.poly.equals(t.poly) for s, t in zip(a, b))
+            elif hasattr(a, 'equals'):
+                assert a.equals(b), key
+            else:
+                assert a == pytest.approx(b), key
+    #no geometry is calculated again, results are identical
+    assert set(snap.dam.pillars[0]._cache) == set(map(tuple,
+                                                      snapshot.PREPARED))
+    a = evaluation.Evaluation(d, cases)
+    b = evaluation.Evaluation(snap.dam, cases)
+    assert a.glidning() + a.velting() == b.glidning() + b.velting()
+
+def test_changed_inputs_and_invalid_files(written, tmp_path):
+    d, file_name = written
+    d.pillars[0].contact_l += 0.01
+    assert not snapshot.read(file_name).is_current(d)
+    
+    other = tmp_path / 'other.damsnap'
+    other.write_bytes(b'something else')
+    with pytest.raises(ValueError, match = 'not a snapshot'):
+        snapshot.read(str(other))
+    
+    data = (tmp_path / 'dam.damsnap').read_bytes()
+    length = int.from_bytes(data[8:16], 'little')
+    header = json.loads(data[16:16 + length])
+    header['version'] = snapshot.VERSION + 1
+    new = json.dumps(header, separators = (',', ':')).encode('utf-8')
+    other.write_bytes(data[:16] + new.ljust(length) + data[16 + length:])
+    with pytest.raises(ValueError, match = 'not supported'):
+        snapshot.read(str(other))
+
+def test_snapshot_as_job_setup(written):
+    d, file_name = written
+    pillars = jobs.setup_dam(file_name)
+    assert list(pillars) == [p.name for p in d.pillars]
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+import dam, stability, surrogate
+
+DOMAIN = {'level': (274.5, 276.5), 'ice': (0, 100), 'uplift': (0.5, 1)}
+
+def test_exact_matches_stability(pillars):
+    p = pillars[19]
+    out = surrogate.exact(p, [275, 276], ice = 50, uplift = 0.8)
+    for i, level in enumerate([275, 276]):
+        stab = stability.Stability(dam.Dam([p]), level, 50, 0.8)
+        assert out['glidning'][i] == pytest.approx(stab.glidning()[0],
+                                                   rel = 1e-10)
+        assert out['velting_resultant'][i] == pytest.approx(
+            stab.velting_resultant()[0], rel = 1e-10
+            )
+
+@pytest.fixture(scope = 'module')
+def model():
+    import dam_setup
+    return surrogate.Surrogate(dam_setup.dam_construction.pillars[19], DOMAIN,
+                               validation = 200)
+
+def test_prediction_within_error_bound(model):
+    rng = np.random.default_rng(1)
+    n = 50
+    level = rng.uniform(*DOMAIN['level'], n)
+    ice = rng.uniform(*DOMAIN['ice'], n)
+    uplift = rng.uniform(*DOMAIN['uplift'], n)
+    pred = model.predict(level, ice, uplift)
+    ref = surrogate.exact(model.pillar, level, ice, uplift)
+    assert not pred['exact'].any()
+    for key in surrogate.OUTPUTS:
+        err = np.abs(pred[key] - ref[key])
+        #the bound is the largest error at the validation points
+        assert err.max() <= 2 * model.errors[key][0] + 1e-9
+        assert err.max() < 1e-2
+
+def test_outside_box_is_exact(model):
+    pred = model.predict([273, 275], ice = 100, uplift = 1.5)
+    ref = surrogate.exact(model.pillar, [273, 275], 100, 1.5)
+    assert pred['exact'].all()
+    for key in surrogate.OUTPUTS:
+        np.testing.assert_allclose(pred[key], ref[key], rtol = 1e-12)
+
+def test_domain_requires_level(pillars):
+    with pytest.raises(ValueError):
+        surrogate.Surrogate(pillars[0], {'ice': (0, 100)})
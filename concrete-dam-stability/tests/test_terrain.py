@@ -0,0 +1,104 @@
+import os
+import time
+import numpy as np
+import pytest
+
+import terrain
+
+def surface(x, y):
+    #plane: bilinear interpolation is exact
+    return 262 + 0.02 * (x - 1000) - 0.01 * (y - 5000)
+
+def write_grid(file_name, nrows = 40, ncols = 50, cellsize = 0.5,
+               nodata = ()):
+    x0, y0 = 1000., 5000.
+    xs = x0 + cellsize / 2 + np.arange(ncols) * cellsize
+    with open(file_name, 'w') as f:
+        f.write(f'ncols {ncols}\nnrows {nrows}\nxllcorner {x0}\n'
+                f'yllcorner {y0}\ncellsize {cellsize}\nNODATA_value -9999\n')
+        for i in range(nrows):
+            y = y0 + cellsize / 2 + (nrows - 1 - i) * cellsize
+            z = surface(xs, y)
+            for r, c in nodata:
+                if r == i:
+                    z[c] = -9999
+            f.write(' '.join(f'{v:.6f}' for v in z) + '\n')
+
+@pytest.fixture
+def grid(tmp_path):
+    file_name = str(tmp_path / 'rock.asc')
+    write_grid(file_name, nodata = [(0, 0)])
+    return file_name
+
+def test_bilinear_sampling(grid):
+    t = terrain.read(grid)
+    assert isinstance(t.values, np.memmap)
+    rng = np.random.default_rng(0)
+    x = rng.uniform(1000.3, 1024.7, 1000)
+    y = rng.uniform(5000.3, 5019, 1000)
+    np.testing.assert_allclose(t.sample(x, y), surface(x, y), atol = 1e-4)
+    #single cell: bilinear between the four cell centers
+    v = t.values
+    z = t.sample(1000.25 + 0.5 * 0.3, 5000.25 + 0.5 * 0.6)
+    expected = (0.4 * (0.7 * v[-1, 0] + 0.3 * v[-1, 1])
+                + 0.6 * (0.7 * v[-2, 0] + 0.3 * v[-2, 1]))
+    assert float(z) == pytest.approx(float(expected), rel = 1e-12)
+
+def test_outside_and_nodata_are_nan(grid):
+    t = terrain.read(grid)
+    z = t.sample([999.0, 1026, 1010, 1000.1], [5010, 5010, 5020.5, 5019.9])
+    assert np.isnan(z).all()
+    #within half a cell of the edge: the edge value
+    assert t.sample(1024.9, 5010) == pytest.approx(surface(1024.75, 5010),
+                                                   abs = 1e-4)
+
+def test_cache_is_reused_and_refreshed(grid):
+    terrain.read(grid)
+    cache = grid + terrain.SUFFIX
+    mtime = os.path.getmtime(cache)
+    terrain.read(grid)
+    assert os.path.getmtime(cache) == mtime
+    time.sleep(0.01)
+    write_grid(grid, nrows = 20)
+    assert terrain.read(grid).nrows == 20
+
+def test_value_count_is_checked(tmp_path):
+    file_name = str(tmp_path / 'short.asc')
+    write_grid(file_name)
+    with open(file_name) as f:
+        lines = f.readlines()
+    with open(file_name, 'w') as f:
+        f.writelines(lines[:-1])
+    with pytest.raises(ValueError):
+        terrain.read(file_name)
+
+def test_raw_grid(tmp_path):
+    values = np.arange(12, dtype = '<f4').reshape(3, 4)
+    file_name = str(tmp_path / 'rock.raw')
+    values.tofile(file_name)
+    t = terrain.read_raw(file_name, 3, 4, 0, 0, 1)
+    #south-western cell center is the last row
+    assert float(t.sample(0, 0)) == 8
+    assert float(t.sample(1.5, 2)) == pytest.approx(1.5)
+
+def test_footprint_downstream_is_right_of_axis():
+    axis = [(0, 0), (0, 10), (10, 10)]
+    x, y = terrain.footprint(axis, [5, 15], [2, -3])
+    np.testing.assert_allclose(x, [2, 5])
+    np.testing.assert_allclose(y, [5, 13])
+
+def test_set_contacts(tmp_path, pillars):
+    file_name = str(tmp_path / 'rock.asc')
+    write_grid(file_name, ncols = 100)
+    t = terrain.read(file_name)
+    ps = pillars[:3]
+    axis = [(1025, 5002), (1025, 5018)]
+    z_l, z_r = terrain.set_contacts(t, ps, axis, -10, 5)
+    for p, l, r in zip(ps, z_l, z_r):
+        station = np.mean([s.axis for s in p.segments])
+        assert (p.contact_l, p.contact_r) == (l, r)
+        #sampled at the contact points of the profile
+        assert l == pytest.approx(
+            surface(1025 + p.left_contact().x, 5002 + station), abs = 1e-4)
+        assert r == pytest.approx(
+            surface(1025 + p.right_contact().x, 5002 + station), abs = 1e-4)
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import timeseries, stability, runcontext, dam
+
+@pytest.fixture
+def series(tmp_path):
+    #levels rising above and falling below the threshold of pillar 19
+    levels = np.concatenate([np.linspace(275, 277.5, 40),
+                             np.linspace(277.5, 275, 40)] * 2)
+    file_name = str(tmp_path / 'levels.csv')
+    pd.DataFrame({'time': np.arange(len(levels)),
+                  'level': levels}).to_csv(file_name, index = False)
+    return file_name, levels
+
+@pytest.fixture
+def context(tmp_path):
+    context = runcontext.RunContext(str(tmp_path))
+    context.messages = []
+    context.info = context.messages.append
+    return context
+
+def test_chunks_equal_whole_series(tmp_path, series, pillars, context):
+    file_name, levels = series
+    d = dam.Dam(pillars[18:])
+    results = []
+    for chunksize in (7, 1000):
+        ts = timeseries.TimeSeries(d, ice = 50, chunksize = chunksize,
+                                   context = context)
+        out = str(tmp_path / f'out{chunksize}.csv')
+        results.append((ts.run(file_name, out), pd.read_csv(out)))
+    pd.testing.assert_frame_equal(results[0][0], results[1][0])
+    pd.testing.assert_frame_equal(results[0][1], results[1][1])
+    
+    stats, out = results[0]
+    assert len(out) == len(levels)
+    assert (stats['Antall'] == len(levels)).all()
+    
+    #coefficients of the rounded levels
+    level = round(levels[10], 2)
+    stab = stability.Stability(d, level, 50)
+    assert out.loc[10, 'Pilar 19: Glidning'] == \
+        pytest.approx(stab.glidning()[0])
+    
+    #exceedance events continue across chunks
+    fail = (out['Pilar 20: Glidning'] < 1.5).to_numpy()
+    events = int((np.diff(fail.astype(int)) == 1).sum() + fail[0])
+    row = stats[(stats['Damseksjon'] == 'Pilar 20')
+                & (stats['Sikkerhet mot'] == 'Glidning')].iloc[0]
+    assert row['Hendelser'] == events
+
+def test_cache_is_bounded(series, pillars, context, tmp_path):
+    file_name, levels = series
+    ts = timeseries.TimeSeries(dam.Dam(pillars[19:]), cache_size = 5,
+                               context = context)
+    ts.run(file_name, str(tmp_path / 'out.csv'))
+    assert len(ts._cache) == 5
+    #the least recently used levels are dropped (levels are calculated in
+    #ascending order per chunk)
+    assert list(ts._cache) == sorted(ts._cache)
+    assert max(ts._cache) == pytest.approx(levels.max())
+
+def test_empty_series(tmp_path, pillars, context):
+    file_name = str(tmp_path / 'empty.csv')
+    pd.DataFrame({'time': [], 'level': []}).to_csv(file_name, index = False)
+    out = tmp_path / 'out.csv'
+    stats = timeseries.TimeSeries(dam.Dam(pillars[19:]), context = context) \
+        .run(file_name, str(out))
+    assert stats.empty
+    assert not out.exists()
+    assert context.messages == [f'No records in time series ({file_name})']
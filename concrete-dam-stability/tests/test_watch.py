@@ -0,0 +1,57 @@
+import sys
+import time
+import pytest
+
+import runcontext, watch
+
+SETUP = '''import copy, dam, dam_setup
+pillars = copy.deepcopy(dam_setup.dam_construction.pillars[:{n}])
+if {contact} is not None:
+    pillars[1].contact_l = {contact}
+    pillars[1].clear_cache()
+dam_construction = dam.Dam(pillars)
+cases = dam_setup.cases
+'''
+
+@pytest.fixture
+def watcher(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, 'watch_setup', raising = False)
+    module = tmp_path / 'watch_setup.py'
+    
+    def write(n = 3, contact = None):
+        module.write_text(SETUP.format(n = n, contact = contact))
+        time.sleep(0.01)
+    
+    write()
+    w = watch.Watcher('watch_setup', targets = ('export', ),
+                      context = runcontext.RunContext(str(tmp_path / 'out')))
+    w.messages = []
+    w.context.info = w.messages.append
+    w.write = write
+    return w
+
+def test_errors_keep_watching_and_failed_pillars_are_retried(watcher):
+    assert watcher.update() == ['Pilar 1', 'Pilar 2', 'Pilar 3']
+    #geometry that imports but cannot be evaluated (no contact point)
+    watcher.write(contact = 290)
+    assert watcher.update() == []
+    assert any(m.startswith('Evaluation failed') for m in watcher.messages)
+    watcher.write(contact = 259)
+    assert watcher.update() == ['Pilar 2']
+
+def test_model_errors_are_reported(watcher):
+    watcher.update()
+    watcher.write(contact = 'syntax error(')
+    assert watcher.update() == []
+    assert watcher.messages[-1].startswith('Model not loaded')
+
+def test_outputs_refreshed_after_removed_pillar(watcher):
+    watcher.update()
+    watcher.messages.clear()
+    watcher.write(n = 2)
+    assert watcher.update() == []
+    assert any(m.startswith('Export finished') for m in watcher.messages)
+    watcher.messages.clear()
+    assert watcher.update() == []
+    assert not any(m.startswith('Export') for m in watcher.messages)
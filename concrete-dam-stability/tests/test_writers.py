@@ -0,0 +1,42 @@
+import csv
+import asyncio
+
+from openpyxl import load_workbook
+
+import evaluation, writers, runcontext, dam
+
+def test_iter_pillars_matches_overview(pillars, cases):
+    ev = evaluation.Evaluation(dam.Dam(pillars[17:]), cases)
+    records = list(ev.iter_pillars())
+    assert [r['pillar'] for r in records] == [p.name for p in pillars[17:]]
+    assert evaluation.merge_records(records) == ev.glidning() + ev.velting()
+
+def test_aiter_pillars_in_pillar_order(pillars, cases):
+    ev = evaluation.Evaluation(dam.Dam(pillars[12:]), cases)
+    
+    async def collect():
+        return [r async for r in ev.aiter_pillars(max_pending = 3)]
+    
+    records = asyncio.run(collect())
+    assert records == list(ev.iter_pillars())
+
+def test_writers(tmp_path, pillars, cases):
+    ev = evaluation.Evaluation(dam.Dam(pillars[17:]), cases)
+    context = runcontext.RunContext(str(tmp_path))
+    csv_name, xlsx_name = str(tmp_path / 'a.csv'), str(tmp_path / 'a.xlsx')
+    with writers.CsvWriter(csv_name, context) as c, \
+            writers.ExcelWriter(xlsx_name, context) as x:
+        names = [r['pillar'] for r in
+                 writers.write_records(ev.iter_pillars(), [c, x])]
+    assert names == [p.name for p in pillars[17:]]
+    
+    rows = evaluation.merge_records(list(ev.iter_pillars()))
+    with open(csv_name, encoding = 'utf-8') as f:
+        lines = list(csv.reader(f, delimiter = ';'))
+    assert lines[0] == list(evaluation.HEADER)
+    assert len(lines) == len(rows) + 1
+    
+    sheet = load_workbook(xlsx_name).active
+    values = list(sheet.values)
+    assert list(values[0]) == list(evaluation.HEADER)
+    assert sorted(map(str, values[1:])) == sorted(str(tuple(r)) for r in rows)
@@ -0,0 +1,323 @@
+import evaluation, loadcase, stability, response, runcontext
+
+import math
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+class TimeSeries:
+    """
+    Stability of every pillar for a series of water levels, e.g. decades of
+    hourly reservoir records. The series is read and written in chunks, so
+    memory use does not depend on the length of the series. Water levels are
+    rounded to a given resolution and the coefficients of recently used
+    levels are kept in a cache of bounded size; the level-independent geometry (contacts, cutting
+    surface, segments above the cutting surface) is cached by the pillars.
+    Alternatively, the precomputed level response of every pillar (see
+    response.py) is used, which evaluates every record exactly without
+    rounding.
+    """
+    
+    def __init__(self, dam, ice = 0, uplift = 1, threshold_class = 'normal',
+                 thresholds = None, resolution = 0.01, chunksize = 10000,
+                 time_col = 'time', level_col = 'level', precomputed = False,
+                 cache_size = 10000, context = None):
+        """
+        Parameters
+        ----------
+        dam : instance of Dam
+        ice : float, optional
+            Ice load; the default is 0,
+            unit: kN/m
+        uplift : float, optional
+            Uplift factor; the default is 1
+        threshold_class : string, optional
+            Threshold class used for the exceedance statistics,
+            'normal' or 'ulykke'; the default is 'normal'
+        thresholds : dict, optional
+            Threshold values, see evaluation.THRESHOLDS
+        resolution : positive float, optional
+            Water levels are rounded to this resolution; the default is 0.01,
+            unit: m
+        chunksize : positive int, optional
+            Number of records per chunk; the default is 10000
+        time_col, level_col : string, optional
+            Names of the time and water level columns of the input file;
+            the defaults are 'time' and 'level'
+        precomputed : bool, optional
+            Evaluate with the precomputed level response of the pillars
+            instead of the load classes; the default is False
+        cache_size : positive int, optional
+            Largest number of rounded water levels whose coefficients are
+            kept (least recently used levels are dropped); the default is
+            10000, i.e. a level range of 100 m at a resolution of 0.01 m
+        context : instance of RunContext, optional
+            Run context of the progress messages
+        
+        Returns
+        -------
+        None.
+        
+        """
+        self.dam = dam
+        self.case = loadcase.LoadCase(
+            'Tidsserie', None, ice, uplift, threshold_class
+            )
+        self.evaluation = evaluation.Evaluation(dam, [self.case], thresholds)
+        self.resolution = resolution
+        self.chunksize = chunksize
+        self.time_col = time_col
+        self.level_col = level_col
+        self.columns = []
+        for p in dam.pillars:
+            self.columns += [f'{p.name}: Glidning', f'{p.name}: Velting']
+        self._cache = OrderedDict()
+        self.cache_size = cache_size
+        self._stats = {}
+        if context is None:
+            context = runcontext.RunContext()
+        self.context = context
+        if precomputed:
+            self.responses = response.build(dam)
+        else:
+            self.responses = None
+    
+    def read(self, file_name):
+        """
+        Read a water level series (csv or parquet) chunk by chunk
+        
+        Yields
+        ------
+        pandas.DataFrame
+            Chunk with the time and water level column
+        """
+        cols = [self.time_col, self.level_col]
+        if file_name.endswith('.parquet'):
+            if pq is None:
+                raise ImportError('Reading parquet files requires pyarrow')
+            pfile = pq.ParquetFile(file_name)
+            for batch in pfile.iter_batches(self.chunksize, columns = cols):
+                yield batch.to_pandas()
+        else:
+            for chunk in pd.read_csv(file_name, usecols = cols,
+                                     chunksize = self.chunksize):
+                yield chunk
+    
+    def factors(self, level):
+        """
+        Parameters
+        ----------
+        level : float
+            Water level (rounded to the resolution)
+        
+        Returns
+        -------
+        tuple
+            Stability coefficients and margins to the thresholds (see
+            Evaluation.glidning_margin/ velting_margin), ordered as
+            self.columns
+        """
+        if level in self._cache:
+            self._cache.move_to_end(level)
+            return self._cache[level]
+        if math.isnan(level):
+            nans = [math.nan] * len(self.columns)
+            return nans, nans
+        
+        case, ev = self.case, self.evaluation
+        stab = stability.Stability(
+            self.dam, level, self.case.ice, self.case.uplift
+            )
+        gl, vm, vr = stab.glidning(), stab.velting_moment(), \
+            stab.velting_resultant()
+        
+        coeffs, margins = [], []
+        for p, gl_i, vm_i, vr_i in zip(self.dam.pillars, gl, vm, vr):
+            coeffs.append(gl_i)
+            margins.append(ev.glidning_margin(case, p, gl_i))
+            if p.dam_type.startswith('Gr'):
+                coeffs.append(vr_i)
+            else:
+                coeffs.append(vm_i)
+            margins.append(ev.velting_margin(case, p, vm_i, vr_i))
+        
+        self._cache[level] = coeffs, margins
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last = False)
+        return coeffs, margins
+    
+    def response_factors(self, levels):
+        """
+        Parameters
+        ----------
+        levels : numpy.ndarray
+            Water levels
+        
+        Returns
+        -------
+        tuple
+            Arrays of stability coefficients and margins (see factors()),
+            calculated with the level responses of the pillars
+        """
+        case, ev = self.case, self.evaluation
+        coeffs, margins = [], []
+        for r, p in zip(self.responses, self.dam.pillars):
+            gl, vm, vr = r.coefficients(levels, case.ice, case.uplift)
+            coeffs.append(gl)
+            margins.append(ev.glidning_margin(case, p, gl))
+            if p.dam_type.startswith('Gr'):
+                coeffs.append(vr)
+            else:
+                coeffs.append(vm)
+            margins.append(ev.velting_margin(case, p, vm, vr))
+        return np.column_stack(coeffs), np.column_stack(margins)
+    
+    def evaluate(self, chunk):
+        """
+        Calculate the stability coefficients of a chunk and update the
+        exceedance statistics
+        
+        Parameters
+        ----------
+        chunk : pandas.DataFrame
+            Chunk with the time and water level column
+        
+        Returns
+        -------
+        pandas.DataFrame
+            Time, water level and one column of stability coefficients per
+            pillar and failure mode
+        """
+        levels = chunk[self.level_col].to_numpy(dtype = float)
+        
+        if self.responses is not None:
+            coeffs, margins = self.response_factors(levels)
+        else:
+            rounded = np.round(levels / self.resolution) * self.resolution
+            uniques, inverse = np.unique(rounded, return_inverse = True)
+            coeffs, margins = [], []
+            for level in uniques:
+                c, m = self.factors(float(level))
+                coeffs.append(c)
+                margins.append(m)
+            coeffs = np.array(coeffs)[inverse]
+            margins = np.array(margins)[inverse]
+        
+        times = chunk[self.time_col].to_numpy()
+        self.update_stats(times, coeffs, margins)
+        
+        result = pd.DataFrame(coeffs, columns = self.columns)
+        result.insert(0, self.level_col, levels)
+        result.insert(0, self.time_col, times)
+        return result
+    
+    def update_stats(self, times, coeffs, margins):
+        #streaming statistics per column: minimum, mean, share of records
+        #that do not meet the threshold, number and length (records) of
+        #exceedance events; events may continue across chunks
+        for idx, col in enumerate(self.columns):
+            c, fail = coeffs[:, idx], margins[:, idx] < 0
+            valid = ~np.isnan(c)
+            st = self._stats.setdefault(
+                col, {'n': 0, 'sum': 0., 'min': math.inf, 'time_min': None,
+                      'fail': 0, 'events': 0, 'run': 0, 'longest': 0}
+                )
+            if valid.any():
+                i_min = np.nanargmin(c)
+                if c[i_min] < st['min']:
+                    st['min'], st['time_min'] = c[i_min], times[i_min]
+            st['n'] += int(valid.sum())
+            st['sum'] += float(c[valid].sum())
+            st['fail'] += int(fail.sum())
+            
+            #run lengths of consecutive exceedances, a run at the start
+            #of the chunk continues the run at the end of the last chunk
+            edges = np.diff(np.concatenate(([0], fail.astype(int), [0])))
+            starts = np.flatnonzero(edges == 1)
+            lengths = np.flatnonzero(edges == -1) - starts
+            if len(lengths) == 0:
+                st['run'] = 0
+                continue
+            if st['run'] > 0 and starts[0] == 0:
+                lengths[0] += st['run']
+                st['events'] += len(lengths) - 1
+            else:
+                st['events'] += len(lengths)
+            st['longest'] = max(st['longest'], int(lengths.max()))
+            if fail[-1]:
+                st['run'] = int(lengths[-1])
+            else:
+                st['run'] = 0
+    
+    def statistics(self):
+        """
+        Returns
+        -------
+        pandas.DataFrame
+            Exceedance statistics per pillar and failure mode
+        """
+        rows = []
+        for col in self.columns:
+            st = self._stats.get(col)
+            if st is None or st['n'] == 0:
+                continue
+            pillar, mode = col.split(': ')
+            rows.append([pillar, mode, st['n'], round(st['min'], 3),
+                         st['time_min'], round(st['sum'] / st['n'], 3),
+                         round(st['fail'] / st['n'], 5), st['events'],
+                         st['longest']])
+        return pd.DataFrame(rows, columns = [
+            'Damseksjon', 'Sikkerhet mot', 'Antall', 'Minimum',
+            'Tidspunkt minimum', 'Middel', 'Andel ikke ok', 'Hendelser',
+            'Lengste hendelse'
+            ])
+    
+    def run(self, file_name, out_file):
+        """
+        Evaluate a water level series chunk by chunk and write the
+        stability coefficients (csv or parquet, by file extension)
+        
+        Parameters
+        ----------
+        file_name : string
+            Water level series (csv or parquet)
+        out_file : string
+            Output file of the stability coefficients
+        
+        Returns
+        -------
+        pandas.DataFrame
+            Exceedance statistics, see statistics(); no output file is
+            written if the series has no records
+        """
+        self._stats = {}
+        writer = None
+        first = True
+        for chunk in self.read(file_name):
+            if chunk.empty:
+                continue
+            result = self.evaluate(chunk)
+            if out_file.endswith('.parquet'):
+                if pq is None:
+                    raise ImportError('Writing parquet files requires pyarrow')
+                table = pa.Table.from_pandas(result, preserve_index = False)
+                if writer is None:
+                    writer = pq.ParquetWriter(out_file, table.schema)
+                writer.write_table(table)
+            else:
+                result.to_csv(out_file, mode = 'w' if first else 'a',
+                              header = first, index = False)
+            first = False
+        if writer is not None:
+            writer.close()
+        if first:
+            self.context.info(f'No records in time series ({file_name})')
+        else:
+            self.context.info(f'Time series written to file ({out_file})')
+        return self.statistics()
@@ -0,0 +1,207 @@
+import pipeline, manifest, runcontext
+
+import os
+import sys
+import time
+import importlib
+import importlib.util
+
+class Watcher:
+    """
+    Watch mode: the model files (the setup module with the dam and its load
+    cases, dam_construction and cases) are polled for changes; a burst of
+    saves is handled as one change once the files have not changed for
+    the debounce time. After a change, the setup module is reloaded and only
+    the pillars whose inputs have changed (see manifest.pillar_fingerprint)
+    are evaluated again, their factors are printed right away; then the
+    outputs are refreshed with the pipeline, which only regenerates stale
+    outputs (see pipeline.Pipeline and manifest.py) and reuses the records
+    of the unchanged pillars.
+    """
+    
+    def __init__(self, setup = 'dam_setup', files = (), targets = ('report',
+                 'export'), context = None, interval = 0.5, debounce = 1.0,
+                 workers = None):
+        """
+        Parameters
+        ----------
+        setup : string, optional
+            Name of the setup module; the default is 'dam_setup'
+        files : list, optional
+            Further files that are watched, e.g. data read by the setup
+            module; the file of the setup module is always watched
+        targets : tuple, optional
+            Outputs refreshed after a change, see Pipeline.run; the default
+            is ('report', 'export'), no outputs: ()
+        context : instance of RunContext, optional
+            Output root and logger; the default is RunContext('..')
+        interval : positive float, optional
+            Time between two polls of the files; the default is 0.5,
+            unit: s
+        debounce : positive float, optional
+            Time the files must be unchanged before they are loaded; the
+            default is 1.0,
+            unit: s
+        workers : positive int, optional
+            Number of pillars evaluated at the same time, see Graph.run
+        
+        Returns
+        -------
+        None.
+        
+        """
+        self.setup = setup
+        self.module = importlib.import_module(setup)
+        self.files = [self.module.__file__] + list(files)
+        self.targets = list(targets)
+        if context is None:
+            context = runcontext.RunContext('..')
+        self.context = context
+        self.interval = interval
+        self.debounce = debounce
+        self.workers = workers
+        self.fingerprints = {}
+        self.records = {}
+        self.order = None
+        self.updates = 0
+    
+    def mtimes(self):
+        #modification times of the watched files (None if missing)
+        return {f: os.path.getmtime(f) if os.path.exists(f) else None
+                for f in self.files}
+    
+    def load(self):
+        #reload the setup module, returns the dam and the load cases; the
+        #cached bytecode is removed, it may be stale for saves within the
+        #same second
+        cached = importlib.util.cache_from_source(self.module.__file__)
+        if os.path.exists(cached):
+            os.remove(cached)
+        self.module = importlib.reload(self.module)
+        return self.module.dam_construction, self.module.cases
+    
+    def fingerprint(self, dam, cases):
+        #fingerprint of the inputs of every pillar (and the load cases)
+        cases_fp = [manifest.case_fingerprint(c) for c in cases]
+        return {p.name: manifest.digest(manifest.pillar_fingerprint(p),
+                                        cases_fp) for p in dam.pillars}
+    
+    def changed(self, dam, cases):
+        """
+        Returns
+        -------
+        list
+            Pillars of dam whose inputs (or the load cases) have changed
+            since they were last evaluated successfully, or that are new
+        """
+        fingerprints = self.fingerprint(dam, cases)
+        return [p for p in dam.pillars
+                if self.fingerprints.get(p.name) != fingerprints[p.name]]
+    
+    def update(self):
+        """
+        Reload the model, evaluate the changed pillars and refresh the
+        outputs; errors in the model (e.g. a file saved while editing, or
+        geometry that cannot be evaluated) are reported and the watcher
+        keeps running. Pillars that failed are evaluated again at the next
+        update.
+        
+        Returns
+        -------
+        list
+            Names of the pillars that were evaluated again
+        """
+        start = time.time()
+        try:
+            dam, cases = self.load()
+            fingerprints = self.fingerprint(dam, cases)
+        except Exception as e:
+            self.context.info(f'Model not loaded: {type(e).__name__}: {e}')
+            return []
+        changed = self.changed(dam, cases)
+        names = [p.name for p in dam.pillars]
+        self.records = {k: v for k, v in self.records.items() if k in names}
+        self.fingerprints = {k: v for k, v in self.fingerprints.items()
+                             if k in names}
+        
+        pipe = pipeline.Pipeline(dam, cases, self.context)
+        changed_names = {p.name for p in changed}
+        for p in dam.pillars:
+            if p.name not in changed_names and p.name in self.records:
+                pipe.graph.value(('record', p.name), self.records[p.name])
+        keys = [pipe.record(p) for p in changed]
+        failed = False
+        try:
+            pipe.graph.run(keys, self.workers)
+        except Exception as e:
+            failed = True
+            self.context.info(f'Evaluation failed: {type(e).__name__}: {e}')
+        #only pillars that were evaluated are up to date (the graph keeps
+        #the results that were calculated before an error)
+        evaluated = []
+        for p, key in zip(changed, keys):
+            if key in pipe.graph.results:
+                record = pipe.graph.results[key]
+                self.records[p.name] = record
+                self.fingerprints[p.name] = fingerprints[p.name]
+                self.print_record(record)
+                evaluated.append(p.name)
+        self.context.info(f'{len(evaluated)} of {len(dam.pillars)} pillars '
+                          f'evaluated ({round(time.time() - start, 2)} s)')
+        
+        #outputs are refreshed after changes, and when pillars are removed
+        #or reordered
+        if not failed and self.targets and (evaluated or names != self.order):
+            try:
+                for message in pipe.run(*self.targets,
+                                        workers = self.workers):
+                    self.context.info(message)
+                self.order = names
+            except Exception as e:
+                self.context.info(f'Outputs not refreshed: '
+                                  f'{type(e).__name__}: {e}')
+                #refreshed again at the next update
+                self.order = None
+        self.updates += 1
+        return evaluated
+    
+    def print_record(self, record):
+        #updated factors of a pillar, one line per load case and mode
+        for rows in zip(record['glidning'], record['velting']):
+            for mode, case, name, coeff, threshold, result in rows:
+                self.context.info(f'{name}, {case}: {mode} {coeff} '
+                                  f'(krav {threshold}) - {result}')
+    
+    def watch(self, max_updates = None):
+        """
+        Evaluate the model and watch its files until interrupted (or
+        max_updates updates)
+        
+        Returns
+        -------
+        None.
+        
+        """
+        self.update()
+        last = self.mtimes()
+        self.context.info(f"Watching {', '.join(self.files)}")
+        try:
+            while max_updates is None or self.updates < max_updates:
+                time.sleep(self.interval)
+                current = self.mtimes()
+                if current == last:
+                    continue
+                #debounce: wait until the files are unchanged
+                while True:
+                    last = current
+                    time.sleep(self.debounce)
+                    current = self.mtimes()
+                    if current == last:
+                        break
+                self.update()
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == '__main__':
+    #watch mode: python watch.py [setup]
+    Watcher(sys.argv[1] if len(sys.argv) > 1 else 'dam_setup').watch()
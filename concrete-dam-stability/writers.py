@@ -0,0 +1,125 @@
+import evaluation, runcontext
+import csv
+
+from openpyxl import Workbook
+
+class CsvWriter:
+    """
+    Write result records (see Evaluation.iter_pillars) to a csv file;
+    every record is written as soon as it is received
+    """
+    
+    def __init__(self, file_name, context = None):
+        """
+        Parameters
+        ----------
+        file_name : string
+            Path of the csv file
+        context : instance of RunContext, optional
+            Run context of the progress messages
+        
+        Returns
+        -------
+        None.
+        
+        """
+        self.file_name = file_name
+        if context is None:
+            context = runcontext.RunContext()
+        self.context = context
+        self.file = open(file_name, 'w', newline = '', encoding = 'utf-8')
+        self.writer = csv.writer(self.file, delimiter = ';')
+        self.writer.writerow(evaluation.HEADER)
+    
+    def write(self, record):
+        self.writer.writerows(record['glidning'] + record['velting'])
+        self.file.flush()
+    
+    def close(self):
+        self.file.close()
+        self.context.info(
+            f'Evaluation written to csv file ({self.file_name})'
+            )
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+
+class ExcelWriter:
+    """
+    Write result records (see Evaluation.iter_pillars) to an Excel file;
+    the workbook is opened in write-only mode, i.e. rows are streamed and
+    not kept in memory
+    """
+    
+    def __init__(self, file_name, context = None):
+        """
+        Parameters
+        ----------
+        file_name : string
+            Path of the Excel file
+        context : instance of RunContext, optional
+            Run context of the progress messages
+        
+        Returns
+        -------
+        None.
+        
+        """
+        self.file_name = file_name
+        if context is None:
+            context = runcontext.RunContext()
+        self.context = context
+        self.workbook = Workbook(write_only = True)
+        self.sheet = self.workbook.create_sheet()
+        self.sheet.append(evaluation.HEADER)
+    
+    def write(self, record):
+        for row in record['glidning'] + record['velting']:
+            self.sheet.append(row)
+    
+    def close(self):
+        self.workbook.save(self.file_name)
+        self.context.info(
+            f'Evaluation written to Excel file ({self.file_name})'
+            )
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+
+def write_records(records, writers):
+    """
+    Pass every record to every writer as soon as it is available
+    
+    Parameters
+    ----------
+    records : iterable
+        Result records, e.g. Evaluation.iter_pillars()
+    writers : list
+        Writers with a method write(record), e.g. CsvWriter, ExcelWriter
+    
+    Yields
+    ------
+    dict
+        The records after they have been written, which allows chaining
+        (e.g. Report.create_report(records = write_records(...)))
+    """
+    for record in records:
+        for w in writers:
+            w.write(record)
+        yield record
+
+async def awrite_records(records, writers):
+    """
+    Asynchronous version of write_records(), e.g. for
+    Evaluation.aiter_pillars()
+    """
+    async for record in records:
+        for w in writers:
+            w.write(record)
+        yield record